@@ -1,8 +1,11 @@
 import streamlit as st
 import logging
+import pandas as pd
 from modules.dashboard import create_dashboard
-from modules.data_loader import load_data
+from modules.data_loader import get_dataset
 from modules.filters import apply_filters
+from modules.profiler import finish_run, profile, profiling_requested, render_profiler_panel, start_run
+from modules.warmup import render_warmup_status, start_warmup
 
 # Configure logging
 logging.basicConfig(
@@ -11,6 +14,12 @@ logging.basicConfig(
     filename='app.log'
 )
 logger = logging.getLogger(__name__)
+
+# pandas < 3: bật Copy-on-Write cho cả tiến trình để các frame dẫn xuất từ bộ dữ liệu dùng chung
+# (modules.frozen.freeze) không thể ghi ngược vào bộ nhớ của nó (pandas >= 3 luôn bật sẵn)
+if int(pd.__version__.split('.')[0]) < 3:
+    pd.set_option("mode.copy_on_write", True)
+
 # App configuration
 st.set_page_config(
     page_title="Dashboard Brazilian E-Commerce (Olist)",
@@ -19,6 +28,10 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Đo thời gian (và bộ nhớ khi bật bảng hiệu năng) của từng khối trong lần chạy này
+dev_panel = profiling_requested()
+start_run(trace_memory=dev_panel)
+
 # Custom CSS với glass morphism và gradient effects
 st.markdown("""
 <style>
@@ -229,11 +242,20 @@ st.markdown("""
         </div>
     </div>
 """, unsafe_allow_html=True)
+# Làm nóng bộ nhớ đệm trong nền (một lần cho mỗi phiên bản dữ liệu) và hiển thị tiến độ cho tới khi xong
+render_warmup_status(start_warmup())
+
 # Load data with error logging
 with st.spinner('Đang tải dữ liệu...'):
     try:
-        orders, order_items, products, customers, order_payments, order_reviews, sellers, product_category, olist_geolocation_dataset,RFM_log_scaled_df = load_data()
+        # Bộ dữ liệu dùng chung (chỉ đọc) cho mọi phiên, không sao chép mỗi lần chạy lại
+        with profile('load_data') as span:
+            dataset = get_dataset()
+            if span is not None:
+                span.rows = len(dataset.facts)
         logger.info("Data loaded successfully")
+        # Làm nóng lại khi file nguồn đã đổi so với phiên bản đã làm nóng
+        start_warmup(dataset.version)
         data_loaded = True
     except FileNotFoundError as e:
         logger.error(f"File not found error: {str(e)}")
@@ -244,39 +266,33 @@ with st.spinner('Đang tải dữ liệu...'):
         st.error(f"⚠️ Lỗi khi tải dữ liệu: {e}")
         data_loaded = False
 if data_loaded:
+    st.sidebar.title("Bộ lọc")
+
+    # Bộ lọc theo khoảng thời gian và trạng thái đơn hàng, áp dụng cho mọi mục phân tích
     try:
-        # Gọi hàm để tạo các tabs và phân tích
-        logger.info("Creating dashboard components")
-        create_dashboard(orders, order_items, products, customers, order_payments, 
-                        order_reviews, sellers, product_category, 
-                        olist_geolocation_dataset, RFM_log_scaled_df)  # Thêm RFM_log_scaled_df
-        logger.info("Dashboard created successfully")
+        logger.info("Applying filters")
+        with profile('filters') as span:
+            filtered = apply_filters(dataset)
+            if span is not None:
+                span.rows = len(filtered.facts)
+        logger.info(f"Filters applied successfully ({len(filtered.facts):,} orders selected)")
     except Exception as e:
-        logger.error(f"Error creating dashboard: {str(e)}")
-        st.error(f"⚠️ Lỗi khi tạo dashboard: {e}")
-    # Thêm phần kết luận và bộ lọc
-    st.sidebar.title("Bộ lọc")
+        logger.error(f"Error applying filters: {str(e)}")
+        st.sidebar.error(f"⚠️ Lỗi khi áp dụng bộ lọc: {e}")
+        filtered = dataset
 
-    # Bộ lọc theo khoảng thời gian
-    if not orders.empty and 'order_purchase_timestamp' in orders.columns:
+    if filtered.facts.empty:
+        st.warning("Không có đơn hàng nào phù hợp với bộ lọc đã chọn.")
+    else:
         try:
-            logger.info("Applying time filters")
-            apply_filters(orders)
-            logger.info("Time filters applied successfully")
+            # Gọi hàm để tạo các tabs và phân tích
+            logger.info("Creating dashboard components")
+            with profile('dashboard', rows=len(filtered.facts)):
+                create_dashboard(filtered)
+            logger.info("Dashboard created successfully")
         except Exception as e:
-            logger.error(f"Error applying filters: {str(e)}")
-        st.sidebar.info("Chức năng lọc theo thời gian sẽ được áp dụng trong bản cập nhật tiếp theo")
-
-    # Bộ lọc theo trạng thái đơn hàng
-    if not orders.empty and 'order_status' in orders.columns:
-        status_options = orders['order_status'].unique().tolist()
-        selected_status = st.sidebar.multiselect(
-            "Chọn trạng thái đơn hàng",
-            options=status_options,
-            default=status_options
-        )
-        
-        st.sidebar.info("Chức năng lọc theo trạng thái sẽ được áp dụng trong bản cập nhật tiếp theo")
+            logger.error(f"Error creating dashboard: {str(e)}")
+            st.error(f"⚠️ Lỗi khi tạo dashboard: {e}")
 
     # Thông tin về dữ liệu
     st.sidebar.header("Thông tin dữ liệu")
@@ -323,3 +339,8 @@ else:
     # Tạo một demo nhỏ để hiển thị khi không có dữ liệu
     st.header("Xem trước dashboard")
     st.image("https://via.placeholder.com/800x400?text=Dashboard+Preview", use_column_width=True)
+
+# Ghi log kết quả đo của lần chạy và hiển thị bảng hiệu năng cho nhà phát triển
+finish_run()
+if dev_panel:
+    render_profiler_panel()
@@ -0,0 +1,450 @@
+"""
+Generate a synthetic dataset with the schema of the Olist CSV files.
+
+All nine files read by modules.data_loader.load_data() are written, with
+referential integrity (orders -> customers -> zip prefixes -> geolocation,
+items -> products/sellers, payments/reviews -> orders) and skewed
+distributions: customers concentrated in SP/RJ/MG, Zipf-distributed product
+and seller popularity, repeat customers, growing order volume with weekly
+seasonality and a Black Friday peak, delivery delays that lower review scores.
+
+Orders (and every table derived from them) are generated and written in
+chunks, so memory use depends on --chunk-size, not on --orders. Identifiers
+are derived from row numbers with a hash, so no id pool is kept in memory.
+
+Usage:
+    python benchmarks/generate_dataset.py /tmp/olist_10m --orders 10000000 --format both
+"""
+import argparse
+import os
+import sys
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PARQUET_AVAILABLE = True
+except ImportError:  # pragma: no cover - pyarrow đi kèm streamlit
+    PARQUET_AVAILABLE = False
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BUNDLED_CATEGORIES = os.path.join(ROOT, 'data', 'product_category_name_translation.csv')
+
+# Tiểu bang: (tỷ trọng khách hàng, dải mã bưu chính 5 số, vĩ độ, kinh độ, thủ phủ)
+STATES = {
+    'SP': (0.420, (1000, 19999), -22.2, -48.6, 'sao paulo'),
+    'RJ': (0.130, (20000, 28999), -22.5, -43.2, 'rio de janeiro'),
+    'MG': (0.117, (30000, 39999), -19.2, -44.3, 'belo horizonte'),
+    'RS': (0.055, (90000, 99999), -29.7, -52.5, 'porto alegre'),
+    'PR': (0.051, (80000, 87999), -24.9, -51.3, 'curitiba'),
+    'SC': (0.037, (88000, 89999), -27.3, -49.9, 'florianopolis'),
+    'BA': (0.034, (40000, 48999), -12.6, -41.0, 'salvador'),
+    'DF': (0.021, (70000, 73699), -15.8, -47.9, 'brasilia'),
+    'ES': (0.020, (29000, 29999), -19.9, -40.5, 'vitoria'),
+    'GO': (0.020, (73700, 76799), -16.3, -49.4, 'goiania'),
+    'PE': (0.017, (50000, 56999), -8.3, -36.5, 'recife'),
+    'CE': (0.013, (60000, 63999), -4.6, -39.3, 'fortaleza'),
+    'PA': (0.010, (66000, 68899), -3.4, -50.3, 'belem'),
+    'MT': (0.009, (78000, 78899), -13.4, -55.4, 'cuiaba'),
+    'MA': (0.0075, (65000, 65999), -4.5, -44.8, 'sao luis'),
+    'MS': (0.0072, (79000, 79999), -20.6, -54.8, 'campo grande'),
+    'PB': (0.0054, (58000, 58999), -7.1, -36.4, 'joao pessoa'),
+    'PI': (0.0050, (64000, 64999), -6.2, -42.3, 'teresina'),
+    'RN': (0.0049, (59000, 59999), -5.8, -36.5, 'natal'),
+    'AL': (0.0041, (57000, 57999), -9.6, -36.4, 'maceio'),
+    'SE': (0.0034, (49000, 49999), -10.6, -37.3, 'aracaju'),
+    'TO': (0.0028, (77000, 77999), -10.3, -48.3, 'palmas'),
+    'RO': (0.0025, (76800, 76999), -10.8, -62.9, 'porto velho'),
+    'AM': (0.0015, (69000, 69299), -3.3, -61.5, 'manaus'),
+    'AC': (0.0008, (69900, 69999), -9.2, -70.0, 'rio branco'),
+    'AP': (0.0007, (68900, 68999), 1.0, -51.6, 'macapa'),
+    'RR': (0.0005, (69300, 69399), 2.3, -61.3, 'boa vista'),
+}
+ORDER_STATUSES = ['delivered', 'shipped', 'canceled', 'unavailable', 'invoiced', 'processing', 'created', 'approved']
+ORDER_STATUS_P = [0.970, 0.011, 0.006, 0.006, 0.003, 0.003, 0.0005, 0.0005]
+PAYMENT_TYPES = ['credit_card', 'boleto', 'voucher', 'debit_card']
+PAYMENT_TYPE_P = [0.74, 0.19, 0.05, 0.02]
+# Phân bố giờ đặt hàng (0-23h): thấp vào ban đêm, cao điểm 10-22h
+HOUR_WEIGHTS = np.array([3, 2, 1, 1, 1, 1, 2, 3, 6, 9, 12, 13, 12, 13, 13, 13, 13, 12, 11, 11, 13, 13, 12, 8], dtype=float)
+FIRST_DAY = np.datetime64('2016-09-04')
+LAST_DAY = np.datetime64('2018-10-17')
+BLACK_FRIDAY = np.datetime64('2017-11-24')
+
+# Tỷ lệ kích thước các bảng so với số đơn hàng (gần với bộ dữ liệu Olist gốc)
+PRODUCTS_PER_ORDER = 1 / 3
+SELLERS_PER_ORDER = 1 / 32
+REPEAT_ORDER_SHARE = 0.03
+GEO_ROWS_PER_ORDER = 10
+# Bảng geolocation gốc có kích thước cố định theo số mã bưu chính nên không tăng vô hạn theo số đơn
+GEO_ROWS_MAX = 5_000_000
+ZIPS_PER_STATE_MAX = 1500
+
+
+def _mix(values: np.ndarray) -> np.ndarray:
+    # Hàm băm splitmix64: số thứ tự -> số 64 bit phân bố đều
+    z = values.astype(np.uint64) + np.uint64(0x9E3779B97F4A7C15)
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return z ^ (z >> np.uint64(31))
+
+
+def make_ids(index: np.ndarray, salt: int) -> np.ndarray:
+    """Return deterministic 32-hex-digit ids (Olist style) for row numbers ``index``."""
+    with np.errstate(over='ignore'):
+        high = _mix(index.astype(np.uint64) * np.uint64(2) + np.uint64(salt << 40))
+        low = _mix(high ^ np.uint64(salt))
+    pairs = np.stack([high, low], axis=1).astype('>u8')
+    hexed = pairs.view(np.uint8).reshape(len(index), 16)
+    digits = np.frombuffer(b'0123456789abcdef', dtype=np.uint8)
+    chars = np.empty((len(index), 32), dtype=np.uint8)
+    chars[:, 0::2] = digits[hexed >> 4]
+    chars[:, 1::2] = digits[hexed & 15]
+    return chars.view('S32').ravel().astype(str)
+
+
+def _uniform(index: np.ndarray, salt: int) -> np.ndarray:
+    # Số ngẫu nhiên trong [0, 1) xác định theo số thứ tự (dùng cho thuộc tính cố định của thực thể)
+    with np.errstate(over='ignore'):
+        return (_mix(index.astype(np.uint64) + np.uint64(salt << 48)) >> np.uint64(11)) / float(1 << 53)
+
+
+def _zipf_weights(n: int, exponent: float) -> np.ndarray:
+    weights = 1.0 / np.arange(1, n + 1) ** exponent
+    return weights / weights.sum()
+
+
+class TableWriter:
+    """Append chunks of one table to a CSV file and/or a Parquet file."""
+
+    def __init__(self, out_dir: str, file_name: str, formats: List[str]):
+        self.csv_path = os.path.join(out_dir, file_name) if 'csv' in formats else None
+        self.parquet_path = os.path.join(out_dir, 'parquet', file_name.replace('.csv', '.parquet')) if 'parquet' in formats else None
+        self.rows = 0
+        self._parquet = None
+        self._schema = None
+
+    def write(self, df: pd.DataFrame) -> None:
+        if self.csv_path:
+            df.to_csv(self.csv_path, index=False, mode='w' if self.rows == 0 else 'a', header=self.rows == 0)
+        if self.parquet_path:
+            table = pa.Table.from_pandas(df, schema=self._schema, preserve_index=False)
+            if self._parquet is None:
+                os.makedirs(os.path.dirname(self.parquet_path), exist_ok=True)
+                self._schema = table.schema
+                self._parquet = pq.ParquetWriter(self.parquet_path, self._schema)
+            self._parquet.write_table(table)
+        self.rows += len(df)
+
+    def close(self) -> None:
+        if self._parquet is not None:
+            self._parquet.close()
+
+
+class OlistGenerator:
+    """
+    Synthetic Olist dataset of a given size.
+
+    Dimension tables (zip prefixes, categories) are small and kept in memory;
+    products, sellers, customers and every order-related table are produced
+    chunk by chunk from row numbers and a seeded random generator.
+    """
+
+    def __init__(self, n_orders: int, seed: int = 42):
+        self.n_orders = n_orders
+        self.seed = seed
+        self.n_products = max(100, int(n_orders * PRODUCTS_PER_ORDER))
+        self.n_sellers = max(20, int(n_orders * SELLERS_PER_ORDER))
+        rng = np.random.default_rng(seed)
+
+        self._build_zips(rng)
+        self._build_categories(rng)
+        self._build_calendar()
+
+        # Độ phổ biến theo phân phối Zipf; thứ hạng được xáo trộn để không trùng với thứ tự id
+        self.product_p = _zipf_weights(self.n_products, 1.05)[rng.permutation(self.n_products)]
+        self.seller_p = _zipf_weights(self.n_sellers, 0.9)[rng.permutation(self.n_sellers)]
+        self.product_cdf = np.cumsum(self.product_p)
+        self.product_cdf /= self.product_cdf[-1]
+
+    def _build_zips(self, rng: np.random.Generator) -> None:
+        zips, states, weights, lat, lng, cities = [], [], [], [], [], []
+        for state, (share, (lo, hi), s_lat, s_lng, capital) in STATES.items():
+            count = int(np.clip(share * 8000, 20, min(ZIPS_PER_STATE_MAX, hi - lo + 1)))
+            state_zips = np.sort(rng.choice(np.arange(lo, hi + 1), count, replace=False))
+            zips.append(state_zips)
+            states += [state] * count
+            # Trong một tiểu bang, mã bưu chính đầu dải (thủ phủ) tập trung nhiều khách hàng hơn
+            weights.append(share * _zipf_weights(count, 0.8))
+            capital_zone = np.arange(count) < max(1, count // 4)
+            lat.append(np.where(capital_zone, s_lat, s_lat + rng.normal(0, 1.5, count)) + rng.normal(0, 0.15, count))
+            lng.append(np.where(capital_zone, s_lng, s_lng + rng.normal(0, 1.5, count)) + rng.normal(0, 0.15, count))
+            cities += [capital if c else f"{state.lower()} municipio {i % 97}" for i, c in enumerate(capital_zone)]
+        self.zips = np.concatenate(zips)
+        self.zip_state = np.array(states)
+        self.zip_city = np.array(cities)
+        self.zip_lat = np.concatenate(lat)
+        self.zip_lng = np.concatenate(lng)
+        zip_p = np.concatenate(weights)
+        self.zip_cdf = np.cumsum(zip_p / zip_p.sum())
+
+    def _build_categories(self, rng: np.random.Generator) -> None:
+        if os.path.exists(BUNDLED_CATEGORIES):
+            categories = pd.read_csv(BUNDLED_CATEGORIES, encoding='utf-8-sig')
+        else:
+            categories = pd.DataFrame({
+                'product_category_name': [f"categoria_{i:02d}" for i in range(71)],
+                'product_category_name_english': [f"category_{i:02d}" for i in range(71)],
+            })
+        self.categories = categories
+        n = len(categories)
+        self.category_p = _zipf_weights(n, 1.1)[rng.permutation(n)]
+        # Giá và khối lượng cơ sở theo danh mục (phân phối log-normal)
+        self.category_price = np.exp(rng.normal(4.3, 0.7, n))
+        self.category_weight = np.exp(rng.normal(6.5, 1.0, n))
+
+    def _build_calendar(self) -> None:
+        days = np.arange(FIRST_DAY, LAST_DAY + 1)
+        t = np.linspace(0, 1, len(days))
+        weekday = (days.astype('int64') + 3) % 7  # 0 = thứ Hai
+        weights = (0.2 + 3 * t) * np.where(weekday >= 5, 0.8, 1.0)
+        weights[days == BLACK_FRIDAY] *= 4
+        self.days = days
+        self.day_cdf = np.cumsum(weights / weights.sum())
+        self.hour_p = HOUR_WEIGHTS / HOUR_WEIGHTS.sum()
+
+    # Các thuộc tính cố định của thực thể (suy ra từ số thứ tự, không cần lưu)
+    def customer_zip(self, unique_index: np.ndarray) -> np.ndarray:
+        return np.searchsorted(self.zip_cdf, _uniform(unique_index, 1), side='right').clip(0, len(self.zips) - 1)
+
+    def seller_zip(self, seller_index: np.ndarray) -> np.ndarray:
+        return np.searchsorted(self.zip_cdf, _uniform(seller_index, 2), side='right').clip(0, len(self.zips) - 1)
+
+    def product_category(self, product_index: np.ndarray) -> np.ndarray:
+        cdf = np.cumsum(self.category_p)
+        return np.searchsorted(cdf / cdf[-1], _uniform(product_index, 3), side='right').clip(0, len(self.category_p) - 1)
+
+    def product_seller(self, product_index: np.ndarray) -> np.ndarray:
+        cdf = np.cumsum(self.seller_p)
+        return np.searchsorted(cdf / cdf[-1], _uniform(product_index, 4), side='right').clip(0, self.n_sellers - 1)
+
+    def product_price(self, product_index: np.ndarray) -> np.ndarray:
+        base = self.category_price[self.product_category(product_index)]
+        return np.round(base * np.exp((_uniform(product_index, 5) - 0.5) * 1.5), 2)
+
+    def orders_chunk(self, start: int, stop: int, rng: np.random.Generator) -> Dict[str, pd.DataFrame]:
+        """Return the orders, customers, items, payments and reviews of orders start..stop-1."""
+        n = stop - start
+        index = np.arange(start, stop)
+        order_ids = make_ids(index, 10)
+        customer_ids = make_ids(index, 11)
+
+        # Khách hàng: mỗi đơn có customer_id riêng; customer_unique_id lặp lại cho khách mua nhiều lần
+        repeat = _uniform(index, 6) < REPEAT_ORDER_SHARE
+        unique_index = np.where(repeat, (_uniform(index, 16) * self.n_orders).astype(np.int64), index)
+        zip_pos = self.customer_zip(unique_index)
+        customers = pd.DataFrame({
+            'customer_id': customer_ids,
+            'customer_unique_id': make_ids(unique_index, 12),
+            'customer_zip_code_prefix': self.zips[zip_pos],
+            'customer_city': self.zip_city[zip_pos],
+            'customer_state': self.zip_state[zip_pos],
+        })
+
+        # Thời điểm đặt hàng: ngày theo xu hướng tăng trưởng và mùa vụ, giờ theo phân bố trong ngày
+        day = self.days[np.searchsorted(self.day_cdf, rng.random(n), side='right').clip(0, len(self.days) - 1)]
+        seconds = rng.choice(24, n, p=self.hour_p) * 3600 + rng.integers(0, 3600, n)
+        purchase = day.astype('datetime64[s]') + seconds.astype('timedelta64[s]')
+        status = np.array(ORDER_STATUSES)[rng.choice(len(ORDER_STATUSES), n, p=ORDER_STATUS_P)]
+        approved = purchase + rng.gamma(1.5, 6 * 3600, n).astype('timedelta64[s]')
+        carrier = approved + rng.gamma(2.0, 1.2 * 86400, n).astype('timedelta64[s]')
+        delivered = carrier + rng.gamma(2.5, 3.5 * 86400, n).astype('timedelta64[s]')
+        estimated = (purchase + rng.integers(15, 35, n).astype('timedelta64[D]')).astype('datetime64[D]')
+        not_delivered = status != 'delivered'
+        no_carrier = np.isin(status, ['canceled', 'unavailable', 'invoiced', 'processing', 'created', 'approved'])
+        nat = np.datetime64('NaT')
+        orders = pd.DataFrame({
+            'order_id': order_ids,
+            'customer_id': customer_ids,
+            'order_status': status,
+            'order_purchase_timestamp': purchase,
+            'order_approved_at': np.where(status == 'created', nat, approved),
+            'order_delivered_carrier_date': np.where(no_carrier, nat, carrier),
+            'order_delivered_customer_date': np.where(not_delivered, nat, delivered),
+            'order_estimated_delivery_date': estimated.astype('datetime64[s]'),
+        })
+
+        # Sản phẩm trong đơn: phần lớn đơn có 1 sản phẩm, sản phẩm chọn theo độ phổ biến
+        counts = np.minimum(rng.geometric(0.88, n), 6)
+        item_order = np.repeat(np.arange(n), counts)
+        item_seq = np.arange(len(item_order)) - np.repeat(np.cumsum(counts) - counts, counts) + 1
+        product_index = np.searchsorted(self.product_cdf, rng.random(len(item_order)), side='right').clip(0, self.n_products - 1)
+        category = self.product_category(product_index)
+        price = self.product_price(product_index)
+        freight = np.round(5 + self.category_weight[category] / 400 * rng.gamma(2, 0.5, len(item_order)), 2)
+        items = pd.DataFrame({
+            'order_id': order_ids[item_order],
+            'order_item_id': item_seq,
+            'product_id': make_ids(product_index, 13),
+            'seller_id': make_ids(self.product_seller(product_index), 14),
+            'shipping_limit_date': purchase[item_order] + np.timedelta64(6, 'D'),
+            'price': price,
+            'freight_value': freight,
+        })
+
+        # Thanh toán: tổng tiền của đơn; khoảng 3% đơn có thêm một phiếu giảm giá (voucher)
+        totals = np.bincount(item_order, weights=price + freight, minlength=n)
+        payment_type = np.array(PAYMENT_TYPES)[rng.choice(len(PAYMENT_TYPES), n, p=PAYMENT_TYPE_P)]
+        split = rng.random(n) < 0.03
+        voucher = np.round(np.where(split, totals * rng.uniform(0.1, 0.5, n), 0), 2)
+        installments = np.where(payment_type == 'credit_card', np.minimum(rng.geometric(0.3, n), 10), 1)
+        payments = pd.DataFrame({
+            'order_id': np.concatenate([order_ids, order_ids[split]]),
+            'payment_sequential': np.concatenate([np.ones(n, dtype=int), np.full(split.sum(), 2)]),
+            'payment_type': np.concatenate([payment_type, np.full(split.sum(), 'voucher')]),
+            'payment_installments': np.concatenate([installments, np.ones(split.sum(), dtype=int)]),
+            'payment_value': np.concatenate([np.round(totals - voucher, 2), voucher[split]]),
+        })
+
+        # Đánh giá: giao trễ so với dự kiến làm điểm thấp hơn
+        late = (delivered > estimated.astype('datetime64[s]')) & ~not_delivered
+        good = rng.choice([1, 2, 3, 4, 5], n, p=[0.08, 0.03, 0.08, 0.20, 0.61])
+        bad = rng.choice([1, 2, 3, 4, 5], n, p=[0.45, 0.10, 0.15, 0.15, 0.15])
+        created = np.where(not_delivered, estimated.astype('datetime64[s]'), delivered).astype('datetime64[D]') + np.timedelta64(1, 'D')
+        reviews = pd.DataFrame({
+            'review_id': make_ids(index, 15),
+            'order_id': order_ids,
+            'review_score': np.where(late | (status == 'canceled'), bad, good),
+            'review_comment_title': '',
+            'review_comment_message': '',
+            'review_creation_date': created.astype('datetime64[s]'),
+            'review_answer_timestamp': created.astype('datetime64[s]') + rng.gamma(1.5, 86400, n).astype('timedelta64[s]'),
+        })
+        return {
+            'olist_orders_dataset.csv': orders,
+            'olist_customers_dataset.csv': customers,
+            'olist_order_items_dataset.csv': items,
+            'olist_order_payments_dataset.csv': payments,
+            'olist_order_reviews_dataset.csv': reviews,
+        }
+
+    def products_chunk(self, start: int, stop: int) -> pd.DataFrame:
+        index = np.arange(start, stop)
+        category = self.product_category(index)
+        weight = np.round(self.category_weight[category] * np.exp((_uniform(index, 7) - 0.5) * 2))
+        side = np.cbrt(weight) * 1.5
+        return pd.DataFrame({
+            'product_id': make_ids(index, 13),
+            'product_category_name': self.categories['product_category_name'].to_numpy()[category],
+            'product_name_lenght': (30 + _uniform(index, 8) * 40).astype(int),
+            'product_description_lenght': (100 + _uniform(index, 9) * 2000).astype(int),
+            'product_photos_qty': (1 + _uniform(index, 10) ** 3 * 8).astype(int),
+            'product_weight_g': weight,
+            'product_length_cm': np.round(side * (0.8 + _uniform(index, 11) * 0.8)),
+            'product_height_cm': np.round(side * (0.4 + _uniform(index, 12) * 0.8)),
+            'product_width_cm': np.round(side * (0.6 + _uniform(index, 13) * 0.8)),
+        })
+
+    def sellers_chunk(self, start: int, stop: int) -> pd.DataFrame:
+        index = np.arange(start, stop)
+        zip_pos = self.seller_zip(index)
+        return pd.DataFrame({
+            'seller_id': make_ids(index, 14),
+            'seller_zip_code_prefix': self.zips[zip_pos],
+            'seller_city': self.zip_city[zip_pos],
+            'seller_state': self.zip_state[zip_pos],
+        })
+
+    def geolocation_chunk(self, start: int, stop: int, rng: np.random.Generator) -> pd.DataFrame:
+        # Mỗi mã bưu chính có ít nhất một dòng (trong khối đầu tiên), các dòng còn lại theo mật độ dân cư
+        n = stop - start
+        zip_pos = np.searchsorted(self.zip_cdf, rng.random(n), side='right').clip(0, len(self.zips) - 1)
+        if start == 0:
+            zip_pos[:len(self.zips)] = np.arange(min(n, len(self.zips)))
+        return pd.DataFrame({
+            'geolocation_zip_code_prefix': self.zips[zip_pos],
+            'geolocation_lat': self.zip_lat[zip_pos] + rng.normal(0, 0.02, n),
+            'geolocation_lng': self.zip_lng[zip_pos] + rng.normal(0, 0.02, n),
+            'geolocation_city': self.zip_city[zip_pos],
+            'geolocation_state': self.zip_state[zip_pos],
+        })
+
+
+
+def generate(out_dir: str, n_orders: int, formats: List[str], chunk_size: int = 500_000, seed: int = 42,
+             log=print) -> Dict[str, int]:
+    """
+    Write a synthetic Olist dataset with ``n_orders`` orders into ``out_dir``.
+
+    Args:
+        out_dir (str): Output directory; CSV files are written directly into it,
+            Parquet files into ``out_dir/parquet``
+        n_orders (int): Number of orders
+        formats (List[str]): Output formats, any of 'csv' and 'parquet'
+        chunk_size (int): Rows generated and written per chunk
+        seed (int): Seed of the random generator
+        log (Callable): Progress output
+
+    Returns:
+        Dict[str, int]: Number of rows written per file
+
+    Raises:
+        RuntimeError: If Parquet output is requested without pyarrow
+    """
+    if 'parquet' in formats and not PARQUET_AVAILABLE:
+        raise RuntimeError("Parquet output requires pyarrow")
+    os.makedirs(out_dir, exist_ok=True)
+    generator = OlistGenerator(n_orders, seed)
+    rng = np.random.default_rng(seed + 1)
+    writers: Dict[str, TableWriter] = {}
+
+    def write(name: str, df: pd.DataFrame) -> None:
+        if name not in writers:
+            writers[name] = TableWriter(out_dir, name, formats)
+        writers[name].write(df)
+
+    def chunks(total: int):
+        for start in range(0, total, chunk_size):
+            yield start, min(start + chunk_size, total)
+
+    started = time.perf_counter()
+    try:
+        write('product_category_name_translation.csv', generator.categories)
+        for start, stop in chunks(generator.n_sellers):
+            write('olist_sellers_dataset.csv', generator.sellers_chunk(start, stop))
+        for start, stop in chunks(generator.n_products):
+            write('olist_products_dataset.csv', generator.products_chunk(start, stop))
+        for start, stop in chunks(n_orders):
+            for name, df in generator.orders_chunk(start, stop, rng).items():
+                write(name, df)
+            log(f"orders {stop:,}/{n_orders:,} ({time.perf_counter() - started:.0f}s)")
+        for start, stop in chunks(max(len(generator.zips), min(GEO_ROWS_MAX, int(n_orders * GEO_ROWS_PER_ORDER)))):
+            write('olist_geolocation_dataset.csv', generator.geolocation_chunk(start, stop, rng))
+    finally:
+        for writer in writers.values():
+            writer.close()
+    return {name: writer.rows for name, writer in writers.items()}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('out_dir', help="Output directory")
+    parser.add_argument('--orders', type=int, default=100_000, help="Number of orders (default: 100000)")
+    parser.add_argument('--format', choices=['csv', 'parquet', 'both'], default='csv', help="Output format")
+    parser.add_argument('--chunk-size', type=int, default=500_000, help="Rows per generated chunk")
+    parser.add_argument('--seed', type=int, default=42, help="Random seed")
+    args = parser.parse_args(argv)
+
+    formats = ['csv', 'parquet'] if args.format == 'both' else [args.format]
+    rows = generate(args.out_dir, args.orders, formats, args.chunk_size, args.seed,
+                    log=lambda message: print(message, file=sys.stderr))
+    for name, count in rows.items():
+        print(f"{name}: {count:,} rows")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,332 @@
+"""
+Headless benchmarks for data loading, filters, aggregations and dashboard sections.
+
+For every requested scale the benchmarks run in a fresh Python process (so
+module-level state and Streamlit caches start empty) against the Olist CSV
+files in --data, or against a copy scaled up with scale_dataset.py. Results
+are written as JSON, one entry per scale, with timings in milliseconds.
+
+Usage:
+    python benchmarks/run_benchmarks.py --data data/ --scales 1 10 100 --output bench.json
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# Phiên bản định dạng kết quả; tăng khi thay đổi cấu trúc JSON
+RESULT_FORMAT = 1
+
+
+def measure(func: Callable[[], object], repeat: int = 1) -> Dict[str, float]:
+    """
+    Time ``func`` ``repeat`` times.
+
+    Returns:
+        dict: median_ms, min_ms, max_ms and runs
+    """
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        durations.append((time.perf_counter() - start) * 1000)
+    return {
+        'median_ms': round(statistics.median(durations), 3),
+        'min_ms': round(min(durations), 3),
+        'max_ms': round(max(durations), 3),
+        'runs': repeat,
+    }
+
+
+def _aggregation_calls(data) -> Dict[str, Callable[[], object]]:
+    from modules import aggregations as agg
+    from modules.downsample import MAX_POINTS
+
+    start, end = agg.date_bounds(data)
+    calls = {
+        'date_bounds': lambda: agg.date_bounds(data),
+        'daily_orders': lambda: agg.daily_orders(data, start, end, max_points=MAX_POINTS),
+        'daily_revenue': lambda: agg.daily_revenue(data, start, end, max_points=MAX_POINTS),
+        'hourly_orders': lambda: agg.hourly_orders(data, (0, 23)),
+        'monthly_revenue': lambda: agg.monthly_revenue(data, max_points=MAX_POINTS),
+        'payment_types': lambda: agg.payment_types(data),
+        'avg_delivery_time': lambda: agg.avg_delivery_time(data),
+        'order_status_share': lambda: agg.order_status_share(data),
+        'review_scores': lambda: agg.review_scores(data),
+        'delivery_score': lambda: agg.delivery_score(data),
+        'category_counts': lambda: agg.category_counts(data, top=10),
+        'category_price': lambda: agg.category_price(data, top=10),
+        'category_weight': lambda: agg.category_weight(data, top=10),
+        'customer_states': lambda: agg.customer_states(data),
+        'seller_states': lambda: agg.seller_states(data),
+        'combined_states': lambda: agg.combined_states(data),
+        'state_locations': lambda: agg.state_locations(data),
+        'customer_zips': lambda: agg.customer_zips(data),
+        'seller_zips': lambda: agg.seller_zips(data),
+        'top_cities': lambda: agg.top_cities(data, top=20),
+        'rfm_points.sample': lambda: agg.rfm_points(data, 'sample'),
+        'rfm_points.voxel': lambda: agg.rfm_points(data, 'voxel'),
+    }
+    return calls
+
+
+def _benchmark_queries(label: str, data, timings: Dict[str, dict], repeat: int) -> None:
+    import pandas as pd
+    from modules import aggregations as agg
+    from modules.query import DUCKDB_AVAILABLE, Query, run_duckdb, run_pandas
+
+    backends = {'pandas': run_pandas}
+    if DUCKDB_AVAILABLE:
+        backends['duckdb'] = run_duckdb
+    mismatches = []
+    for name, query in vars(agg).items():
+        if not isinstance(query, Query):
+            continue
+        tables = {table: getattr(data, table) for table in query.tables()}
+        results = {}
+        for backend, run in backends.items():
+            timings[f"{label}.{name.lower()}.{backend}"] = measure(lambda: run(query, tables), repeat)
+            results[backend] = run(query, tables)
+        if 'duckdb' in results:
+            try:
+                pd.testing.assert_frame_equal(results['pandas'], results['duckdb'], check_exact=False, rtol=1e-9)
+            except AssertionError:
+                mismatches.append(name.lower())
+    timings[f"{label}.mismatches"] = mismatches
+
+
+def _benchmark_app(timings: Dict[str, dict]) -> None:
+    # Chạy toàn bộ ứng dụng không cần trình duyệt và đo từng mục (lần đầu và khi đã có cache)
+    from streamlit.testing.v1 import AppTest
+
+    app = AppTest.from_file(os.path.join(ROOT, 'app.py'), default_timeout=3600)
+    start = time.perf_counter()
+    app.run()
+    timings['app.first_run'] = {'median_ms': round((time.perf_counter() - start) * 1000, 3), 'runs': 1}
+
+    for visit in ('first', 'cached'):
+        sections = [r for r in app.radio if r.key == 'dashboard_section']
+        if not sections:
+            return
+        for section in sections[0].options:
+            [r for r in app.radio if r.key == 'dashboard_section'][0].set_value(section)
+            start = time.perf_counter()
+            app.run()
+            timings[f"section.{visit}.{section}"] = {'median_ms': round((time.perf_counter() - start) * 1000, 3), 'runs': 1}
+            for sub in [r.options for r in app.radio if r.key == 'map_section'][:1]:
+                for option in sub:
+                    [r for r in app.radio if r.key == 'map_section'][0].set_value(option)
+                    start = time.perf_counter()
+                    app.run()
+                    timings[f"section.{visit}.{section}/{option}"] = {
+                        'median_ms': round((time.perf_counter() - start) * 1000, 3), 'runs': 1
+                    }
+        errors = [e.message for e in app.exception] + [e.value for e in app.error]
+        if errors:
+            timings['app.errors'] = errors
+
+
+def run_worker(data_path: str, repeat: int, with_app: bool) -> dict:
+    """
+    Run every benchmark against ``data_path`` in the current process.
+
+    Args:
+        data_path (str): Directory with the Olist CSV files
+        repeat (int): Number of timed runs for repeatable (warm) benchmarks
+        with_app (bool): Also time the full app and each section with AppTest
+
+    Returns:
+        dict: Row counts and timings of this dataset
+    """
+    import streamlit as st
+    from modules.category_stats import CategoryStats
+    from modules.data_loader import CATALOG_TABLES, FACT_SOURCES, TABLE_FILES, get_dataset, load_data
+    from modules.fact_table import FACT_TABLES, SOURCE_COLUMNS, build_fact_tables, build_order_facts
+    from modules.filters import FilterState, filter_dataset, filter_index
+    from modules.ingest import GEOLOCATION_FILE, summarize_geolocation
+    from modules.kpi_engine import KPIEngine, kpi_engine, kpi_values
+    from modules.kpis import display_kpis
+    from modules.rfm import rfm_segments, rfm_values
+    from modules.snapshot import SnapshotStore, read_source_csv
+
+    timings: Dict[str, dict] = {}
+    paths = {name: os.path.join(data_path, file) for name, file in TABLE_FILES.items()}
+
+    # Nạp dữ liệu: phân tích CSV trực tiếp, rồi qua snapshot (lần đầu tạo snapshot, sau đó đọc Parquet)
+    timings['load.parse_csv'] = measure(
+        lambda: [read_source_csv(path, os.path.basename(path)) for path in paths.values()]
+    )
+    timings['load.load_data.first'] = measure(lambda: load_data(data_path))
+    timings['load.load_data'] = measure(lambda: load_data(data_path), repeat)
+    tables = dict(zip(TABLE_FILES, load_data(data_path)))
+    # Đọc các snapshot tuần tự và song song; thời gian từng file của lần đọc song song đi kèm kết quả
+    timings['load.read_many.serial'] = measure(
+        lambda: SnapshotStore(data_path).read_many(TABLE_FILES.values(), workers=1), repeat
+    )
+    timings['load.read_many'] = measure(lambda: SnapshotStore(data_path).read_many(TABLE_FILES.values()), repeat)
+    store = SnapshotStore(data_path)
+    store.read_many(TABLE_FILES.values())
+    load_files = store.timings
+    timings['load.summarize_geolocation'] = measure(
+        lambda: summarize_geolocation(SnapshotStore(data_path).iter_chunks(GEOLOCATION_FILE))
+    )
+    timings['load.build_order_facts'] = measure(lambda: build_order_facts(
+        tables['orders'], tables['order_payments'], tables['order_reviews'],
+        tables['customers'], tables['order_items']
+    ), repeat)
+    # Các bảng fact đọc theo từng khối từ snapshot (cách get_dataset() tạo chúng)
+    timings['load.build_fact_tables'] = measure(lambda: build_fact_tables(*(
+        SnapshotStore(data_path).iter_chunks(TABLE_FILES[name], columns=SOURCE_COLUMNS[name])
+        for name in FACT_SOURCES
+    )))
+
+    st.cache_resource.clear()
+    timings['load.get_dataset.first'] = measure(lambda: get_dataset(data_path))
+    timings['load.get_dataset.hit'] = measure(lambda: get_dataset(data_path), repeat)
+    data = get_dataset(data_path)
+
+    # Bộ lọc: tạo chỉ mục một lần, sau đó lọc theo nửa giữa khoảng thời gian và đơn đã giao
+    timings['filters.index'] = measure(lambda: filter_index(data))
+    dates = data.facts['date']
+    state = FilterState(
+        start_date=(dates.min() + (dates.max() - dates.min()) / 4).date(),
+        end_date=(dates.max() - (dates.max() - dates.min()) / 4).date(),
+        statuses=('delivered',)
+    )
+
+    def filter_uncached():
+        filter_dataset.clear()
+        return filter_dataset(data, state)
+
+    timings['filters.filter_dataset'] = measure(filter_uncached, repeat)
+    filtered = filter_dataset(data, state)
+
+    # Các hàm tổng hợp: lần tính đầu tiên (cache rỗng) và lần lấy từ cache
+    for label, dataset in (('aggregation', data), ('aggregation_filtered', filtered)):
+        for name, call in _aggregation_calls(dataset).items():
+            st.cache_data.clear()
+            timings[f"{label}.{name}.miss"] = measure(call)
+            timings[f"{label}.{name}.hit"] = measure(call, repeat)
+
+    # Mỗi truy vấn nhóm trên cả hai backend (DuckDB nếu đã cài) và kiểm tra kết quả giống nhau
+    for label, dataset in (('query', data), ('query_filtered', filtered)):
+        _benchmark_queries(label, dataset, timings, repeat)
+
+    # RFM và phân cụm mini-batch k-means (lần tính đầu tiên, sau đó lấy từ cache)
+    timings['rfm.values'] = measure(lambda: rfm_values(data.facts), repeat)
+    for label, dataset in (('rfm', data), ('rfm_filtered', filtered)):
+        timings[f"{label}.segments.miss"] = measure(lambda: rfm_segments(dataset))
+        timings[f"{label}.segments.hit"] = measure(lambda: rfm_segments(dataset), repeat)
+
+    # Thống kê danh mục: dựng một lần, sau đó mỗi truy vấn top-K (có hoặc không có lát cắt) chỉ đọc bảng đã tính
+    timings['category_stats.build'] = measure(lambda: CategoryStats(data))
+    stats = CategoryStats(data)
+    timings['category_stats.top_items'] = measure(lambda: stats.top('items', 10), repeat)
+    timings['category_stats.top_price_sliced'] = measure(
+        lambda: stats.top('price_mean', 10, seller_states=('SP',)), repeat
+    )
+
+    # KPI từ các phân vùng (ngày, trạng thái): lần dựng đầu tiên, rồi từng cửa sổ lọc
+    timings['kpis.engine.build'] = measure(lambda: KPIEngine(data))
+    engine = kpi_engine(data)
+    timings['kpis.values'] = measure(lambda: kpi_values(data), repeat)
+    timings['kpis.values_filtered'] = measure(lambda: kpi_values(filtered), repeat)
+    timings['kpis.values_status'] = measure(lambda: engine.kpis(FilterState(statuses=('delivered',))), repeat)
+    timings['kpis.display_kpis'] = measure(lambda: display_kpis(kpi_values(filtered)), repeat)
+
+    if with_app:
+        _benchmark_app(timings)
+
+    return {
+        'data_path': data_path,
+        'rows': {
+            name: len(getattr(data, name)) for name in (*FACT_TABLES, *CATALOG_TABLES, 'olist_geolocation_dataset')
+        },
+        'load_files': load_files,
+        'timings': timings,
+    }
+
+
+def _run_scale(data_path: str, scale: int, work_dir: str, repeat: int, with_app: bool) -> dict:
+    from scale_dataset import scale_dataset
+
+    if scale != 1:
+        scaled_path = os.path.join(work_dir, f"olist_x{scale}")
+        if not os.path.exists(os.path.join(scaled_path, 'olist_geolocation_dataset.csv')):
+            scale_dataset(data_path, scaled_path, scale)
+        data_path = scaled_path
+    data_path = os.path.join(os.path.abspath(data_path), '')
+
+    # Mỗi quy mô chạy trong một tiến trình riêng để cache và DATA_PATH bắt đầu từ trạng thái sạch
+    command = [sys.executable, os.path.abspath(__file__), '--worker', data_path, '--repeat', str(repeat)]
+    if not with_app:
+        command.append('--no-app')
+    env = dict(os.environ, OLIST_DATA_PATH=data_path)
+    # Không làm nóng cache trong nền, để lần xem đầu tiên của mỗi mục vẫn đo chi phí thật (modules.warmup)
+    env.setdefault('OLIST_WARMUP', '0')
+    result = subprocess.run(command, env=env, cwd=work_dir, capture_output=True, text=True)
+    if result.returncode != 0:
+        return {'scale': scale, 'data_path': data_path, 'error': result.stderr.strip().splitlines()[-20:]}
+    return dict(scale=scale, **json.loads(result.stdout.strip().splitlines()[-1]))
+
+
+def _versions() -> Dict[str, str]:
+    import numpy
+    import pandas
+    import plotly
+    import streamlit
+    return {
+        'python': platform.python_version(),
+        'pandas': pandas.__version__,
+        'numpy': numpy.__version__,
+        'streamlit': streamlit.__version__,
+        'plotly': plotly.__version__,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--data', default=os.path.join(ROOT, 'data'), help="Directory with the Olist CSV files")
+    parser.add_argument('--scales', type=int, nargs='+', default=[1], help="Scale factors to run (e.g. 1 10 100)")
+    parser.add_argument('--repeat', type=int, default=5, help="Timed runs of each warm benchmark")
+    parser.add_argument('--no-app', action='store_true', help="Skip the AppTest run of the full dashboard")
+    parser.add_argument('--work-dir', help="Directory for scaled datasets and app logs (default: temporary)")
+    parser.add_argument('--output', help="Write the JSON results to this file instead of stdout")
+    parser.add_argument('--worker', metavar='DATA_PATH', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        print(json.dumps(run_worker(args.worker, args.repeat, not args.no_app)))
+        return 0
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix='olist_bench_')
+    os.makedirs(work_dir, exist_ok=True)
+    report = {
+        'format': RESULT_FORMAT,
+        'created': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        'platform': platform.platform(),
+        'versions': _versions(),
+        'results': [_run_scale(args.data, scale, work_dir, args.repeat, not args.no_app) for scale in args.scales],
+    }
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+    return 1 if any('error' in result for result in report['results']) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
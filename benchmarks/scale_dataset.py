@@ -0,0 +1,94 @@
+"""
+Create a scaled-up copy of the Olist CSV files for benchmarking.
+
+Every order-related table (orders, items, payments, reviews, customers) and
+the geolocation table is written ``factor`` times. Each copy gets its own
+order, customer and review ids (a suffix is appended), so joins keep their
+cardinality and referential integrity. Catalog tables (products, sellers,
+category translation, RFM) are copied unchanged.
+
+Source files are read in chunks, and every chunk is written once per copy, so
+memory use depends on --chunk-size, not on the size of the dataset.
+
+Usage:
+    python benchmarks/scale_dataset.py data/ /tmp/olist_x10 --factor 10
+"""
+import argparse
+import os
+import shutil
+import sys
+
+import pandas as pd
+
+# Cột khóa cần thêm hậu tố cho mỗi bản sao, theo từng file
+SCALED_FILES = {
+    'olist_orders_dataset.csv': ['order_id', 'customer_id'],
+    'olist_order_items_dataset.csv': ['order_id'],
+    'olist_order_payments_dataset.csv': ['order_id'],
+    'olist_order_reviews_dataset.csv': ['review_id', 'order_id'],
+    'olist_customers_dataset.csv': ['customer_id', 'customer_unique_id'],
+    'olist_geolocation_dataset.csv': [],
+}
+COPIED_FILES = [
+    'olist_products_dataset.csv',
+    'olist_sellers_dataset.csv',
+    'product_category_name_translation.csv',
+]
+CHUNK_SIZE = 200_000
+
+
+def scale_dataset(source: str, target: str, factor: int, chunk_size: int = CHUNK_SIZE) -> dict:
+    """
+    Write ``factor`` copies of the Olist tables from ``source`` into ``target``.
+
+    Args:
+        source (str): Directory with the original CSV files
+        target (str): Output directory (created if needed)
+        factor (int): Number of copies of each order-related table
+        chunk_size (int): Rows read from a source file at a time
+
+    Returns:
+        dict: Number of rows written per file
+
+    Raises:
+        FileNotFoundError: If a required source file is missing
+    """
+    os.makedirs(target, exist_ok=True)
+    rows = {}
+    for name in COPIED_FILES:
+        shutil.copyfile(os.path.join(source, name), os.path.join(target, name))
+        rows[name] = sum(
+            len(chunk) for chunk in pd.read_csv(os.path.join(target, name), usecols=[0], chunksize=chunk_size)
+        )
+
+    for name, id_columns in SCALED_FILES.items():
+        path = os.path.join(target, name)
+        rows[name] = 0
+        first = True
+        # Đọc mọi cột dạng chuỗi để ghi lại đúng như file gốc; mỗi khối được ghi factor lần
+        chunks = pd.read_csv(os.path.join(source, name), dtype=str, keep_default_na=False, chunksize=chunk_size)
+        for chunk in chunks:
+            for copy in range(factor):
+                part = chunk
+                if copy > 0 and id_columns:
+                    part = chunk.assign(**{col: chunk[col] + f"{copy:04x}" for col in id_columns})
+                part.to_csv(path, index=False, mode='w' if first else 'a', header=first)
+                rows[name] += len(part)
+                first = False
+    return rows
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('source', help="Directory with the original Olist CSV files")
+    parser.add_argument('target', help="Output directory")
+    parser.add_argument('--factor', type=int, default=10, help="Number of copies (default: 10)")
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help="Rows read per chunk")
+    args = parser.parse_args(argv)
+    for name, count in scale_dataset(args.source, args.target, args.factor, args.chunk_size).items():
+        print(f"{name}: {count:,} rows")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,273 @@
+from typing import Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+from modules.category_stats import category_stats
+from modules.cube import daily_cube
+from modules.data_loader import Dataset
+from modules.downsample import SCATTER_POINTS, downsample, stratified_sample, voxel_reduce
+from modules.filters import FilterState
+from modules.keys import key_present
+from modules.profiler import profile
+from modules.query import Query, run_query
+from modules.rfm import FEATURES, rfm_segments
+from modules.zip_lookup import zip_lookup
+
+# Số kết quả tối đa giữ lại cho mỗi hàm tổng hợp (LRU: kết quả ít dùng nhất bị loại trước)
+AGGREGATION_CACHE_SIZE = 64
+
+# Các truy vấn nhóm, viết một lần và chạy trên backend đã chọn (modules.query: pandas hoặc DuckDB)
+HOURLY_ORDERS = Query('facts', ('hour',), (('count', 'count', None),))
+MONTHLY_REVENUE = Query('facts', ('month',), (('payment_value', 'sum', 'payment_value'),))
+PAYMENT_TYPES = Query(
+    'payment_totals', ('payment_type',), (('count', 'sum', 'payments'),), order_by=(('count', True),)
+)
+ORDER_STATUS_SHARE = Query(
+    'facts', ('order_status',), (('percentage', 'share', None),), order_by=(('percentage', True),)
+)
+REVIEW_SCORES = Query('review_totals', ('review_score',), (('count', 'sum', 'reviews'),))
+# Khách hàng (customer_id) được đếm qua các đơn hàng của họ trong bảng fact
+CUSTOMER_STATES = Query(
+    'facts', ('customer_state',), (('customer_count', 'distinct', 'customer_id'),),
+    order_by=(('customer_count', True),)
+)
+SELLER_STATES = Query(
+    'sellers', ('seller_state',), (('seller_count', 'count', None),), order_by=(('seller_count', True),)
+)
+TOP_CITIES = Query(
+    'facts', ('customer_city',), (('customer_count', 'distinct', 'customer_id'),),
+    order_by=(('customer_count', True),)
+)
+
+
+def _dataset_key(data: Dataset) -> str:
+    # Băm bộ dữ liệu theo phiên bản thay vì theo nội dung của hàng triệu dòng
+    return data.version
+
+
+def memoized(func=None, *, sources: Optional[Tuple[str, ...]] = None):
+    """
+    Cache an aggregation by (dataset version, parameters).
+
+    Wraps st.cache_data with a bounded LRU size. The Dataset argument is hashed
+    by its version string, so a cache hit costs a dictionary lookup plus a copy
+    of the (small) aggregated result, and a new data version never serves stale
+    results. With ``sources`` (source table names, see Dataset.version_of) the
+    key only covers those tables, so refreshing other tables keeps the entry.
+    """
+    if func is None:
+        return lambda f: memoized(f, sources=sources)
+    key = (lambda data: data.version_of(*sources)) if sources else _dataset_key
+    cached = st.cache_data(
+        max_entries=AGGREGATION_CACHE_SIZE,
+        show_spinner=False,
+        hash_funcs={Dataset: key}
+    )(func)
+    # Đo cả lần tính toán lẫn lần lấy từ cache
+    return profile(f"aggregation:{func.__name__}")(cached)
+
+
+@memoized(sources=('facts',))
+def date_bounds(data: Dataset):
+    """Return the first and last purchase date as datetime.date objects."""
+    dates = data.facts['date']
+    return dates.min().date(), dates.max().date()
+
+
+def _daily_series(data: Dataset, measure: str, start_date=None, end_date=None) -> pd.Series:
+    """
+    Read a per-day series from the daily cube of the unfiltered data.
+
+    The global filters of ``data`` (date range and order statuses) are applied
+    as a slice of the cube instead of re-aggregating the filtered orders.
+    """
+    cube = daily_cube(data.base or data)
+    filters = data.filters or FilterState()
+    if filters.start_date is not None:
+        start_date = max(start_date, filters.start_date) if start_date is not None else filters.start_date
+    if filters.end_date is not None:
+        end_date = min(end_date, filters.end_date) if end_date is not None else filters.end_date
+    return cube.daily(measure, start_date, end_date, order_status=filters.statuses)
+
+
+@memoized(sources=('facts',))
+def daily_orders(data: Dataset, start_date=None, end_date=None, max_points: Optional[int] = None) -> pd.DataFrame:
+    """
+    Number of orders per purchase day (days with orders only), columns ['date', 'count'].
+
+    With ``max_points`` the series is reduced with LTTB to at most that many
+    days, keeping its peaks; a narrower date range therefore shows more detail.
+    """
+    orders = _daily_series(data, 'orders', start_date, end_date)
+    return downsample(orders[orders > 0].rename('count').reset_index(), 'date', 'count', max_points)
+
+
+@memoized(sources=('facts',))
+def daily_revenue(data: Dataset, start_date=None, end_date=None, max_points: Optional[int] = None) -> pd.DataFrame:
+    """Revenue per purchase day (days with orders only), columns ['date', 'payment_value'], see daily_orders."""
+    orders = _daily_series(data, 'orders', start_date, end_date)
+    revenue = _daily_series(data, 'revenue', start_date, end_date)
+    revenue = revenue[orders > 0].rename('payment_value').reset_index()
+    return downsample(revenue, 'date', 'payment_value', max_points)
+
+
+@memoized(sources=('facts',))
+def hourly_orders(data: Dataset, hour_range=(0, 23)) -> pd.DataFrame:
+    """Number of orders per purchase hour within ``hour_range``, columns ['hour', 'count']."""
+    where = (('hour', '>=', int(hour_range[0])), ('hour', '<=', int(hour_range[1])))
+    return run_query(data, HOURLY_ORDERS._replace(where=where))
+
+
+@memoized(sources=('facts',))
+def monthly_revenue(data: Dataset, max_points: Optional[int] = None) -> pd.DataFrame:
+    """Revenue per purchase month, columns ['month_year', 'payment_value'] (LTTB-reduced to ``max_points``)."""
+    monthly = run_query(data, MONTHLY_REVENUE)
+    return downsample(monthly.rename(columns={'month': 'month_year'}), 'month_year', 'payment_value', max_points)
+
+
+@memoized(sources=('order_payments',))
+def payment_types(data: Dataset) -> pd.DataFrame:
+    """Number of payments per payment type, columns ['payment_type', 'count']."""
+    return run_query(data, PAYMENT_TYPES).astype({'count': 'int64'})
+
+
+@memoized(sources=('facts',))
+def avg_delivery_time(data: Dataset) -> pd.DataFrame:
+    """Mean delivery time in whole days per order status, columns ['order_status', 'delivery_time']."""
+    facts = data.facts
+    delivery_time = np.floor(facts['delivery_days']).rename('delivery_time')
+    return delivery_time.groupby(facts['order_status'], observed=True).mean().reset_index()
+
+
+@memoized(sources=('facts',))
+def order_status_share(data: Dataset) -> pd.DataFrame:
+    """Share of orders per status in percent, columns ['order_status', 'percentage']."""
+    return run_query(data, ORDER_STATUS_SHARE)
+
+
+@memoized(sources=('order_reviews',))
+def review_scores(data: Dataset) -> pd.DataFrame:
+    """Number of reviews per score, columns ['review_score', 'count']."""
+    return run_query(data, REVIEW_SCORES).astype({'count': 'int64'})
+
+
+@memoized(sources=('facts',))
+def delivery_score(data: Dataset) -> pd.DataFrame:
+    """Mean review score per delivery time group, columns ['delivery_time_group', 'review_score']."""
+    facts = data.facts
+    # Chỉ lấy đơn hàng đã giao thành công
+    delivery_review = facts.loc[facts['order_status'] == 'delivered', ['delivery_days', 'review_score']]
+    delivery_review = delivery_review.dropna()
+
+    # Tạo nhóm thời gian giao hàng
+    bins = [0, 5, 10, 15, 20, 30, 100]
+    labels = ['0-5 ngày', '6-10 ngày', '11-15 ngày', '16-20 ngày', '21-30 ngày', '>30 ngày']
+    groups = pd.cut(delivery_review['delivery_days'], bins=bins, labels=labels).rename('delivery_time_group')
+    return delivery_review['review_score'].groupby(groups, observed=False).mean().reset_index()
+
+
+# Nguồn của thống kê danh mục (modules.category_stats): sản phẩm bán ra, bang của khách hàng và người bán
+CATEGORY_SOURCES = ('facts', 'products', 'sellers', 'product_category')
+
+
+@memoized(sources=CATEGORY_SOURCES)
+def category_counts(
+    data: Dataset, top: int = 10, seller_states: Optional[Tuple[str, ...]] = None,
+    customer_states: Optional[Tuple[str, ...]] = None
+) -> pd.DataFrame:
+    """Best-selling categories by items sold, columns ['category', 'count'] (optionally for some states)."""
+    counts = category_stats(data).top('items', top, seller_states=seller_states, customer_states=customer_states)
+    return counts.rename(columns={'items': 'count'})
+
+
+@memoized(sources=CATEGORY_SOURCES)
+def category_price(
+    data: Dataset, top: int = 10, seller_states: Optional[Tuple[str, ...]] = None,
+    customer_states: Optional[Tuple[str, ...]] = None
+) -> pd.DataFrame:
+    """Categories with the highest mean item price, columns ['product_category_name_english', 'price']."""
+    prices = category_stats(data).top('price_mean', top, seller_states=seller_states, customer_states=customer_states)
+    return prices.rename(columns={'category': 'product_category_name_english', 'price_mean': 'price'})
+
+
+@memoized(sources=CATEGORY_SOURCES)
+def category_weight(data: Dataset, top: int = 10) -> pd.DataFrame:
+    """Categories with the highest mean product weight, columns ['product_category_name_english', 'product_weight_g']."""
+    weights = category_stats(data).top('product_weight_g', top)
+    return weights.rename(columns={'category': 'product_category_name_english'})
+
+
+@memoized(sources=('facts',))
+def customer_states(data: Dataset) -> pd.DataFrame:
+    """Number of customers (with orders) per state, columns ['state', 'customer_count']."""
+    return run_query(data, CUSTOMER_STATES).rename(columns={'customer_state': 'state'})
+
+
+@memoized(sources=('sellers',))
+def seller_states(data: Dataset) -> pd.DataFrame:
+    """Number of sellers per state, columns ['state', 'seller_count']."""
+    return run_query(data, SELLER_STATES).rename(columns={'seller_state': 'state'})
+
+
+@memoized(sources=('facts', 'sellers'))
+def combined_states(data: Dataset) -> pd.DataFrame:
+    """Customer and seller counts per state with their ratio."""
+    combined = customer_states(data).merge(seller_states(data), on='state', how='outer').fillna(0)
+    combined['customer_seller_ratio'] = combined['customer_count'] / combined['seller_count'].replace(0, 0.1)
+    return combined
+
+
+@memoized(sources=('olist_geolocation_dataset',))
+def state_locations(data: Dataset) -> pd.DataFrame:
+    """Mean coordinates per state, columns ['geolocation_state', 'geolocation_lat', 'geolocation_lng']."""
+    return zip_lookup(data).state_centroids()
+
+
+def _zip_points(data: Dataset, zips: pd.Series) -> pd.DataFrame:
+    # Đếm theo mã bưu chính rồi tra tọa độ trong bảng tra cứu (không quét bảng geolocation)
+    counts = zips.value_counts()
+    points = zip_lookup(data).locate(counts.index.to_numpy())
+    points.insert(0, 'zip_code_prefix', counts.index.to_numpy())
+    points['count'] = counts.to_numpy()
+    return points.dropna(subset=['lat', 'lng']).reset_index(drop=True)
+
+
+@memoized(sources=('facts', 'olist_geolocation_dataset'))
+def customer_zips(data: Dataset) -> pd.DataFrame:
+    """Number of customers per zip code prefix with its coordinates, columns ['zip_code_prefix', 'lat', 'lng', 'count']."""
+    customers = data.facts.drop_duplicates('customer_id')
+    return _zip_points(data, customers.loc[key_present(customers['customer_id']), 'customer_zip_code_prefix'])
+
+
+@memoized(sources=('sellers', 'olist_geolocation_dataset'))
+def seller_zips(data: Dataset) -> pd.DataFrame:
+    """Number of sellers per zip code prefix with its coordinates, columns ['zip_code_prefix', 'lat', 'lng', 'count']."""
+    return _zip_points(data, data.sellers['seller_zip_code_prefix'])
+
+
+@memoized(sources=('facts',))
+def top_cities(data: Dataset, top: int = 20) -> pd.DataFrame:
+    """Cities with the most customers, columns ['city', 'customer_count']."""
+    return run_query(data, TOP_CITIES._replace(limit=top)).rename(columns={'customer_city': 'city'})
+
+
+@memoized(sources=('facts',))
+def rfm_points(data: Dataset, mode: str = 'sample', max_points: int = SCATTER_POINTS) -> pd.DataFrame:
+    """
+    At most ``max_points`` points of the RFM scatter, with every cluster keeping its share.
+
+    ``mode='sample'`` draws a stratified random sample of customers (column
+    ``weight`` = customers per point); ``mode='voxel'`` merges the customers
+    of each cluster into grid cells (column ``weight`` = customers per cell).
+    Columns: ['Cluster', 'recency', 'frequency', 'monetary', 'weight'].
+
+    Raises:
+        ValueError: If ``mode`` is unknown
+    """
+    customers = rfm_segments(data).customers[['Cluster', *FEATURES]]
+    if mode == 'sample':
+        return stratified_sample(customers, 'Cluster', max_points)
+    if mode == 'voxel':
+        return voxel_reduce(customers, FEATURES, 'Cluster', max_points).rename(columns={'count': 'weight'})
+    raise ValueError(f"Unknown RFM point mode: {mode}")
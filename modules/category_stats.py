@@ -0,0 +1,261 @@
+from typing import Iterable, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+from modules.data_loader import Dataset
+from modules.filters import filter_index
+from modules.frozen import freeze
+from modules.profiler import profile
+
+# Phân vị của giá và phí vận chuyển lưu cho mỗi danh mục
+QUANTILES = (0.25, 0.5, 0.75)
+# Khoảng khối lượng hợp lệ (g); ngoài khoảng này là giá trị bất thường
+WEIGHT_RANGE = (0, 30000)
+# Các chỉ số tính được trên một lát cắt (người bán, bang): cộng dồn được theo ô
+SLICE_MEASURES = ('items', 'price_sum', 'price_mean', 'freight_sum', 'freight_mean')
+DIMENSION_COLUMNS = ('product_length_cm', 'product_height_cm', 'product_width_cm')
+
+
+def top_k(values: np.ndarray, k: int) -> np.ndarray:
+    """
+    Return the positions of the ``k`` largest values, largest first.
+
+    NaN values are skipped and ties are broken by position (the lowest
+    first), so the result equals the head of a stable descending sort.
+    The candidates are found with np.argpartition in O(n); only the (at
+    least ``k``) candidates are sorted.
+
+    Args:
+        values (np.ndarray): 1-D array of measures
+        k (int): Number of positions to return
+
+    Returns:
+        np.ndarray: Up to ``k`` positions into ``values``
+    """
+    valid = np.flatnonzero(~np.isnan(values))
+    if k <= 0:
+        return valid[:0]
+    if k < len(valid):
+        candidates = values[valid]
+        # Giá trị lớn thứ k; giữ mọi phần tử >= ngưỡng để xử lý các giá trị bằng nhau
+        threshold = candidates[np.argpartition(-candidates, k - 1)[k - 1]]
+        valid = valid[candidates >= threshold]
+    order = np.lexsort((valid, -values[valid]))
+    return valid[order[:k]]
+
+
+def _group_quantiles(groups: np.ndarray, values: np.ndarray, n_groups: int, quantiles: Sequence[float]) -> np.ndarray:
+    # Phân vị (nội suy tuyến tính như np.quantile) của ``values`` trong mỗi nhóm, bằng một lần sắp xếp
+    keep = (groups >= 0) & ~np.isnan(values)
+    groups, values = groups[keep], values[keep]
+    order = np.lexsort((values, groups))
+    groups, values = groups[order], values[order]
+    starts = np.searchsorted(groups, np.arange(n_groups))
+    sizes = np.bincount(groups, minlength=n_groups)
+    result = np.full((n_groups, len(quantiles)), np.nan)
+    present = sizes > 0
+    for i, q in enumerate(quantiles):
+        position = q * (sizes[present] - 1)
+        lower = np.floor(position).astype('int64')
+        upper = np.minimum(lower + 1, sizes[present] - 1)
+        fraction = position - lower
+        low_values = values[starts[present] + lower]
+        high_values = values[starts[present] + upper]
+        result[present, i] = low_values + (high_values - low_values) * fraction
+    return result
+
+
+def _mean(sums: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(counts > 0, sums / np.maximum(counts, 1), np.nan)
+
+
+class CategoryStats:
+    """
+    Product category statistics of a dataset, precomputed once per version.
+
+    ``table`` holds one row per category (English name, sorted) with the
+    number of items sold, the sum, mean and quartiles of their price and
+    freight, and the number of catalog products with their mean weight
+    (outliers excluded, see WEIGHT_RANGE), median weight and mean
+    dimensions.
+
+    For sliced queries the items are also aggregated into cells of
+    (category, seller, customer state): count, price sum and freight sum.
+    A slice by sellers, seller states or customer states sums the matching
+    cells per category, so the tab never goes back to the items.
+    """
+
+    def __init__(self, data: Dataset):
+        translation = data.product_category.drop_duplicates('product_category_name')
+        self.categories = pd.Index(np.sort(translation['product_category_name_english'].dropna().unique()))
+        n_categories = len(self.categories)
+        english = translation['product_category_name_english'].to_numpy()
+        category_of_name = pd.Index(translation['product_category_name']).get_indexer(
+            data.products['product_category_name']
+        )
+        # Mã danh mục (vị trí trong ``categories``) của mỗi sản phẩm; -1 nếu không có tên tiếng Anh
+        product_category = np.full(len(data.products), -1, dtype='int64')
+        named = category_of_name >= 0
+        product_category[named] = self.categories.get_indexer(english[category_of_name[named]])
+
+        index = filter_index(data)
+        items = data.item_facts
+        item_category = np.where(
+            index.item_product_pos >= 0, product_category[np.maximum(index.item_product_pos, 0)], -1
+        ) if len(product_category) else np.full(len(items), -1, dtype='int64')
+        price = items['price'].to_numpy(dtype='float64', na_value=np.nan)
+        freight = items['freight_value'].to_numpy(dtype='float64', na_value=np.nan)
+
+        sold = item_category >= 0
+        counts = np.bincount(item_category[sold], minlength=n_categories)
+        columns = {'category': pd.Series(self.categories, dtype=str), 'items': counts}
+        for name, values in (('price', price), ('freight', freight)):
+            present = sold & ~np.isnan(values)
+            sums = np.bincount(item_category[present], weights=values[present], minlength=n_categories)
+            columns[f"{name}_sum"] = sums
+            columns[f"{name}_mean"] = _mean(sums, np.bincount(item_category[present], minlength=n_categories))
+            quantiles = _group_quantiles(item_category, values, n_categories, QUANTILES)
+            for i, q in enumerate(QUANTILES):
+                columns[f"{name}_p{int(q * 100)}"] = quantiles[:, i]
+
+        products = data.products
+        columns['products'] = np.bincount(product_category[product_category >= 0], minlength=n_categories)
+        weight = products['product_weight_g'].to_numpy(dtype='float64', na_value=np.nan)
+        valid_weight = (product_category >= 0) & (weight > WEIGHT_RANGE[0]) & (weight < WEIGHT_RANGE[1])
+        columns['product_weight_g'] = _mean(
+            np.bincount(product_category[valid_weight], weights=weight[valid_weight], minlength=n_categories),
+            np.bincount(product_category[valid_weight], minlength=n_categories)
+        )
+        columns['weight_median'] = _group_quantiles(product_category, weight, n_categories, (0.5,))[:, 0]
+        for column in DIMENSION_COLUMNS:
+            values = products[column].to_numpy(dtype='float64', na_value=np.nan)
+            present = (product_category >= 0) & ~np.isnan(values)
+            columns[column] = _mean(
+                np.bincount(product_category[present], weights=values[present], minlength=n_categories),
+                np.bincount(product_category[present], minlength=n_categories)
+            )
+        self.table = freeze(pd.DataFrame(columns))
+
+        # Ô (danh mục, người bán, bang của khách hàng) cho các truy vấn theo lát cắt
+        sellers = data.sellers
+        seller_ids = sellers['seller_id']
+        self.seller_ids = pd.Index(data.decode('seller_id', seller_ids) if data.keys else seller_ids)
+        seller_state = sellers['seller_state'].astype('category')
+        self.seller_states = list(seller_state.cat.categories)
+        self._seller_state = seller_state.cat.codes.to_numpy().astype('int64')
+        customer_state = data.facts['customer_state'].astype('category')
+        self.customer_states = list(customer_state.cat.categories)
+        item_customer_state = np.where(
+            index.item_order_pos >= 0,
+            customer_state.cat.codes.to_numpy().astype('int64')[np.maximum(index.item_order_pos, 0)], -1
+        ) if len(customer_state) else np.full(len(items), -1, dtype='int64')
+        # Mã 0 dành cho người bán / bang không xác định
+        seller_code = index.item_seller_pos[sold] + 1
+        state_code = item_customer_state[sold] + 1
+        n_sellers, n_states = len(sellers) + 1, len(self.customer_states) + 1
+        cell_key = (item_category[sold] * n_sellers + seller_code) * n_states + state_code
+        cells, cell_index = np.unique(cell_key, return_inverse=True)
+        cell_index = cell_index.reshape(-1)
+        self.cell_category = cells // (n_sellers * n_states)
+        self.cell_seller = (cells // n_states) % n_sellers - 1
+        self.cell_customer_state = cells % n_states - 1
+        self.cell_items = np.bincount(cell_index, minlength=len(cells))
+        self.cell_sums = {}
+        for name, values in (('price', price[sold]), ('freight', freight[sold])):
+            present = ~np.isnan(values)
+            self.cell_sums[name] = np.bincount(cell_index[present], weights=values[present], minlength=len(cells))
+            self.cell_sums[f"{name}_count"] = np.bincount(cell_index[present], minlength=len(cells))
+
+    def _cell_mask(
+        self,
+        sellers: Optional[Iterable[str]],
+        seller_states: Optional[Iterable[str]],
+        customer_states: Optional[Iterable[str]]
+    ) -> np.ndarray:
+        mask = np.ones(len(self.cell_category), dtype=bool)
+        if sellers is not None:
+            positions = self.seller_ids.get_indexer(pd.Index(list(sellers)))
+            mask &= np.isin(self.cell_seller, positions[positions >= 0])
+        if seller_states is not None:
+            allowed = np.isin(self.seller_states, list(seller_states))
+            # Người bán không xác định (-1) không thuộc bang nào
+            state = np.where(self.cell_seller >= 0, self._seller_state[np.maximum(self.cell_seller, 0)], -1)
+            mask &= (state >= 0) & allowed[np.maximum(state, 0)]
+        if customer_states is not None:
+            allowed = np.isin(self.customer_states, list(customer_states))
+            mask &= (self.cell_customer_state >= 0) & allowed[np.maximum(self.cell_customer_state, 0)]
+        return mask
+
+    def sliced(
+        self,
+        sellers: Optional[Iterable[str]] = None,
+        seller_states: Optional[Iterable[str]] = None,
+        customer_states: Optional[Iterable[str]] = None
+    ) -> pd.DataFrame:
+        """
+        Return the item measures (SLICE_MEASURES) per category for a slice of the items.
+
+        Args:
+            sellers (Optional[Iterable[str]]): Seller IDs; None means all sellers
+            seller_states (Optional[Iterable[str]]): Seller states (UF); None means all
+            customer_states (Optional[Iterable[str]]): Customer states (UF); None means all
+
+        Returns:
+            pd.DataFrame: Columns ['category', *SLICE_MEASURES], one row per category
+        """
+        if sellers is None and seller_states is None and customer_states is None:
+            return self.table[['category', *SLICE_MEASURES]]
+        mask = self._cell_mask(sellers, seller_states, customer_states)
+        n_categories = len(self.categories)
+        category = self.cell_category[mask]
+
+        def total(values):
+            return np.bincount(category, weights=values[mask], minlength=n_categories)
+
+        columns = {
+            'category': self.table['category'],
+            'items': total(self.cell_items).astype('int64'),
+        }
+        for name in ('price', 'freight'):
+            columns[f"{name}_sum"] = total(self.cell_sums[name])
+            columns[f"{name}_mean"] = _mean(columns[f"{name}_sum"], total(self.cell_sums[f"{name}_count"]))
+        return pd.DataFrame(columns)
+
+    def top(self, measure: str, k: int = 10, **slices) -> pd.DataFrame:
+        """
+        Return the ``k`` categories with the largest ``measure``.
+
+        Args:
+            measure (str): Column of ``table``; with slices, one of SLICE_MEASURES
+            k (int): Number of categories
+            **slices: ``sellers``, ``seller_states`` and/or ``customer_states``, see sliced()
+
+        Returns:
+            pd.DataFrame: Columns ['category', measure], largest first (ties by category name);
+            categories without items are left out
+
+        Raises:
+            ValueError: If ``measure`` cannot be computed for a slice
+        """
+        if any(value is not None for value in slices.values()) and measure not in SLICE_MEASURES:
+            raise ValueError(f"Measure {measure!r} is not available for sliced queries; use one of {SLICE_MEASURES}")
+        frame = self.sliced(**slices) if measure in SLICE_MEASURES else self.table
+        values = frame[measure].to_numpy(dtype='float64')
+        if measure in SLICE_MEASURES:
+            # Danh mục không có sản phẩm nào được bán trong lát cắt
+            values = np.where(frame['items'].to_numpy() > 0, values, np.nan)
+        positions = top_k(values, k)
+        result = frame[['category', measure]].iloc[positions].reset_index(drop=True)
+        return result.astype({measure: 'int64' if measure == 'items' else 'float64'})
+
+
+@st.cache_resource(
+    max_entries=4, show_spinner=False,
+    hash_funcs={Dataset: lambda d: d.version_of('facts', 'products', 'sellers', 'product_category')}
+)
+def category_stats(data: Dataset) -> CategoryStats:
+    """Return the CategoryStats of ``data`` (filtered or not), built once per data version."""
+    with profile('category_stats:build'):
+        return CategoryStats(data)
@@ -0,0 +1,221 @@
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+from modules.data_loader import Dataset
+from modules.keys import key_present
+
+MEASURES = ('orders', 'revenue', 'customers', 'items')
+DIMENSIONS = ('customer_state', 'order_status', 'payment_type')
+
+
+class DailyCube:
+    """
+    Pre-aggregated order measures by day x state x status x payment type.
+
+    Only the (state, status, payment type) combinations that occur in the data
+    are stored, as columns of a (days + 1, combinations) prefix-sum array per
+    measure. The total of a measure over any date range is therefore the
+    difference of two rows (O(1) in the number of days), and the per-day
+    series of a range is the difference of two consecutive row slices.
+
+    Measures:
+        - orders: Number of orders
+        - revenue: Sum of payment values
+        - customers: Distinct customers per day and combination (a customer
+          ordering on several days is counted once per day)
+        - items: Number of order items
+    """
+
+    def __init__(self, facts: pd.DataFrame):
+        dates = facts['date']
+        self.start = dates.min()
+        n_days = int((dates.max() - self.start) / pd.Timedelta(days=1)) + 1 if len(facts) else 0
+        day = ((dates - self.start) / pd.Timedelta(days=1)).to_numpy(dtype='float64')
+        valid = ~np.isnan(day)
+        day = day[valid].astype(np.int64)
+        self.days = pd.date_range(self.start, periods=n_days, freq='D')
+
+        # Mã của từng chiều; mã 0 dành cho giá trị thiếu
+        self.labels: Dict[str, list] = {}
+        combo = np.zeros(valid.sum(), dtype=np.int64)
+        for dim in DIMENSIONS:
+            values = facts[dim].astype('category')
+            self.labels[dim] = [None] + list(values.cat.categories)
+            codes = values.cat.codes.to_numpy()[valid].astype(np.int64) + 1
+            combo = combo * len(self.labels[dim]) + codes
+        combos, combo_idx = np.unique(combo, return_inverse=True)
+        self.combo_codes = self._decode(combos)
+        n_combos = len(combos)
+
+        cell = day * n_combos + combo_idx.reshape(-1)
+        size = n_days * n_combos
+        values = {
+            'orders': np.bincount(cell, minlength=size),
+            'revenue': np.bincount(cell, weights=facts['payment_value'].fillna(0).to_numpy()[valid], minlength=size),
+            'items': np.bincount(cell, weights=facts['item_count'].to_numpy()[valid], minlength=size),
+        }
+        # Đếm khách hàng phân biệt trong mỗi ô bằng các cặp (ô, khách hàng) duy nhất
+        customer_codes, customer_uniques = pd.factorize(facts['customer_unique_id'])
+        customer_codes = customer_codes[valid]
+        known = (customer_codes >= 0) & key_present(facts['customer_unique_id']).to_numpy()[valid]
+        n_customers = max(len(customer_uniques), 1)
+        pairs = np.unique(cell[known] * n_customers + customer_codes[known])
+        values['customers'] = np.bincount(pairs // n_customers, minlength=size)
+
+        self._set_values({measure: flat.reshape(n_days, n_combos) for measure, flat in values.items()})
+
+    def _set_values(self, values: Dict[str, np.ndarray]) -> None:
+        # Lưu tổng tích lũy theo ngày của ma trận (ngày, tổ hợp) của mỗi chỉ số
+        self.prefix = {}
+        for measure, daily in values.items():
+            dtype = np.float64 if measure == 'revenue' else np.int64
+            prefix = np.zeros((daily.shape[0] + 1, daily.shape[1]), dtype=dtype)
+            np.cumsum(daily, axis=0, out=prefix[1:])
+            self.prefix[measure] = prefix
+
+    def _combos_in(self, labels: Dict[str, list]) -> np.ndarray:
+        # Mã tổ hợp của cube này trong không gian nhãn ``labels`` (chứa mọi nhãn của cube)
+        combos = np.zeros(len(self.combo_codes[DIMENSIONS[0]]), dtype=np.int64)
+        for dim in DIMENSIONS:
+            mapping = np.array([labels[dim].index(label) for label in self.labels[dim]], dtype=np.int64)
+            combos = combos * len(labels[dim]) + mapping[self.combo_codes[dim]]
+        return combos
+
+    def updated(self, facts: pd.DataFrame, dates) -> 'DailyCube':
+        """
+        Return a copy of the cube in which the days ``dates`` are re-aggregated from ``facts``.
+
+        Used after an incremental refresh: only the orders of the changed
+        days are aggregated again, the other days are taken from this cube.
+
+        Args:
+            facts (pd.DataFrame): Current fact table
+            dates (array-like): Purchase days whose orders changed
+
+        Returns:
+            DailyCube: Cube equal to DailyCube(facts) if every changed order
+            lies on one of ``dates``
+        """
+        dates = pd.DatetimeIndex(dates).dropna().normalize().unique()
+        if not len(dates) or not len(self.days):
+            return self if not len(dates) else DailyCube(facts)
+        changed = DailyCube(facts[facts['date'].isin(dates)])
+
+        cube = DailyCube.__new__(DailyCube)
+        cube.labels = {
+            dim: self.labels[dim] + [label for label in changed.labels[dim] if label not in self.labels[dim]]
+            for dim in DIMENSIONS
+        }
+        parts = [self] + ([changed] if len(changed.days) else [])
+        cube.start = min(part.start for part in parts)
+        end = max(part.days[-1] for part in parts)
+        cube.days = pd.date_range(cube.start, end, freq='D')
+        part_combos = [part._combos_in(cube.labels) for part in parts]
+        combos, inverse = np.unique(np.concatenate(part_combos), return_inverse=True)
+        cube.combo_codes = cube._decode(combos)
+        columns = np.split(inverse.reshape(-1), np.cumsum([len(c) for c in part_combos])[:-1])
+
+        # Các ngày thay đổi được tính lại hoàn toàn từ bảng fact hiện tại
+        changed_rows = (dates - cube.start).days.to_numpy()
+        changed_rows = changed_rows[(changed_rows >= 0) & (changed_rows < len(cube.days))]
+        values = {}
+        for measure in MEASURES:
+            daily = np.zeros((len(cube.days), len(combos)), dtype=self.prefix[measure].dtype)
+            for i, (part, cols) in enumerate(zip(parts, columns)):
+                first = (part.start - cube.start).days
+                part_daily = np.diff(part.prefix[measure], axis=0)
+                block = daily[first:first + len(part.days)]
+                if i == 0:
+                    block[:, cols] = part_daily
+                    daily[changed_rows] = 0
+                else:
+                    block[:, cols] += part_daily
+            values[measure] = daily
+        cube._set_values(values)
+        return cube
+
+    def _decode(self, combos: np.ndarray) -> Dict[str, np.ndarray]:
+        codes = {}
+        for dim in reversed(DIMENSIONS):
+            size = len(self.labels[dim])
+            codes[dim] = combos % size
+            combos = combos // size
+        return codes
+
+    def combo_mask(self, **selection: Optional[Iterable[str]]) -> np.ndarray:
+        """
+        Return a boolean mask over the stored combinations.
+
+        Args:
+            **selection: Allowed values per dimension, e.g.
+                order_status=('delivered',); None or missing means all values
+
+        Returns:
+            np.ndarray: True for the combinations matching every selection
+        """
+        mask = np.ones(len(self.combo_codes[DIMENSIONS[0]]), dtype=bool)
+        for dim, allowed in selection.items():
+            if allowed is None:
+                continue
+            allowed = set(allowed)
+            allowed_codes = [i for i, label in enumerate(self.labels[dim]) if label in allowed]
+            mask &= np.isin(self.combo_codes[dim], allowed_codes)
+        return mask
+
+    def _day_range(self, start_date, end_date):
+        first = 0 if start_date is None else (pd.Timestamp(start_date) - self.start).days
+        last = len(self.days) - 1 if end_date is None else (pd.Timestamp(end_date) - self.start).days
+        return max(first, 0), min(last, len(self.days) - 1)
+
+    def total(self, measure: str, start_date=None, end_date=None, **selection) -> float:
+        """Return the total of ``measure`` over an inclusive date range and selection."""
+        first, last = self._day_range(start_date, end_date)
+        if first > last:
+            return 0
+        prefix = self.prefix[measure]
+        mask = self.combo_mask(**selection)
+        return (prefix[last + 1, mask] - prefix[first, mask]).sum()
+
+    def daily(self, measure: str, start_date=None, end_date=None, **selection) -> pd.Series:
+        """Return the per-day values of ``measure`` over an inclusive date range and selection."""
+        first, last = self._day_range(start_date, end_date)
+        if first > last:
+            return pd.Series(dtype='float64', index=pd.DatetimeIndex([], name='date'), name=measure)
+        prefix = self.prefix[measure][first:last + 2][:, self.combo_mask(**selection)].sum(axis=1)
+        values = np.diff(prefix)
+        return pd.Series(values, index=self.days[first:last + 1].rename('date'), name=measure)
+
+
+@st.cache_resource(show_spinner=False)
+def _latest_cubes() -> 'OrderedDict[str, DailyCube]':
+    # Cube được tạo gần nhất (theo phiên bản bảng fact), dùng làm điểm xuất phát khi cập nhật
+    return OrderedDict()
+
+
+_latest_lock = threading.Lock()
+
+
+@st.cache_resource(max_entries=2, show_spinner=False, hash_funcs={Dataset: lambda d: d.version_of('facts')})
+def daily_cube(data: Dataset) -> DailyCube:
+    """
+    Return the DailyCube of the unfiltered dataset, built once per fact table version.
+
+    If the fact table was updated with appended rows (``data.changes``) and
+    the cube of the previous version is still in memory, only the changed
+    days are aggregated again.
+    """
+    latest = _latest_cubes()
+    with _latest_lock:
+        previous = latest.get(data.changes.previous_version) if data.changes is not None else None
+    if previous is not None:
+        cube = previous.updated(data.facts, data.changes.dates)
+    else:
+        cube = DailyCube(data.facts)
+    with _latest_lock:
+        latest.clear()
+        latest[data.version_of('facts')] = cube
+    return cube
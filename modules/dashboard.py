@@ -1,50 +1,100 @@
 import streamlit as st
-import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
+from modules import aggregations as agg
+from modules.category_stats import category_stats
+from modules.downsample import MAX_POINTS, SCATTER_POINTS
+from modules.figure_cache import cached_figure
+from modules.geo_shapes import BRAZIL_BOUNDS, fit_zoom, state_geojson
+from modules.geo_tiles import HEATMAP_POINTS, geolocation_tiles
+from modules.kpi_engine import kpi_values
 from modules.kpis import display_kpis
+from modules.profiler import profile
+from modules.rfm import rfm_segments
 
+# Các mức ngân sách điểm cho biểu đồ RFM 3D
+RFM_POINT_BUDGETS = (1000, 2500, 5000, 10000, 20000)
+# Lựa chọn hiển thị của bản đồ chi tiết (lựa chọn đầu tiên là mặc định)
+DETAIL_MAP_OPTIONS = ("Cả khách hàng và người bán", "Chỉ khách hàng", "Chỉ người bán")
+# Chiều rộng (px) giả định của bản đồ, dùng để chọn mức zoom vừa khung hình
+MAP_WIDTH = 700
 
-def create_dashboard(orders, order_items, products, customers, order_payments, order_reviews, sellers, product_category, olist_geolocation_dataset, RFM_log_scaled_df=None):
-    # Tạo tabs để phân chia các nhóm phân tích
-    tab1, tab2, tab3, tab4, tab5 = st.tabs(["Tổng quan", "Phân tích bán hàng", "Phân tích khách hàng", "Phân tích sản phẩm", "Bản đồ phân bố"])
-    
-    with tab1:
-        st.header("Tổng quan về dữ liệu")
-        
-        display_kpis(orders, customers, products, sellers, order_payments)
-        st.subheader("Phân tích đơn hàng và doanh thu theo khoảng thời gian")
-        
-        # Chuẩn bị dữ liệu
-        orders['date'] = orders['order_purchase_timestamp'].dt.date
-        daily_orders = orders.groupby('date').size().reset_index(name='count')
-        daily_orders['date'] = pd.to_datetime(daily_orders['date'])
-        
-        payment_values = order_payments.groupby('order_id')['payment_value'].sum().reset_index()
-        orders_with_payment = orders.merge(payment_values, on='order_id', how='left')
-        orders_with_payment['date'] = orders_with_payment['order_purchase_timestamp'].dt.date
-        daily_revenue = orders_with_payment.groupby('date')['payment_value'].sum().reset_index()
-        daily_revenue['date'] = pd.to_datetime(daily_revenue['date'])
-        
-        # Tạo date picker
-        min_date = daily_orders['date'].min().date()
-        max_date = daily_orders['date'].max().date()
-        
-        col1, col2 = st.columns(2)
-        with col1:
-            start_date = st.date_input("Từ ngày", min_date, min_value=min_date, max_value=max_date)
-        with col2:
-            end_date = st.date_input("Đến ngày", max_date, min_value=min_date, max_value=max_date)
-        
-        # Lọc dữ liệu
-        filtered_data = daily_orders[(daily_orders['date'] >= pd.to_datetime(start_date)) & 
-                                   (daily_orders['date'] <= pd.to_datetime(end_date))]
-        filtered_revenue = daily_revenue[(daily_revenue['date'] >= pd.to_datetime(start_date)) & 
-                                       (daily_revenue['date'] <= pd.to_datetime(end_date))]
-        
-        # Tạo biểu đồ kết hợp
+
+def create_dashboard(data, lazy=True):
+    """
+    Render the dashboard sections from the shared dataset.
+
+    Order-level charts aggregate the precomputed fact table ``data.facts``
+    (orders joined with payment totals, review scores and customer location)
+    instead of merging the raw tables on every rerun. Figures are built once
+    per (chart, dataset version, parameters) and served from the shared
+    figure cache afterwards.
+
+    With ``lazy=True`` (default) the sections are chosen with a horizontal
+    radio navigation and only the selected section, and only the selected
+    sub-section of the map section, is computed and rendered on each rerun.
+    With ``lazy=False`` all sections are rendered eagerly inside st.tabs.
+
+    Args:
+        data (Dataset): Shared dataset returned by modules.data_loader.get_dataset()
+        lazy (bool): Render only the selected section
+    """
+    sections = {
+        "Tổng quan": render_overview,
+        "Phân tích bán hàng": render_sales,
+        "Phân tích khách hàng": render_customers,
+        "Phân tích sản phẩm": render_products,
+        "Bản đồ phân bố": lambda d: render_maps(d, lazy=lazy),
+    }
+    _render_sections(sections, 'dashboard_section', lazy, data)
+
+
+def _render_sections(sections, key, lazy, *args):
+    """Render a dict of {label: render function} as lazy navigation or eager tabs."""
+    if lazy:
+        # Chỉ tính toán và vẽ mục đang được chọn
+        selected = st.radio(
+            "Chọn mục phân tích",
+            list(sections),
+            horizontal=True,
+            key=key,
+            label_visibility="collapsed"
+        )
+        with profile(f"section:{selected}", rows=len(args[0].facts)):
+            sections[selected](*args)
+    else:
+        for (label, render), tab in zip(sections.items(), st.tabs(list(sections))):
+            with tab, profile(f"section:{label}", rows=len(args[0].facts)):
+                render(*args)
+
+
+def _recall(key, default):
+    """Return the last value of a widget that may not have been rendered in the previous run."""
+    return st.session_state.get(f"_saved_{key}", default)
+
+
+def _remember(key, value):
+    """
+    Save a widget value so it survives while its section is not displayed.
+
+    Streamlit drops the state of widgets that are not rendered in a run, which
+    happens to every widget of a deferred section in lazy navigation.
+    """
+    st.session_state[f"_saved_{key}"] = value
+    return value
+
+
+def overview_daily_figure(data, start_date, end_date):
+    """Daily revenue and order counts from ``start_date`` to ``end_date``."""
+    # Lấy dữ liệu theo ngày đã tổng hợp sẵn cho khoảng thời gian được chọn
+    # (rút gọn còn tối đa MAX_POINTS điểm, giữ nguyên các đỉnh; thu hẹp khoảng ngày để xem chi tiết)
+    filtered_data = agg.daily_orders(data, start_date, end_date, max_points=MAX_POINTS)
+    filtered_revenue = agg.daily_revenue(data, start_date, end_date, max_points=MAX_POINTS)
+
+    # Tạo biểu đồ kết hợp
+    def build():
         fig = go.Figure()
-        
+
         # Thêm dữ liệu doanh thu và số lượng đơn hàng
         fig.add_trace(
             go.Scatter(
@@ -55,7 +105,7 @@ def create_dashboard(orders, order_items, products, customers, order_payments, o
                 line=dict(color='#19D3F3', width=2)
             )
         )
-        
+
         fig.add_trace(
             go.Scatter(
                 x=filtered_data['date'],
@@ -66,7 +116,7 @@ def create_dashboard(orders, order_items, products, customers, order_payments, o
                 yaxis='y2'
             )
         )
-        
+
         # Cấu hình layout
         fig.update_layout(
             title=f"So sánh doanh thu và số lượng đơn hàng từ {start_date} đến {end_date}",
@@ -103,19 +153,16 @@ def create_dashboard(orders, order_items, products, customers, order_payments, o
                 x=1
             )
         )
-        st.plotly_chart(fig, use_container_width=True)
-        
-        # Phân tích theo giờ trong ngày
-        st.subheader("Phân tích đơn hàng theo giờ trong ngày")
-        
-        orders['hour'] = orders['order_purchase_timestamp'].dt.hour
-        hourly_orders = orders.groupby('hour').size().reset_index(name='count')
-        
-        hour_range = st.slider("Chọn khoảng giờ", 0, 23, (0, 23), 1)
-        
-        filtered_hours = hourly_orders[(hourly_orders['hour'] >= hour_range[0]) & 
-                                     (hourly_orders['hour'] <= hour_range[1])]
-        
+        return fig
+
+    return cached_figure('overview_daily', data, build, sources=('facts',), start_date=start_date, end_date=end_date)
+
+
+def overview_hourly_figure(data, hour_range=(0, 23)):
+    """Orders per hour of the day within ``hour_range``."""
+    filtered_hours = agg.hourly_orders(data, hour_range)
+
+    def build():
         fig = px.bar(
             filtered_hours,
             x='hour',
@@ -125,26 +172,54 @@ def create_dashboard(orders, order_items, products, customers, order_payments, o
             color='count',
             color_continuous_scale=px.colors.sequential.Viridis
         )
-        st.plotly_chart(fig, use_container_width=True)
-    
-    with tab2:
-        pass
-        st.header("Phân tích bán hàng")
-
-        ### 1. Phân tích doanh thu theo tháng
-        st.subheader("Doanh thu theo tháng")
-        
-        # Tính tổng giá trị đơn hàng
-        payment_values = order_payments.groupby('order_id')['payment_value'].sum().reset_index()
-        merged_data = orders.merge(payment_values, on='order_id', how='left')
-        
-        # Tạo dữ liệu doanh thu theo tháng
-        merged_data['month_year'] = merged_data['order_purchase_timestamp'].dt.strftime('%Y-%m')
-        monthly_revenue = merged_data.groupby('month_year')['payment_value'].sum().reset_index()
-        monthly_revenue['month_year'] = pd.to_datetime(monthly_revenue['month_year'] + '-01')
-        monthly_revenue = monthly_revenue.sort_values('month_year')
-        
-        # Vẽ biểu đồ doanh thu theo tháng
+        return fig
+
+    return cached_figure('overview_hourly', data, build, sources=('facts',), hour_range=hour_range)
+
+
+def render_overview(data):
+    """Section "Tổng quan": KPIs, daily orders/revenue and orders by hour."""
+    st.header("Tổng quan về dữ liệu")
+
+    display_kpis(kpi_values(data))
+    st.subheader("Phân tích đơn hàng và doanh thu theo khoảng thời gian")
+
+    # Tạo date picker (giá trị đã chọn trước đó được giới hạn lại theo bộ lọc toàn cục)
+    min_date, max_date = agg.date_bounds(data)
+    recalled_start = min(max(_recall('overview_start_date', min_date), min_date), max_date)
+    recalled_end = min(max(_recall('overview_end_date', max_date), min_date), max_date)
+
+    col1, col2 = st.columns(2)
+    with col1:
+        start_date = _remember('overview_start_date', st.date_input(
+            "Từ ngày", recalled_start, min_value=min_date, max_value=max_date
+        ))
+    with col2:
+        end_date = _remember('overview_end_date', st.date_input(
+            "Đến ngày", recalled_end, min_value=min_date, max_value=max_date
+        ))
+
+    fig = overview_daily_figure(data, start_date, end_date)
+    st.plotly_chart(fig, use_container_width=True)
+
+    # Phân tích theo giờ trong ngày
+    st.subheader("Phân tích đơn hàng theo giờ trong ngày")
+
+    hour_range = _remember('overview_hour_range', st.slider(
+        "Chọn khoảng giờ", 0, 23, _recall('overview_hour_range', (0, 23)), 1
+    ))
+
+    fig = overview_hourly_figure(data, hour_range)
+    st.plotly_chart(fig, use_container_width=True)
+
+
+def monthly_revenue_figure(data):
+    """Revenue per month."""
+    # Tạo dữ liệu doanh thu theo tháng
+    monthly_revenue = agg.monthly_revenue(data, max_points=MAX_POINTS)
+
+    # Vẽ biểu đồ doanh thu theo tháng
+    def build():
         fig = px.line(
             monthly_revenue,
             x='month_year',
@@ -152,16 +227,18 @@ def create_dashboard(orders, order_items, products, customers, order_payments, o
             title="Doanh thu theo tháng",
             labels={'month_year': 'Tháng', 'payment_value': 'Doanh thu (R$)'}
         )
-        st.plotly_chart(fig, use_container_width=True)
-        
-        ### 2. Phân tích phương thức thanh toán
-        st.subheader("Phương thức thanh toán")
-        
-        # Phân tích số lượng đơn hàng theo phương thức thanh toán
-        payment_types = order_payments['payment_type'].value_counts().reset_index()
-        payment_types.columns = ['payment_type', 'count']
-        
-        # Vẽ biểu đồ phương thức thanh toán
+        return fig
+
+    return cached_figure('monthly_revenue', data, build, sources=('facts',))
+
+
+def payment_types_figure(data):
+    """Orders per payment type."""
+    # Phân tích số lượng đơn hàng theo phương thức thanh toán
+    payment_types = agg.payment_types(data)
+
+    # Vẽ biểu đồ phương thức thanh toán
+    def build():
         fig = px.bar(
             payment_types,
             x='payment_type',
@@ -170,18 +247,18 @@ def create_dashboard(orders, order_items, products, customers, order_payments, o
             labels={'payment_type': 'Phương thức thanh toán', 'count': 'Số lượng'},
             color='payment_type'
         )
-        st.plotly_chart(fig, use_container_width=True)
-        
-        ### 5. Phân tích thời gian giao hàng
-        st.subheader("Thời gian giao hàng trung bình")
-        
-        # Tính thời gian giao hàng
-        merged_data['delivery_time'] = (merged_data['order_delivered_customer_date'] - merged_data['order_purchase_timestamp']).dt.days
-        
-        # Thời gian giao hàng trung bình theo trạng thái đơn hàng
-        avg_delivery_time = merged_data.groupby('order_status')['delivery_time'].mean().reset_index()
-        
-        # Vẽ biểu đồ thời gian giao hàng
+        return fig
+
+    return cached_figure('payment_types', data, build, sources=('order_payments',))
+
+
+def avg_delivery_time_figure(data):
+    """Average delivery time per order status."""
+    # Thời gian giao hàng (số ngày tròn) trung bình theo trạng thái đơn hàng
+    avg_delivery_time = agg.avg_delivery_time(data)
+
+    # Vẽ biểu đồ thời gian giao hàng
+    def build():
         fig = px.bar(
             avg_delivery_time,
             x='order_status',
@@ -191,16 +268,18 @@ def create_dashboard(orders, order_items, products, customers, order_payments, o
             color='delivery_time',
             color_continuous_scale=px.colors.sequential.Viridis
         )
-        st.plotly_chart(fig, use_container_width=True)
-        ### 7. Phân tích tỷ lệ huỷ đơn hàng
-        st.subheader("Tỷ lệ trạng thái đơn hàng")
-        
-        # Tính số lượng và tỷ lệ huỷ đơn hàng
-        order_status_counts = merged_data['order_status'].value_counts(normalize=True).reset_index()
-        order_status_counts.columns = ['order_status', 'percentage']
-        order_status_counts['percentage'] *= 100  # Đổi thành %
-        
-        # Vẽ biểu đồ tỷ lệ trạng thái đơn hàng
+        return fig
+
+    return cached_figure('avg_delivery_time', data, build, sources=('facts',))
+
+
+def order_status_share_figure(data):
+    """Share of each order status."""
+    # Tính số lượng và tỷ lệ huỷ đơn hàng
+    order_status_counts = agg.order_status_share(data)
+
+    # Vẽ biểu đồ tỷ lệ trạng thái đơn hàng
+    def build():
         fig = px.pie(
             order_status_counts,
             names='order_status',
@@ -209,17 +288,44 @@ def create_dashboard(orders, order_items, products, customers, order_payments, o
             color='order_status',
             color_discrete_sequence=px.colors.sequential.RdBu
         )
-        st.plotly_chart(fig, use_container_width=True)
+        return fig
+
+    return cached_figure('order_status_share', data, build, sources=('facts',))
+
+
+def render_sales(data):
+    """Section "Phân tích bán hàng": monthly revenue, payment types and order status."""
+    st.header("Phân tích bán hàng")
+
+    ### 1. Phân tích doanh thu theo tháng
+    st.subheader("Doanh thu theo tháng")
+
+    fig = monthly_revenue_figure(data)
+    st.plotly_chart(fig, use_container_width=True)
+
+    ### 2. Phân tích phương thức thanh toán
+    st.subheader("Phương thức thanh toán")
+
+    fig = payment_types_figure(data)
+    st.plotly_chart(fig, use_container_width=True)
+
+    ### 5. Phân tích thời gian giao hàng
+    st.subheader("Thời gian giao hàng trung bình")
+
+    fig = avg_delivery_time_figure(data)
+    st.plotly_chart(fig, use_container_width=True)
+    ### 7. Phân tích tỷ lệ huỷ đơn hàng
+    st.subheader("Tỷ lệ trạng thái đơn hàng")
 
-    
-    with tab3:
-        st.header("Phân tích khách hàng")
-        
-        # Phân tích đánh giá khách hàng
-        st.subheader("Đánh giá của khách hàng")
-        review_scores = order_reviews['review_score'].value_counts().sort_index().reset_index()
-        review_scores.columns = ['review_score', 'count']
-        
+    fig = order_status_share_figure(data)
+    st.plotly_chart(fig, use_container_width=True)
+
+
+def review_scores_figure(data):
+    """Distribution of the review scores."""
+    review_scores = agg.review_scores(data)
+
+    def build():
         fig = px.bar(
             review_scores,
             x='review_score',
@@ -229,33 +335,17 @@ def create_dashboard(orders, order_items, products, customers, order_payments, o
             color='review_score',
             color_continuous_scale=px.colors.sequential.RdBu
         )
-        st.plotly_chart(fig, use_container_width=True)
-        
-        # Phân tích thời gian giao hàng và ảnh hưởng đến đánh giá
-        st.subheader("Thời gian giao hàng và ảnh hưởng đến đánh giá")
-        
-        # Tính thời gian giao hàng (ngày)
-        delivery_time = orders.copy()
-    # Trong phần phân tích thời gian giao hàng
-        if 'order_delivered_customer_date' in delivery_time.columns and 'order_purchase_timestamp' in delivery_time.columns:
-            delivery_time['delivery_time'] = (delivery_time['order_delivered_customer_date'] - 
-                                            delivery_time['order_purchase_timestamp']).dt.total_seconds() / (24*60*60)
-            
-        # Chỉ lấy đơn hàng đã giao thành công
-        delivery_time = delivery_time[delivery_time['order_status'] == 'delivered']
-        
-        # Kết hợp với đánh giá
-        delivery_review = delivery_time.merge(order_reviews[['order_id', 'review_score']], on='order_id', how='left')
-        delivery_review = delivery_review.dropna(subset=['delivery_time', 'review_score'])
-        
-        # Tạo nhóm thời gian giao hàng
-        bins = [0, 5, 10, 15, 20, 30, 100]
-        labels = ['0-5 ngày', '6-10 ngày', '11-15 ngày', '16-20 ngày', '21-30 ngày', '>30 ngày']
-        delivery_review['delivery_time_group'] = pd.cut(delivery_review['delivery_time'], bins=bins, labels=labels)
-        
-        # Tính điểm đánh giá trung bình cho mỗi nhóm
-        delivery_score = delivery_review.groupby('delivery_time_group')['review_score'].mean().reset_index()
-        
+        return fig
+
+    return cached_figure('review_scores', data, build, sources=('order_reviews',))
+
+
+def delivery_score_figure(data):
+    """Average review score per delivery time group."""
+    # Điểm đánh giá trung bình theo nhóm thời gian giao hàng (chỉ đơn đã giao)
+    delivery_score = agg.delivery_score(data)
+
+    def build():
         fig = px.bar(
             delivery_score,
             x='delivery_time_group',
@@ -265,93 +355,152 @@ def create_dashboard(orders, order_items, products, customers, order_payments, o
             color='review_score',
             color_continuous_scale=px.colors.sequential.Viridis
         )
+        return fig
+
+    return cached_figure('delivery_score', data, build, sources=('facts',))
+
+
+def rfm_clusters_figure(data, mode='sample', max_points=SCATTER_POINTS):
+    """RFM clusters in 3D, reduced to ``max_points`` points with ``mode`` (see aggregations.rfm_points)."""
+    segments = rfm_segments(data)
+    points = agg.rfm_points(data, mode, max_points)
+    centers = segments.centers
+
+    # Tạo biểu đồ 3D
+    def build():
+        shown = points.assign(Cluster=points['Cluster'].astype(str))
+        fig = px.scatter_3d(
+            shown,
+            x='recency',
+            y='frequency',
+            z='monetary',
+            color='Cluster',
+            size='weight' if mode == 'voxel' else None,
+            size_max=18,
+            hover_data={'weight': ':,.0f'},
+            category_orders={'Cluster': [str(c) for c in centers['Cluster']]},
+            title=f"RFM Clusters in 3D ({len(points):,} điểm / {len(segments.customers):,} khách hàng)",
+            labels={
+                'recency': 'Recency', 'frequency': 'Frequency', 'monetary': 'Monetary',
+                'weight': 'Số khách hàng'
+            }
+        )
+
+        # Tùy chỉnh biểu đồ
+        if mode == 'sample':
+            fig.update_traces(marker=dict(size=3, opacity=0.7))
+        # Tâm của từng cụm
+        fig.add_trace(go.Scatter3d(
+            x=centers['recency'],
+            y=centers['frequency'],
+            z=centers['monetary'],
+            mode='markers+text',
+            text=[f"Cụm {c}: {n:,}" for c, n in zip(centers['Cluster'], centers['customers'])],
+            marker=dict(size=9, symbol='diamond', color='black'),
+            name='Tâm cụm'
+        ))
+        fig.update_layout(scene=dict(
+            xaxis_title='Recency',
+            yaxis_title='Frequency',
+            zaxis_title='Monetary'
+        ))
+        return fig
+
+    return cached_figure('rfm_clusters', data, build, sources=('facts',), mode=mode, max_points=max_points)
+
+
+def render_customers(data):
+    """Section "Phân tích khách hàng": review scores, delivery time and RFM clusters."""
+    st.header("Phân tích khách hàng")
+
+    # Phân tích đánh giá khách hàng
+    st.subheader("Đánh giá của khách hàng")
+    fig = review_scores_figure(data)
+    st.plotly_chart(fig, use_container_width=True)
+
+    # Phân tích thời gian giao hàng và ảnh hưởng đến đánh giá
+    st.subheader("Thời gian giao hàng và ảnh hưởng đến đánh giá")
+
+    fig = delivery_score_figure(data)
+    st.plotly_chart(fig, use_container_width=True)
+
+    # Phân tích RFM: tính lại từ các đơn hàng đang được lọc (modules.rfm)
+    segments = rfm_segments(data)
+    if len(segments.customers):
+        st.subheader("Phân tích RFM")
+        # Chỉ gửi tối đa max_points điểm tới trình duyệt (mẫu phân tầng hoặc voxel theo từng cụm)
+        render_modes = {"Mẫu theo cụm": 'sample', "Gộp theo voxel": 'voxel'}
+        mode_label = _remember('rfm_render_mode', st.radio(
+            "Cách hiển thị",
+            list(render_modes),
+            index=list(render_modes).index(_recall('rfm_render_mode', "Mẫu theo cụm")),
+            horizontal=True
+        ))
+        max_points = _remember('rfm_max_points', st.select_slider(
+            "Số điểm tối đa",
+            options=RFM_POINT_BUDGETS,
+            value=_recall('rfm_max_points', SCATTER_POINTS)
+        ))
+        mode = render_modes[mode_label]
+        fig = rfm_clusters_figure(data, mode, max_points)
+
+        # Hiển thị biểu đồ trong Streamlit
+        st.subheader("Phân tích RFM - Clusters Visualization")
         st.plotly_chart(fig, use_container_width=True)
-        
-        # Phân tích RFM 
-        if RFM_log_scaled_df is not None:
-            st.subheader("Phân tích RFM")
-            # Tạo biểu đồ 3D
-            fig = px.scatter_3d(
-                RFM_log_scaled_df,
-                x='recency',  
-                y='frequency',
-                z='monetary',
-                color='Cluster',
-                title='RFM Clusters in 3D',
-                labels={'recency': 'Recency', 'frequency': 'Frequency', 'monetary': 'Monetary'}
-            )
 
-            # Tùy chỉnh biểu đồ
-            fig.update_traces(marker=dict(size=5))  # Điều chỉnh kích thước điểm
-            fig.update_layout(scene=dict(
-                xaxis_title='Recency',
-                yaxis_title='Frequency',
-                zaxis_title='Monetary'
-            ))
-
-            # Hiển thị biểu đồ trong Streamlit
-            st.subheader("Phân tích RFM - Clusters Visualization")
-            st.plotly_chart(fig, use_container_width=True)
-    with tab4:
-        st.header("Phân tích sản phẩm")
-        
-        # Thêm tên danh mục tiếng Anh
-        merged_products = products.merge(product_category, 
-                                         left_on='product_category_name', 
-                                         right_on='product_category_name', 
-                                         how='left')
-        
-        # Top 10 danh mục sản phẩm bán chạy nhất
-        st.subheader("Top 10 danh mục sản phẩm bán chạy nhất")
-        
-        # Kết hợp dữ liệu để tìm danh mục phổ biến nhất
-        product_order = order_items.merge(merged_products, on='product_id', how='left')
-        category_counts = product_order['product_category_name_english'].value_counts().reset_index()
-        category_counts.columns = ['category', 'count']
-        category_counts = category_counts.head(10)  # Lấy top 10
-        
+
+def category_counts_figure(data, seller_states=None):
+    """Top 10 best-selling categories, optionally for the sellers in ``seller_states``."""
+    title_suffix = f" (người bán tại {', '.join(seller_states)})" if seller_states else ""
+
+    # Top 10 danh mục theo số lượng sản phẩm đã bán
+    category_counts = agg.category_counts(data, top=10, seller_states=seller_states)
+
+    def build():
         fig = px.bar(
             category_counts,
             x='count',
             y='category',
-            title="Top 10 danh mục sản phẩm bán chạy nhất",
+            title="Top 10 danh mục sản phẩm bán chạy nhất" + title_suffix,
             labels={'count': 'Số lượng bán', 'category': 'Danh mục'},
             orientation='h',
             color='count',
             color_continuous_scale=px.colors.sequential.Blues
         )
-        st.plotly_chart(fig, use_container_width=True)
-        
-        # Phân tích giá sản phẩm theo danh mục
-        st.subheader("Giá trung bình theo danh mục sản phẩm")
-        
-        # Tính giá trung bình cho mỗi danh mục
-        category_price = product_order.groupby('product_category_name_english')['price'].mean().reset_index()
-        category_price = category_price.sort_values('price', ascending=False).head(10)  # Top 10 danh mục đắt nhất
-        
+        return fig
+
+    return cached_figure('category_counts', data, build, sources=agg.CATEGORY_SOURCES, seller_states=seller_states)
+
+
+def category_price_figure(data, seller_states=None):
+    """Top 10 categories by average price, optionally for the sellers in ``seller_states``."""
+    title_suffix = f" (người bán tại {', '.join(seller_states)})" if seller_states else ""
+
+    # Tính giá trung bình cho mỗi danh mục (top 10 danh mục đắt nhất)
+    category_price = agg.category_price(data, top=10, seller_states=seller_states)
+
+    def build():
         fig = px.bar(
             category_price,
             x='price',
             y='product_category_name_english',
-            title="Top 10 danh mục sản phẩm có giá trung bình cao nhất",
+            title="Top 10 danh mục sản phẩm có giá trung bình cao nhất" + title_suffix,
             labels={'price': 'Giá trung bình (R$)', 'product_category_name_english': 'Danh mục'},
             orientation='h',
             color='price',
             color_continuous_scale=px.colors.sequential.Reds
         )
-        st.plotly_chart(fig, use_container_width=True)
-        
-        # Phân tích kích thước sản phẩm
-        st.subheader("Phân tích trọng lượng sản phẩm theo danh mục")
-        
-        # Lọc bỏ các giá trị bất thường
-        weight_analysis = merged_products[merged_products['product_weight_g'] > 0]
-        weight_analysis = weight_analysis[weight_analysis['product_weight_g'] < 30000]  # Loại bỏ các sản phẩm quá nặng
-        
-        # Tính trọng lượng trung bình cho mỗi danh mục
-        category_weight = weight_analysis.groupby('product_category_name_english')['product_weight_g'].mean().reset_index()
-        category_weight = category_weight.sort_values('product_weight_g', ascending=False).head(10)
-        
+        return fig
+
+    return cached_figure('category_price', data, build, sources=agg.CATEGORY_SOURCES, seller_states=seller_states)
+
+
+def category_weight_figure(data):
+    """Top 10 heaviest categories."""
+    # Trọng lượng trung bình cho mỗi danh mục (đã lọc bỏ các giá trị bất thường)
+    category_weight = agg.category_weight(data, top=10)
+
+    def build():
         fig = px.bar(
             category_weight,
             x='product_weight_g',
@@ -362,208 +511,356 @@ def create_dashboard(orders, order_items, products, customers, order_payments, o
             color='product_weight_g',
             color_continuous_scale=px.colors.sequential.Greens
         )
-        st.plotly_chart(fig, use_container_width=True)
-    
-    with tab5:
-        st.header("Bản đồ phân bố khách hàng và người bán")
-        
-        # Chuẩn bị dữ liệu khách hàng theo tiểu bang
-        customer_states = customers['customer_state'].value_counts().reset_index()
-        customer_states.columns = ['state', 'customer_count']
-        
-        # Chuẩn bị dữ liệu người bán theo tiểu bang
-        seller_states = sellers['seller_state'].value_counts().reset_index()
-        seller_states.columns = ['state', 'seller_count']
-        
-        # Kết hợp dữ liệu khách hàng và người bán
-        combined_states = customer_states.merge(seller_states, on='state', how='outer').fillna(0)
-        
-        # Tạo cột tỷ lệ khách hàng/người bán
-        combined_states['customer_seller_ratio'] = combined_states['customer_count'] / combined_states['seller_count'].replace(0, 0.1)
-        
-        # Tạo tabs con trong tab bản đồ
-        map_tab1, map_tab2, map_tab3, map_tab4, map_tab5 = st.tabs(["Khách hàng (Choropleth)", "Người bán (Choropleth)", "So sánh", "Tỷ lệ", "Bản đồ chi tiết"])
-        
-        with map_tab1:
-            st.subheader("Phân bố khách hàng theo tiểu bang")
-            
-            fig = px.choropleth(
-                customer_states,
-                locations='state',
-                color='customer_count',
-                title="Số lượng khách hàng theo tiểu bang",
-                labels={'customer_count': 'Số khách hàng', 'state': 'Tiểu bang'},
-                color_continuous_scale=px.colors.sequential.Plasma,
-                scope="south america"
-            )
-            fig.update_geos(
-                visible=False,
-                projection_type="mercator",
-                lataxis_range=[-33.7, 5.2],
-                lonaxis_range=[-73.9, -34.7]
-            )
-            st.plotly_chart(fig, use_container_width=True)
-            
-            # Hiển thị bảng dữ liệu
-            st.dataframe(customer_states.sort_values('customer_count', ascending=False))
-        
-        with map_tab2:
-            st.subheader("Phân bố người bán theo tiểu bang")
-            
-            fig = px.choropleth(
-                seller_states,
-                locations='state',
-                color='seller_count',
-                title="Số lượng người bán theo tiểu bang",
-                labels={'seller_count': 'Số người bán', 'state': 'Tiểu bang'},
-                color_continuous_scale=px.colors.sequential.Viridis,
-                scope="south america"
-            )
-            fig.update_geos(
-                visible=False,
-                projection_type="mercator",
-                lataxis_range=[-33.7, 5.2],
-                lonaxis_range=[-73.9, -34.7]
-            )
-            st.plotly_chart(fig, use_container_width=True)
-            
-            # Hiển thị bảng dữ liệu
-            st.dataframe(seller_states.sort_values('seller_count', ascending=False))
-        
-        with map_tab3:
-            st.subheader("So sánh phân bố khách hàng và người bán")
-            
-            # Tạo biểu đồ cột so sánh
-            top_states = combined_states.sort_values('customer_count', ascending=False).head(10)
-            
-            fig = px.bar(
-                top_states,
-                x='state',
-                y=['customer_count', 'seller_count'],
-                title="So sánh số lượng khách hàng và người bán tại 10 tiểu bang hàng đầu",
-                labels={'state': 'Tiểu bang', 'value': 'Số lượng', 'variable': 'Loại'},
-                barmode='group',
-                color_discrete_map={'customer_count': '#636EFA', 'seller_count': '#00CC96'}
-            )
-            fig.update_layout(legend=dict(
-                orientation="h",
-                yanchor="bottom",
-                y=1.02,
-                xanchor="right",
-                x=1
-            ))
-            st.plotly_chart(fig, use_container_width=True)
-            
-            # Hiển thị bảng dữ liệu
-            st.dataframe(combined_states[['state', 'customer_count', 'seller_count']].sort_values('customer_count', ascending=False))
-        
-        with map_tab4:
-            st.subheader("Tỷ lệ khách hàng/người bán theo tiểu bang")
-            
-            fig = px.choropleth(
-                combined_states,
-                locations='state',
-                color='customer_seller_ratio',
-                title="Tỷ lệ khách hàng/người bán theo tiểu bang",
-                labels={'customer_seller_ratio': 'Tỷ lệ KH/NB', 'state': 'Tiểu bang'},
-                color_continuous_scale=px.colors.sequential.RdBu,
-                scope="south america"
-            )
-            fig.update_geos(
-                visible=False,
-                projection_type="mercator",
-                lataxis_range=[-33.7, 5.2],
-                lonaxis_range=[-73.9, -34.7]
-            )
-            st.plotly_chart(fig, use_container_width=True)
-            
-            # Hiển thị bảng dữ liệu với tỷ lệ
-            ratio_df = combined_states[['state', 'customer_count', 'seller_count', 'customer_seller_ratio']]
-            ratio_df = ratio_df.sort_values('customer_seller_ratio', ascending=False)
-            st.dataframe(ratio_df)
-            
-            # Phân tích tỷ lệ
-            st.write("""
-            ### Phân tích tỷ lệ khách hàng/người bán
-            
-            - **Tỷ lệ cao**: Tiểu bang có nhiều khách hàng nhưng ít người bán - cơ hội kinh doanh tiềm năng
-            - **Tỷ lệ thấp**: Tiểu bang có nhiều người bán so với số lượng khách hàng - thị trường cạnh tranh cao
-            """)
-        
-        with map_tab5:
-            st.subheader("Bản đồ chi tiết phân bố khách hàng và người bán")
-            
-            # Xử lý dữ liệu địa lý
-            # Lấy tọa độ trung bình cho mỗi tiểu bang từ dữ liệu geolocation
-            geo_data = olist_geolocation_dataset.copy()
-            
-            # Tính tọa độ trung bình cho mỗi tiểu bang
-            state_locations = geo_data.groupby('geolocation_state')[['geolocation_lat', 'geolocation_lng']].mean().reset_index()
-            
-            # Kết hợp với dữ liệu khách hàng và người bán
-            customer_geo = customer_states.merge(state_locations, left_on='state', right_on='geolocation_state', how='left')
-            seller_geo = seller_states.merge(state_locations, left_on='state', right_on='geolocation_state', how='left')
-            
-            # Tạo bản đồ với Plotly
+        return fig
+
+    return cached_figure('category_weight', data, build, sources=agg.CATEGORY_SOURCES)
+
+
+def render_products(data):
+    """Section "Phân tích sản phẩm": best-selling, priciest and heaviest categories."""
+    st.header("Phân tích sản phẩm")
+
+    # Lát cắt theo bang của người bán (trả lời từ thống kê danh mục, không đọc lại order_items)
+    all_states = "Tất cả"
+    state_options = [all_states] + category_stats(data).seller_states
+    recalled_state = _recall('products_seller_state', all_states)
+    seller_state = _remember('products_seller_state', st.selectbox(
+        "Bang của người bán", state_options,
+        index=state_options.index(recalled_state) if recalled_state in state_options else 0
+    ))
+    seller_states = None if seller_state == all_states else (seller_state,)
+
+    # Top 10 danh mục sản phẩm bán chạy nhất
+    st.subheader("Top 10 danh mục sản phẩm bán chạy nhất")
+
+    fig = category_counts_figure(data, seller_states)
+    st.plotly_chart(fig, use_container_width=True)
+
+    # Phân tích giá sản phẩm theo danh mục
+    st.subheader("Giá trung bình theo danh mục sản phẩm")
+
+    fig = category_price_figure(data, seller_states)
+    st.plotly_chart(fig, use_container_width=True)
+
+    # Phân tích kích thước sản phẩm
+    st.subheader("Phân tích trọng lượng sản phẩm theo danh mục")
+
+    fig = category_weight_figure(data)
+    st.plotly_chart(fig, use_container_width=True)
+
+
+def render_maps(data, lazy=True):
+    """Section "Bản đồ phân bố": customer and seller distribution by state."""
+    st.header("Bản đồ phân bố khách hàng và người bán")
+
+    # Tạo mục con trong mục bản đồ
+    map_sections = {
+        "Khách hàng (Choropleth)": render_customer_map,
+        "Người bán (Choropleth)": render_seller_map,
+        "So sánh": render_state_comparison,
+        "Tỷ lệ": render_state_ratio,
+        "Bản đồ chi tiết": render_detail_map,
+    }
+    _render_sections(map_sections, 'map_section', lazy, data)
+
+
+def _map_trace(name):
+    """
+    Return the tile-map trace class ``name`` and its layout key.
+
+    Plotly >= 5.24 provides MapLibre traces (e.g. Scattermap, layout 'map');
+    older versions only have the Mapbox variants (Scattermapbox, 'mapbox').
+    """
+    if hasattr(go, name):
+        return getattr(go, name), 'map'
+    return getattr(go, name + 'box'), 'mapbox'
+
+
+def _brazil_map(map_layout, height, outline=True):
+    """
+    Return the ``map_layout`` settings of a tile map that fits Brazil into ``height`` px.
+
+    The map uses the blank 'white-bg' style. With ``outline=True`` the bundled
+    state shapes (modules.geo_shapes) are drawn below the traces as the base
+    map, so the browser fetches no tiles or topojson.
+    """
+    zoom = fit_zoom(MAP_WIDTH, height)
+    lat_min, lat_max, lng_min, lng_max = BRAZIL_BOUNDS
+    settings = dict(
+        style='white-bg',
+        center=dict(lat=(lat_min + lat_max) / 2, lon=(lng_min + lng_max) / 2),
+        zoom=zoom
+    )
+    if outline:
+        states = state_geojson()
+        settings['layers'] = [
+            dict(sourcetype='geojson', source=states, type='fill', color='#eeeeee', below='traces'),
+            dict(sourcetype='geojson', source=states, type='line', color='#aaaaaa', line=dict(width=0.6), below='traces'),
+        ]
+    return settings
+
+
+def _state_choropleth(states, column, title, label, colorscale, height=600):
+    """
+    Build a choropleth of ``column`` per state on the bundled state shapes.
+
+    The shapes come from modules.geo_shapes and are drawn on a blank
+    tile-map style, so the browser fetches no base map or topojson.
+    """
+    choropleth, map_layout = _map_trace('Choroplethmap')
+    settings = _brazil_map(map_layout, height, outline=False)
+    fig = go.Figure(choropleth(
+        geojson=state_geojson(),
+        locations=states['state'],
+        z=states[column],
+        colorscale=colorscale,
+        colorbar=dict(title=label),
+        marker=dict(opacity=0.85, line=dict(width=0.5, color='white')),
+        hovertemplate='%{location}<br>' + label + ': %{z}<extra></extra>'
+    ))
+    fig.update_layout(
+        title=title,
+        height=height,
+        margin=dict(l=0, r=0, t=50, b=0),
+        **{map_layout: settings}
+    )
+    return fig
+
+
+def _zip_point_figure(data, chart_id, points, title, color, label, sources):
+    """Entity counts per zip code prefix as markers over the state shapes."""
+    def build():
+        scatter, map_layout = _map_trace('Scattermap')
+        size = points['count'] / max(points['count'].max(), 1) * 25 + 3 if len(points) else []
+        fig = go.Figure(scatter(
+            lat=points['lat'],
+            lon=points['lng'],
+            text=points['zip_code_prefix'].astype(str) + f'<br>{label}: ' + points['count'].astype(str),
+            mode='markers',
+            marker=dict(size=size, color=color, opacity=0.6),
+            name=label
+        ))
+        fig.update_layout(
+            title=title,
+            height=600,
+            **{map_layout: _brazil_map(map_layout, 600)}
+        )
+        return fig
+
+    return cached_figure(chart_id, data, build, sources=sources)
+
+
+def customer_states_map_figure(data):
+    """Customers per state (choropleth)."""
+    customer_states = agg.customer_states(data)
+
+    def build():
+        fig = _state_choropleth(
+            customer_states, 'customer_count', "Số lượng khách hàng theo tiểu bang", 'Số khách hàng',
+            px.colors.sequential.Plasma
+        )
+        return fig
+
+    return cached_figure('customer_states_map', data, build, sources=('facts',))
+
+
+def customer_zips_map_figure(data):
+    """Customers per zip code prefix (coordinates from the zip code lookup)."""
+    return _zip_point_figure(
+        data, 'customer_zips_map', agg.customer_zips(data), "Số lượng khách hàng theo mã bưu chính", '#636EFA',
+        'Số khách hàng', ('facts', 'olist_geolocation_dataset')
+    )
+
+
+def render_customer_map(data):
+    """Map sub-section: customers per state (choropleth)."""
+    customer_states = agg.customer_states(data)
+
+    st.subheader("Phân bố khách hàng theo tiểu bang")
+
+    fig = customer_states_map_figure(data)
+    st.plotly_chart(fig, use_container_width=True)
+
+    # Hiển thị bảng dữ liệu
+    st.dataframe(customer_states.sort_values('customer_count', ascending=False))
+
+    # Vị trí khách hàng theo mã bưu chính (tọa độ lấy từ bảng tra cứu mã bưu chính)
+    st.subheader("Phân bố khách hàng theo mã bưu chính")
+    st.plotly_chart(customer_zips_map_figure(data), use_container_width=True)
+
+
+def seller_states_map_figure(data):
+    """Sellers per state (choropleth)."""
+    seller_states = agg.seller_states(data)
+
+    def build():
+        fig = _state_choropleth(
+            seller_states, 'seller_count', "Số lượng người bán theo tiểu bang", 'Số người bán',
+            px.colors.sequential.Viridis
+        )
+        return fig
+
+    return cached_figure('seller_states_map', data, build, sources=('sellers',))
+
+
+def seller_zips_map_figure(data):
+    """Sellers per zip code prefix."""
+    return _zip_point_figure(
+        data, 'seller_zips_map', agg.seller_zips(data), "Số lượng người bán theo mã bưu chính", '#00CC96',
+        'Số người bán', ('sellers', 'olist_geolocation_dataset')
+    )
+
+
+def render_seller_map(data):
+    """Map sub-section: sellers per state (choropleth)."""
+    seller_states = agg.seller_states(data)
+
+    st.subheader("Phân bố người bán theo tiểu bang")
+
+    fig = seller_states_map_figure(data)
+    st.plotly_chart(fig, use_container_width=True)
+
+    # Hiển thị bảng dữ liệu
+    st.dataframe(seller_states.sort_values('seller_count', ascending=False))
+
+    # Vị trí người bán theo mã bưu chính
+    st.subheader("Phân bố người bán theo mã bưu chính")
+    st.plotly_chart(seller_zips_map_figure(data), use_container_width=True)
+
+
+def state_comparison_figure(data):
+    """Customers vs. sellers in the top 10 states."""
+    combined_states = agg.combined_states(data)
+
+    # Tạo biểu đồ cột so sánh
+    top_states = combined_states.sort_values('customer_count', ascending=False).head(10)
+
+    def build():
+        fig = px.bar(
+            top_states,
+            x='state',
+            y=['customer_count', 'seller_count'],
+            title="So sánh số lượng khách hàng và người bán tại 10 tiểu bang hàng đầu",
+            labels={'state': 'Tiểu bang', 'value': 'Số lượng', 'variable': 'Loại'},
+            barmode='group',
+            color_discrete_map={'customer_count': '#636EFA', 'seller_count': '#00CC96'}
+        )
+        fig.update_layout(legend=dict(
+            orientation="h",
+            yanchor="bottom",
+            y=1.02,
+            xanchor="right",
+            x=1
+        ))
+        return fig
+
+    return cached_figure('state_comparison', data, build, sources=('facts', 'sellers'))
+
+
+def render_state_comparison(data):
+    """Map sub-section: customers vs. sellers in the top 10 states."""
+    combined_states = agg.combined_states(data)
+
+    st.subheader("So sánh phân bố khách hàng và người bán")
+
+    fig = state_comparison_figure(data)
+    st.plotly_chart(fig, use_container_width=True)
+
+    # Hiển thị bảng dữ liệu
+    st.dataframe(combined_states[['state', 'customer_count', 'seller_count']].sort_values('customer_count', ascending=False))
+
+
+def state_ratio_figure(data):
+    """Customer/seller ratio per state (choropleth)."""
+    combined_states = agg.combined_states(data)
+
+    def build():
+        fig = _state_choropleth(
+            combined_states, 'customer_seller_ratio', "Tỷ lệ khách hàng/người bán theo tiểu bang",
+            'Tỷ lệ KH/NB', px.colors.sequential.RdBu
+        )
+        return fig
+
+    return cached_figure('state_ratio', data, build, sources=('facts', 'sellers'))
+
+
+def render_state_ratio(data):
+    """Map sub-section: customer/seller ratio per state."""
+    combined_states = agg.combined_states(data)
+
+    st.subheader("Tỷ lệ khách hàng/người bán theo tiểu bang")
+
+    fig = state_ratio_figure(data)
+    st.plotly_chart(fig, use_container_width=True)
+
+    # Hiển thị bảng dữ liệu với tỷ lệ
+    ratio_df = combined_states[['state', 'customer_count', 'seller_count', 'customer_seller_ratio']]
+    ratio_df = ratio_df.sort_values('customer_seller_ratio', ascending=False)
+    st.dataframe(ratio_df)
+
+    # Phân tích tỷ lệ
+    st.write("""
+    ### Phân tích tỷ lệ khách hàng/người bán
+
+    - **Tỷ lệ cao**: Tiểu bang có nhiều khách hàng nhưng ít người bán - cơ hội kinh doanh tiềm năng
+    - **Tỷ lệ thấp**: Tiểu bang có nhiều người bán so với số lượng khách hàng - thị trường cạnh tranh cao
+    """)
+
+
+def top_cities_figure(data):
+    """Top 20 cities by number of customers."""
+    # Lấy top 20 thành phố có nhiều khách hàng nhất
+    top_cities = agg.top_cities(data, top=20)
+
+    def build():
+        fig = px.bar(
+            top_cities,
+            x='customer_count',
+            y='city',
+            title="Top 20 thành phố có nhiều khách hàng nhất",
+            labels={'customer_count': 'Số khách hàng', 'city': 'Thành phố'},
+            orientation='h',
+            color='customer_count',
+            color_continuous_scale=px.colors.sequential.Plasma
+        )
+        return fig
+
+    return cached_figure('top_cities', data, build, sources=('facts',))
+
+
+def detail_map_figure(data, display_option=DETAIL_MAP_OPTIONS[0]):
+    """Customers and/or sellers per state as markers over the state shapes (see DETAIL_MAP_OPTIONS)."""
+    customer_states = agg.customer_states(data)
+    seller_states = agg.seller_states(data)
+
+    # Tọa độ trung bình cho mỗi tiểu bang từ dữ liệu geolocation
+    state_locations = agg.state_locations(data)
+
+    # Kết hợp với dữ liệu khách hàng và người bán
+    customer_geo = customer_states.merge(state_locations, left_on='state', right_on='geolocation_state', how='left')
+    seller_geo = seller_states.merge(state_locations, left_on='state', right_on='geolocation_state', how='left')
+
+    scatter, map_layout = _map_trace('Scattermap')
+
+    def markers(geo, column, label, color, name):
+        # Một điểm mỗi tiểu bang, kích thước tỷ lệ với số lượng
+        return scatter(
+            lon=geo['geolocation_lng'],
+            lat=geo['geolocation_lat'],
+            text=geo['state'].astype(str) + f'<br>{label}: ' + geo[column].astype(str),
+            mode='markers',
+            marker=dict(size=geo[column] / geo[column].max() * 50, color=color, opacity=0.7),
+            name=name
+        )
+
+    sources = ('facts', 'sellers', 'olist_geolocation_dataset')
+    if display_option == DETAIL_MAP_OPTIONS[0]:
+        # Tạo bản đồ với Plotly, nền là ranh giới tiểu bang đi kèm ứng dụng
+        def build():
             fig = go.Figure()
-            
-            # Thêm đường viền Brazil
-            fig.add_trace(go.Scattergeo(
-                lon=state_locations['geolocation_lng'],
-                lat=state_locations['geolocation_lat'],
-                mode='lines',
-                line=dict(width=1, color='gray'),
-                name='Brazil'
-            ))
-            
-            # Thêm điểm khách hàng
-            fig.add_trace(go.Scattergeo(
-                lon=customer_geo['geolocation_lng'],
-                lat=customer_geo['geolocation_lat'],
-                text=customer_geo['state'] + '<br>Số khách hàng: ' + customer_geo['customer_count'].astype(str),
-                mode='markers',
-                marker=dict(
-                    size=customer_geo['customer_count'] / customer_geo['customer_count'].max() * 50,
-                    color='blue',
-                    opacity=0.7,
-                    line=dict(width=1, color='white')
-                ),
-                name='Khách hàng'
-            ))
-            
-            # Thêm điểm người bán
-            fig.add_trace(go.Scattergeo(
-                lon=seller_geo['geolocation_lng'],
-                lat=seller_geo['geolocation_lat'],
-                text=seller_geo['state'] + '<br>Số người bán: ' + seller_geo['seller_count'].astype(str),
-                mode='markers',
-                marker=dict(
-                    size=seller_geo['seller_count'] / seller_geo['seller_count'].max() * 50,
-                    color='green',
-                    opacity=0.7,
-                    line=dict(width=1, color='white')
-                ),
-                name='Người bán'
-            ))
-            
-            # Cấu hình bản đồ
-            fig.update_geos(
-                visible=True,
-                resolution=50,
-                scope='south america',
-                showcountries=True,
-                countrycolor='gray',
-                showcoastlines=True,
-                coastlinecolor='gray',
-                showland=True,
-                landcolor='lightgray',
-                showocean=True,
-                oceancolor='aliceblue',
-                projection_type='mercator',
-                lataxis_range=[-33.7, 5.2],
-                lonaxis_range=[-73.9, -34.7]
-            )
-            
+            fig.add_trace(markers(customer_geo, 'customer_count', 'Số khách hàng', 'blue', 'Khách hàng'))
+            fig.add_trace(markers(seller_geo, 'seller_count', 'Số người bán', 'green', 'Người bán'))
+
             fig.update_layout(
                 title='Phân bố khách hàng và người bán trên bản đồ Brazil',
                 height=700,
@@ -573,144 +870,125 @@ def create_dashboard(orders, order_items, products, customers, order_payments, o
                     y=1.02,
                     xanchor="right",
                     x=1
-                )
-            )
-            
-            st.plotly_chart(fig, use_container_width=True)
-            
-            # Thêm bộ lọc để hiển thị chỉ khách hàng hoặc người bán
-            st.subheader("Lọc hiển thị trên bản đồ")
-            display_option = st.radio(
-                "Hiển thị:",
-                ("Cả khách hàng và người bán", "Chỉ khách hàng", "Chỉ người bán")
-            )
-            
-            if display_option != "Cả khách hàng và người bán":
-                fig = go.Figure()
-                
-                # Thêm đường viền Brazil
-                fig.add_trace(go.Scattergeo(
-                    lon=state_locations['geolocation_lng'],
-                    lat=state_locations['geolocation_lat'],
-                    mode='lines',
-                    line=dict(width=1, color='gray'),
-                    name='Brazil'
-                ))
-                
-                if display_option == "Chỉ khách hàng":
-                    # Thêm điểm khách hàng
-                    fig.add_trace(go.Scattergeo(
-                        lon=customer_geo['geolocation_lng'],
-                        lat=customer_geo['geolocation_lat'],
-                        text=customer_geo['state'] + '<br>Số khách hàng: ' + customer_geo['customer_count'].astype(str),
-                        mode='markers',
-                        marker=dict(
-                            size=customer_geo['customer_count'] / customer_geo['customer_count'].max() * 50,
-                            color='blue',
-                            opacity=0.7,
-                            line=dict(width=1, color='white')
-                        ),
-                        name='Khách hàng'
-                    ))
-                    title = 'Phân bố khách hàng trên bản đồ Brazil'
-                else:
-                    # Thêm điểm người bán
-                    fig.add_trace(go.Scattergeo(
-                        lon=seller_geo['geolocation_lng'],
-                        lat=seller_geo['geolocation_lat'],
-                        text=seller_geo['state'] + '<br>Số người bán: ' + seller_geo['seller_count'].astype(str),
-                        mode='markers',
-                        marker=dict(
-                            size=seller_geo['seller_count'] / seller_geo['seller_count'].max() * 50,
-                            color='green',
-                            opacity=0.7,
-                            line=dict(width=1, color='white')
-                        ),
-                        name='Người bán'
-                    ))
-                    title = 'Phân bố người bán trên bản đồ Brazil'
-                
-                # Cấu hình bản đồ
-                fig.update_geos(
-                    visible=True,
-                    resolution=50,
-                    scope='south america',
-                    showcountries=True,
-                    countrycolor='gray',
-                    showcoastlines=True,
-                    coastlinecolor='gray',
-                    showland=True,
-                    landcolor='lightgray',
-                    showocean=True,
-                    oceancolor='aliceblue',
-                    projection_type='mercator',
-                    lataxis_range=[-33.7, 5.2],
-                    lonaxis_range=[-73.9, -34.7]
-                )
-                
-                fig.update_layout(
-                    title=title,
-                    height=700
-                )
-                
-                st.plotly_chart(fig, use_container_width=True)
-            
-            # Thêm phân tích mật độ khách hàng theo thành phố
-            st.subheader("Phân tích mật độ khách hàng theo thành phố")
-            
-            # Lấy top 20 thành phố có nhiều khách hàng nhất
-            customer_cities = customers['customer_city'].value_counts().reset_index()
-            customer_cities.columns = ['city', 'customer_count']
-            top_cities = customer_cities.head(20)
-            
-            fig = px.bar(
-                top_cities,
-                x='customer_count',
-                y='city',
-                title="Top 20 thành phố có nhiều khách hàng nhất",
-                labels={'customer_count': 'Số khách hàng', 'city': 'Thành phố'},
-                orientation='h',
-                color='customer_count',
-                color_continuous_scale=px.colors.sequential.Plasma
-            )
-            
-            st.plotly_chart(fig, use_container_width=True)
-            
-            # Hiển thị bảng dữ liệu
-            st.dataframe(top_cities)
-            
-            # Thêm bản đồ nhiệt (heatmap) nếu có đủ dữ liệu
-            st.subheader("Bản đồ nhiệt phân bố khách hàng")
-            st.write("Bản đồ nhiệt hiển thị mật độ khách hàng trên toàn Brazil")
-            
-            # Kết hợp dữ liệu khách hàng với tọa độ
-            # Lấy mẫu ngẫu nhiên từ dữ liệu địa lý để tạo bản đồ nhiệt (để tránh quá tải)
-            if len(geo_data) > 1000:
-                geo_sample = geo_data.sample(1000, random_state=42)
-            else:
-                geo_sample = geo_data
-                
-            # Tạo bản đồ nhiệt
-            fig = go.Figure()
-            
-            fig.add_trace(go.Densitymapbox(
-                lat=geo_sample['geolocation_lat'],
-                lon=geo_sample['geolocation_lng'],
-                z=[1] * len(geo_sample),  # Tạo danh sách các giá trị 1 có cùng độ dài với dữ liệu
-                radius=10,
-                colorscale='Viridis',
-                showscale=False,
-                name='Mật độ khách hàng'
-            ))
-            
-            fig.update_layout(
-                title='Bản đồ nhiệt phân bố khách hàng',
-                mapbox=dict(
-                    style='carto-positron',
-                    center=dict(lat=-15.0, lon=-55.0),
-                    zoom=3
                 ),
-                height=700
+                **{map_layout: _brazil_map(map_layout, 700)}
             )
-            
-            st.plotly_chart(fig, use_container_width=True)
+            return fig
+
+        return cached_figure('detail_map', data, build, sources=sources)
+
+    def build():
+        if display_option == "Chỉ khách hàng":
+            fig = go.Figure(markers(customer_geo, 'customer_count', 'Số khách hàng', 'blue', 'Khách hàng'))
+            title = 'Phân bố khách hàng trên bản đồ Brazil'
+        else:
+            fig = go.Figure(markers(seller_geo, 'seller_count', 'Số người bán', 'green', 'Người bán'))
+            title = 'Phân bố người bán trên bản đồ Brazil'
+
+        fig.update_layout(
+            title=title,
+            height=700,
+            **{map_layout: _brazil_map(map_layout, 700)}
+        )
+        return fig
+
+    return cached_figure('detail_map_filtered', data, build, sources=sources, display_option=display_option)
+
+
+def customer_density_figure(data):
+    """Density heatmap of every geolocation point."""
+    # Mật độ chính xác của toàn bộ điểm địa lý, gộp theo ô bản đồ (quadtree) ở mức
+    # chi tiết nhất có không quá HEATMAP_POINTS ô
+    tiles = geolocation_tiles(data.base or data).tiles(HEATMAP_POINTS)
+
+    density_trace, map_layout = _map_trace('Densitymap')
+
+    # Tạo bản đồ nhiệt
+    def build():
+        fig = go.Figure()
+
+        fig.add_trace(density_trace(
+            lat=tiles['lat'],
+            lon=tiles['lng'],
+            z=tiles['count'],
+            radius=10,
+            colorscale='Viridis',
+            showscale=False,
+            name='Mật độ khách hàng'
+        ))
+
+        fig.update_layout(
+            title='Bản đồ nhiệt phân bố khách hàng',
+            height=700,
+            **{map_layout: _brazil_map(map_layout, 700)}
+        )
+        return fig
+
+    return cached_figure('customer_density', data, build, sources=('olist_geolocation_dataset',))
+
+
+def render_detail_map(data):
+    """Map sub-section: detailed map, top cities and density heatmap."""
+    st.subheader("Bản đồ chi tiết phân bố khách hàng và người bán")
+
+    fig = detail_map_figure(data)
+
+    st.plotly_chart(fig, use_container_width=True)
+
+    # Thêm bộ lọc để hiển thị chỉ khách hàng hoặc người bán
+    st.subheader("Lọc hiển thị trên bản đồ")
+    display_option = _remember('map_display_option', st.radio(
+        "Hiển thị:",
+        DETAIL_MAP_OPTIONS,
+        index=DETAIL_MAP_OPTIONS.index(_recall('map_display_option', DETAIL_MAP_OPTIONS[0]))
+    ))
+
+    if display_option != DETAIL_MAP_OPTIONS[0]:
+        fig = detail_map_figure(data, display_option)
+
+        st.plotly_chart(fig, use_container_width=True)
+
+    # Thêm phân tích mật độ khách hàng theo thành phố
+    st.subheader("Phân tích mật độ khách hàng theo thành phố")
+
+    top_cities = agg.top_cities(data, top=20)
+    fig = top_cities_figure(data)
+
+    st.plotly_chart(fig, use_container_width=True)
+
+    # Hiển thị bảng dữ liệu
+    st.dataframe(top_cities)
+
+    # Thêm bản đồ nhiệt (heatmap) nếu có đủ dữ liệu
+    st.subheader("Bản đồ nhiệt phân bố khách hàng")
+    st.write("Bản đồ nhiệt hiển thị mật độ khách hàng trên toàn Brazil")
+
+    fig = customer_density_figure(data)
+
+    st.plotly_chart(fig, use_container_width=True)
+
+
+# Biểu đồ của từng mục với giá trị mặc định của widget (modules.warmup dựng sẵn chúng khi khởi động)
+DEFAULT_FIGURES = {
+    'overview_daily': lambda data: overview_daily_figure(data, *agg.date_bounds(data)),
+    'overview_hourly': overview_hourly_figure,
+    'monthly_revenue': monthly_revenue_figure,
+    'payment_types': payment_types_figure,
+    'avg_delivery_time': avg_delivery_time_figure,
+    'order_status_share': order_status_share_figure,
+    'review_scores': review_scores_figure,
+    'delivery_score': delivery_score_figure,
+    'rfm_clusters': rfm_clusters_figure,
+    'category_counts': category_counts_figure,
+    'category_price': category_price_figure,
+    'category_weight': category_weight_figure,
+    'customer_states_map': customer_states_map_figure,
+    'customer_zips_map': customer_zips_map_figure,
+    'seller_states_map': seller_states_map_figure,
+    'seller_zips_map': seller_zips_map_figure,
+    'state_comparison': state_comparison_figure,
+    'state_ratio': state_ratio_figure,
+    'detail_map': detail_map_figure,
+    'top_cities': top_cities_figure,
+    'customer_density': customer_density_figure,
+}
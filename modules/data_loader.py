@@ -1,14 +1,55 @@
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, Iterator, NamedTuple, Optional, Tuple
+
+import numpy as np
 import pandas as pd
 import streamlit as st
+from modules.fact_table import FACT_TABLE_VERSION, FACT_TABLES, SOURCE_COLUMNS, build_fact_tables, update_fact_tables
+from modules.frozen import freeze
+from modules.ingest import geolocation_summary
+from modules.keys import KeyDictionary, encode_keys
+from modules.snapshot import DATA_PATH, SnapshotStore, apply_schema, tokens_version
+
+logger = logging.getLogger(__name__)
+
+# Tên bảng -> file nguồn, theo thứ tự các giá trị trả về của load_data()
+TABLE_FILES = {
+    'orders': 'olist_orders_dataset.csv',
+    'order_items': 'olist_order_items_dataset.csv',
+    'products': 'olist_products_dataset.csv',
+    'customers': 'olist_customers_dataset.csv',
+    'order_payments': 'olist_order_payments_dataset.csv',
+    'order_reviews': 'olist_order_reviews_dataset.csv',
+    'sellers': 'olist_sellers_dataset.csv',
+    'product_category': 'product_category_name_translation.csv',
+    'olist_geolocation_dataset': 'olist_geolocation_dataset.csv',
+}
+# Chỉ một luồng kiểm tra phiên bản và nạp bộ dữ liệu tại một thời điểm (phiên đầu tiên và luồng làm nóng
+# chờ nhau rồi dùng chung kết quả đã lưu đệm, thay vì cùng đọc các file nguồn)
+_load_lock = threading.Lock()
+# Các bảng nguồn của bảng fact (modules.fact_table); chỉ được đọc theo từng khối, không giữ trong bộ nhớ
+FACT_SOURCES = ('orders', 'order_payments', 'order_reviews', 'customers', 'order_items')
+# Các bảng danh mục nhỏ được nạp nguyên vẹn
+CATALOG_TABLES = ('products', 'sellers', 'product_category')
 
-@st.cache_data
-def load_data():
+
+def load_data(data_path: str = DATA_PATH):
     """
     Load and preprocess all required datasets for the Olist E-commerce dashboard.
     
-    This function loads multiple CSV files containing Olist e-commerce data,
-    converts datetime columns to the appropriate format, and returns all datasets
-    needed for the dashboard.
+    This function loads multiple CSV files containing Olist e-commerce data
+    through the columnar snapshot store (see modules.snapshot), which keeps a
+    typed Parquet copy of each file with categorical, datetime and float32
+    columns, and returns every table in full. The app does not use it:
+    get_dataset() streams the order tables into compact fact tables and
+    shares one read-only copy across sessions.
+    
+    Args:
+        data_path (str): Directory containing the source CSV files
     
     Returns:
         tuple: Contains the following dataframes:
@@ -26,27 +67,194 @@ def load_data():
         FileNotFoundError: If any required CSV file is missing
         Exception: For other data loading errors
     """
-    data_path = "data/"  # Path to directory containing CSV files
-    orders = pd.read_csv(data_path + 'olist_orders_dataset.csv')
-    order_items = pd.read_csv(data_path + 'olist_order_items_dataset.csv')
-    products = pd.read_csv(data_path + 'olist_products_dataset.csv')
-    customers = pd.read_csv(data_path + 'olist_customers_dataset.csv')
-    order_payments = pd.read_csv(data_path + 'olist_order_payments_dataset.csv')
-    order_reviews = pd.read_csv(data_path + 'olist_order_reviews_dataset.csv')
-    sellers = pd.read_csv(data_path + 'olist_sellers_dataset.csv')
-    product_category = pd.read_csv(data_path + 'product_category_name_translation.csv')
-    olist_geolocation_dataset = pd.read_csv(data_path + 'olist_geolocation_dataset.csv')
-    RFM_log_scaled_df = pd.read_csv(data_path + 'RFM_log_scaled_df.csv')
-
-    # Đảm bảo chuyển đổi các cột thời gian thành datetime trước khi sử dụng
-    datetime_columns = [
-        'order_purchase_timestamp', 'order_approved_at',
-        'order_delivered_carrier_date', 'order_delivered_customer_date',
-        'order_estimated_delivery_date'
-    ]
-    
-    for col in datetime_columns:
-        if col in orders.columns:
-            orders[col] = pd.to_datetime(orders[col], errors='coerce')
-    
-    return orders, order_items, products, customers, order_payments, order_reviews, sellers, product_category, olist_geolocation_dataset, RFM_log_scaled_df
+    store = SnapshotStore(data_path)
+    # Đọc song song qua snapshot dạng cột (Parquet); CSV chỉ được phân tích lại khi file nguồn thay đổi
+    tables = store.read_many(TABLE_FILES.values())
+    _log_timings(store)
+    return tuple(tables[file_name] for file_name in TABLE_FILES.values())
+
+
+def _log_timings(store: SnapshotStore) -> None:
+    # Ghi thời gian đọc từng file thành một bản ghi JSON (cùng dạng với modules.profiler)
+    record = {'event': 'load_timings', 'files': store.timings}
+    logger.info(json.dumps(record, ensure_ascii=False), extra={'profile': record})
+
+
+class FactChanges(NamedTuple):
+    """Orders rebuilt when the fact table was updated with appended rows instead of being rebuilt."""
+    # version_of('facts') của bộ dữ liệu trước khi cập nhật
+    previous_version: str
+    # Ngày đặt hàng (datetime64) của mọi đơn hàng bị thay đổi
+    dates: np.ndarray
+
+
+@dataclass(frozen=True)
+class Dataset:
+    """
+    Read-only Olist dataset shared by every Streamlit session.
+
+    All tables are FrozenDataFrame instances: dashboard code can filter,
+    merge and aggregate them, but any in-place modification raises TypeError.
+    ``version`` identifies the contents of the source files and is meant to be
+    used as a cache key for anything derived from the data.
+    The order tables (orders, items, payments, reviews, customers) are never
+    held in full: they are read chunk by chunk into the fact tables (see
+    modules.fact_table.build_fact_tables). ``facts`` has one row per order,
+    ``item_facts`` the few item columns the charts use, and
+    ``payment_totals`` / ``review_totals`` the payment and review counts per
+    order. Only the small catalog tables (products, sellers, categories) are
+    loaded as they are.
+    The geolocation table is the largest source file and is only used through
+    its summaries, so it is never held in full either: ``olist_geolocation_dataset``
+    has one row per zip code prefix and ``geolocation_tiles`` the point
+    counts per map tile (see modules.ingest.summarize_geolocation).
+    The ID columns (order_id, customer_id, customer_unique_id, product_id,
+    seller_id) hold dense int32 codes shared across tables; the original IDs
+    are available through ``keys`` / decode() (see modules.keys).
+    A filtered dataset (see modules.filters.filter_dataset) keeps a reference
+    to the unfiltered ``base`` dataset and the applied ``filters``, so that
+    structures precomputed for the base data can answer filtered queries.
+    """
+    version: str
+    facts: pd.DataFrame
+    item_facts: pd.DataFrame
+    payment_totals: pd.DataFrame
+    review_totals: pd.DataFrame
+    products: pd.DataFrame
+    sellers: pd.DataFrame
+    product_category: pd.DataFrame
+    olist_geolocation_dataset: pd.DataFrame
+    geolocation_tiles: pd.DataFrame
+    # Với bộ dữ liệu đã lọc: bộ dữ liệu gốc và lựa chọn bộ lọc (modules.filters.FilterState)
+    base: Optional['Dataset'] = None
+    filters: Optional[tuple] = None
+    # (tên bảng, token nội dung) của từng bảng nguồn
+    sources: Tuple[Tuple[str, str], ...] = ()
+    changes: Optional[FactChanges] = None
+    # Từ điển mã số nguyên <-> ID gốc của từng cột khóa
+    keys: Optional[Dict[str, KeyDictionary]] = None
+
+    def decode(self, key: str, codes) -> np.ndarray:
+        """Return the original IDs of the int32 ``codes`` of ``key`` (e.g. 'order_id')."""
+        return self.keys[key].decode(codes)
+
+    def version_of(self, *tables: str) -> str:
+        """
+        Return a version string that changes only when one of ``tables`` changes.
+
+        Args:
+            *tables (str): Source table names; 'facts' stands for every
+                source table of the fact tables (FACT_SOURCES)
+
+        Returns:
+            str: Version of those tables. A filtered dataset selects rows
+            through the fact table, so its version also covers FACT_SOURCES
+            and includes the filter selection.
+        """
+        if self.base is not None:
+            return f"{self.base.version_of('facts', *tables)}/{self.filters.key()}"
+        tokens = dict(self.sources)
+        if not tokens:
+            return self.version
+        names = set()
+        for table in tables:
+            names.update(FACT_SOURCES if table == 'facts' else (table,))
+        return tokens_version({name: tokens[name] for name in names})
+
+
+def dataset_version(data_path: str = DATA_PATH) -> str:
+    """Return the version string of the source files in ``data_path``."""
+    return SnapshotStore(data_path).version(TABLE_FILES.values())
+
+
+def _source_chunks(store: SnapshotStore, name: str, start: int = 0) -> Iterator[pd.DataFrame]:
+    # Các khối của một bảng nguồn (chỉ các cột cần cho bảng fact); ít nhất một khối, có thể rỗng
+    file_name = TABLE_FILES[name]
+    empty = True
+    for chunk in store.iter_chunks(file_name, start=start, columns=SOURCE_COLUMNS[name]):
+        empty = False
+        yield chunk
+    if empty:
+        yield apply_schema(pd.DataFrame(columns=SOURCE_COLUMNS[name]), file_name)
+
+
+@st.cache_resource(max_entries=1, show_spinner=False)
+def _load_shared_dataset(version: str, data_path: str) -> Dataset:
+    store = SnapshotStore(data_path)
+    tokens = store.tokens(TABLE_FILES.values())
+    sources = {name: tokens[file_name] for name, file_name in TABLE_FILES.items()}
+    # Bảng geolocation được đọc theo từng khối và chỉ giữ lại các bảng tổng hợp,
+    # song song với việc đọc các bảng danh mục và tạo các bảng fact
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        geolocation = pool.submit(geolocation_summary, store, sources['olist_geolocation_dataset'])
+        files = store.read_many(TABLE_FILES[name] for name in CATALOG_TABLES)
+        tables = {name: files[TABLE_FILES[name]] for name in CATALOG_TABLES}
+
+        # Các bảng fact được tạo một lần cho mỗi phiên bản của các bảng nguồn (đọc theo từng khối)
+        # và lưu cạnh các snapshot. Nếu các bảng nguồn chỉ được ghi thêm dòng, bảng cũ được cập nhật.
+        previous_sources = store.derived_sources('facts')
+        changed_dates = []
+
+        def update(previous: Dict[str, pd.DataFrame], starts: dict) -> Dict[str, pd.DataFrame]:
+            updated, dates = update_fact_tables(
+                previous, lambda name, start: _source_chunks(store, name, start),
+                starts={name: starts[TABLE_FILES[name]] for name in FACT_SOURCES}
+            )
+            changed_dates.append(dates)
+            return updated
+
+        fact_tables = store.read_derived_tables(
+            FACT_TABLES, f"{tokens_version({name: sources[name] for name in FACT_SOURCES})}.{FACT_TABLE_VERSION}",
+            lambda: build_fact_tables(*(_source_chunks(store, name) for name in FACT_SOURCES)),
+            update=update,
+            sources=[TABLE_FILES[name] for name in FACT_SOURCES]
+        )
+        tables.update(fact_tables)
+        tables['olist_geolocation_dataset'], geolocation_tiles = geolocation.result()
+    _log_timings(store)
+    changes = None
+    if changed_dates:
+        previous_version = tokens_version({name: previous_sources[TABLE_FILES[name]]['sha1'] for name in FACT_SOURCES})
+        changes = FactChanges(previous_version, changed_dates[0])
+
+    # Mã hóa các cột ID thành số nguyên int32 dùng chung giữa các bảng (sau khi đã tạo bảng fact,
+    # nên snapshot vẫn giữ ID gốc và mã chỉ cần ổn định trong một phiên bản)
+    tables, keys = encode_keys(tables)
+    return Dataset(
+        version,
+        geolocation_tiles=freeze(geolocation_tiles),
+        sources=tuple(sorted(sources.items())),
+        changes=changes,
+        keys=keys,
+        **{name: freeze(table) for name, table in tables.items()}
+    )
+
+
+def get_dataset(data_path: str = DATA_PATH) -> Dataset:
+    """
+    Return the shared, read-only dataset for the current source files.
+
+    Unlike st.cache_data, which hands every rerun of every session its own
+    deep copy, the dataset is cached with st.cache_resource: all sessions
+    reference the same frames, so memory stays flat as sessions are added.
+    The source files are fingerprinted on every call (a few stat() calls);
+    when they change, a new version is loaded and the old one is evicted.
+    The order tables are streamed from their snapshots into the fact tables,
+    so memory use grows with the number of orders and items but not with the
+    width of the source files. Rows appended to a source file are parsed on
+    their own and merged into its snapshot and into the fact tables, so an
+    hourly export refresh does not re-aggregate the history.
+    Concurrent callers (the first session and the warm-up thread) load the
+    data once: the others wait for that load and share its result.
+
+    Args:
+        data_path (str): Directory containing the source CSV files
+
+    Returns:
+        Dataset: Shared dataset with frozen tables
+
+    Raises:
+        FileNotFoundError: If any required CSV file is missing
+    """
+    with _load_lock:
+        return _load_shared_dataset(dataset_version(data_path), data_path)
@@ -0,0 +1,246 @@
+import numpy as np
+import pandas as pd
+
+# Số điểm tối đa của một đường trên biểu đồ (xấp xỉ số pixel theo chiều ngang)
+MAX_POINTS = 800
+# Số điểm tối đa của một biểu đồ phân tán (2D/3D) gửi tới trình duyệt
+SCATTER_POINTS = 5000
+# Số dòng của mẫu dùng để chọn kích thước lưới voxel
+VOXEL_SAMPLE = 100_000
+
+
+def _as_float(values: pd.Series) -> np.ndarray:
+    # Trục thời gian được đổi sang số nanogiây để tính diện tích tam giác
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values.to_numpy(dtype='datetime64[ns]').view('int64').astype('float64')
+    return values.to_numpy(dtype='float64')
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    Select ``threshold`` points with Largest-Triangle-Three-Buckets.
+
+    The first and last points are always kept. The points in between are
+    split into ``threshold - 2`` buckets; from each bucket the point forming
+    the largest triangle with the previously selected point and the mean of
+    the next bucket is kept, which preserves peaks and the visual shape.
+
+    Args:
+        x (np.ndarray): Monotonic x values
+        y (np.ndarray): y values (NaN treated as 0)
+        threshold (int): Number of points to keep (>= 3)
+
+    Returns:
+        np.ndarray: Sorted positions of the selected points
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    y = np.nan_to_num(y)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+
+    prev = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # Trung bình của bucket kế tiếp (bucket cuối cùng dùng điểm cuối)
+        next_lo, next_hi = hi, edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[next_lo:next_hi].mean()
+        avg_y = y[next_lo:next_hi].mean()
+        area = np.abs(
+            (x[prev] - avg_x) * (y[lo:hi] - y[prev])
+            - (x[prev] - x[lo:hi]) * (avg_y - y[prev])
+        )
+        prev = lo + int(np.argmax(area))
+        selected[i + 1] = prev
+    return selected
+
+
+def minmax_indices(y: np.ndarray, buckets: int) -> np.ndarray:
+    """
+    Keep the minimum and maximum point of each of ``buckets`` equal-size buckets.
+
+    Cheaper than LTTB and guarantees every local extreme of a bucket is drawn;
+    returns at most ``2 * buckets`` points plus the first and last point.
+    """
+    n = len(y)
+    if 2 * buckets >= n or buckets < 1:
+        return np.arange(n)
+    y = np.nan_to_num(y)
+    edges = np.linspace(0, n, buckets + 1).astype(np.int64)
+    # Giữ điểm nhỏ nhất và lớn nhất của từng bucket, cùng điểm đầu và điểm cuối
+    positions = [0, n - 1]
+    for lo, hi in zip(edges[:-1], edges[1:]):
+        if hi > lo:
+            chunk = y[lo:hi]
+            positions.extend((lo + int(np.argmin(chunk)), lo + int(np.argmax(chunk))))
+    return np.unique(positions)
+
+
+def downsample(df: pd.DataFrame, x: str, y: str, max_points: int = MAX_POINTS, method: str = 'lttb') -> pd.DataFrame:
+    """
+    Reduce a time-series frame to at most ``max_points`` rows for plotting.
+
+    Frames that already fit are returned unchanged, so narrowing the date
+    range automatically brings back full (per-day) detail.
+
+    Args:
+        df (pd.DataFrame): Series sorted by ``x``
+        x (str): Name of the x (date) column
+        y (str): Name of the value column
+        max_points (int): Maximum number of rows to keep
+        method (str): 'lttb' (shape preserving) or 'minmax' (extremes per bucket)
+
+    Returns:
+        pd.DataFrame: Selected rows of ``df`` in their original order
+
+    Raises:
+        ValueError: If ``method`` is unknown
+    """
+    if max_points is None or len(df) <= max_points:
+        return df
+    values = _as_float(df[y])
+    if method == 'lttb':
+        positions = lttb_indices(_as_float(df[x]), values, max_points)
+    elif method == 'minmax':
+        positions = minmax_indices(values, max(1, (max_points - 2) // 2))
+    else:
+        raise ValueError(f"Unknown downsampling method: {method}")
+    return df.iloc[positions].reset_index(drop=True)
+
+
+def allocate_budget(counts: np.ndarray, budget: int) -> np.ndarray:
+    """
+    Split ``budget`` points across groups in proportion to their sizes.
+
+    Uses largest-remainder rounding, so the quotas sum to ``min(budget,
+    counts.sum())``, no group gets more points than it has, and every
+    non-empty group keeps at least one point while the budget allows it.
+
+    Args:
+        counts (np.ndarray): Number of rows of each group
+        budget (int): Total number of points
+
+    Returns:
+        np.ndarray: Number of points to keep per group (int64)
+    """
+    counts = np.asarray(counts, dtype='int64')
+    total = int(counts.sum())
+    if total <= budget:
+        return counts.copy()
+    exact = counts * (budget / total)
+    quotas = np.floor(exact).astype('int64')
+    # Nhóm nhỏ vẫn được giữ ít nhất một điểm
+    quotas[(quotas == 0) & (counts > 0)] = 1
+    remainder = budget - int(quotas.sum())
+    if remainder > 0:
+        order = np.argsort(-(exact - quotas), kind='stable')
+        quotas[order[:remainder]] += 1
+    elif remainder < 0:
+        # Các điểm tối thiểu vượt ngân sách: lấy lại từ các nhóm lớn nhất
+        for index in np.argsort(-quotas, kind='stable')[:-remainder]:
+            quotas[index] -= 1
+    return np.minimum(quotas, counts)
+
+
+def stratified_sample(df: pd.DataFrame, group: str, max_points: int = SCATTER_POINTS, seed: int = 0) -> pd.DataFrame:
+    """
+    Randomly sample at most ``max_points`` rows, keeping each group's share.
+
+    Every group gets a quota from allocate_budget() and a uniform random
+    subset of that size (seeded, so the same frame gives the same sample).
+    A ``weight`` column holds the number of rows each sampled row stands
+    for; the weights of a group sum to its size.
+
+    Args:
+        df (pd.DataFrame): Rows to sample
+        group (str): Column with the group (e.g. cluster) labels
+        max_points (int): Maximum number of rows to keep
+        seed (int): Seed of the random generator
+
+    Returns:
+        pd.DataFrame: Sampled rows in their original order, plus ``weight``
+    """
+    codes, groups = pd.factorize(df[group], sort=True)
+    counts = np.bincount(codes, minlength=len(groups))
+    quotas = allocate_budget(counts, max_points)
+    # Các dòng được xếp theo nhóm (sắp xếp ổn định), rồi chọn ngẫu nhiên trong từng nhóm
+    rng = np.random.default_rng(seed)
+    order = np.argsort(codes, kind='stable')
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    keep = np.zeros(len(df), dtype=bool)
+    for start, count, quota in zip(starts, counts, quotas):
+        keep[order[start + rng.choice(count, quota, replace=False)]] = True
+    sample = df[keep].reset_index(drop=True)
+    sample['weight'] = (counts / np.maximum(quotas, 1))[codes[keep]]
+    return sample
+
+
+def voxel_reduce(df: pd.DataFrame, columns, group: str, max_points: int = SCATTER_POINTS) -> pd.DataFrame:
+    """
+    Aggregate points into a regular grid of voxels per group.
+
+    The bounding box of ``columns`` is split into ``bins`` equal steps per
+    axis; each non-empty (group, voxel) becomes one point at the mean of its
+    rows with their count. The grid is refined as far as the result still
+    fits into ``max_points`` rows, so dense regions collapse while outliers
+    stay visible. The counts of a group sum to its size.
+
+    Args:
+        df (pd.DataFrame): Points to reduce
+        columns: Coordinate column names
+        group (str): Column with the group labels (never merged across)
+        max_points (int): Maximum number of voxels to return
+
+    Returns:
+        pd.DataFrame: ``group``, the mean of every coordinate column and ``count``
+    """
+    columns = list(columns)
+    values = df[columns].to_numpy(dtype='float64')
+    codes, groups = pd.factorize(df[group], sort=True)
+    if len(values) == 0:
+        return pd.DataFrame({group: groups[:0], **{column: values[:0, 0] for column in columns}, 'count': codes[:0]})
+    low = values.min(axis=0)
+    span = values.max(axis=0) - low
+    span[span == 0] = 1.0
+    unit = (values - low) / span
+
+    def bin_keys(rows: np.ndarray, bins: int) -> np.ndarray:
+        cells = np.minimum((unit[rows] * bins).astype('int64'), bins - 1)
+        keys = codes[rows].astype('int64')
+        for axis in range(len(columns)):
+            keys = keys * bins + cells[:, axis]
+        return keys
+
+    def occupied(keys: np.ndarray, bins: int) -> int:
+        size = len(groups) * bins ** len(columns)
+        # Không gian khóa không lớn hơn nhiều so với số điểm: đếm bằng bincount (O(n)) thay vì sắp xếp
+        if size <= 4 * len(keys) + (1 << 16):
+            return int(np.count_nonzero(np.bincount(keys, minlength=size)))
+        return len(np.unique(keys))
+
+    # Tìm lưới trên một mẫu: tăng số ô mỗi trục (khoảng 26% mỗi bước) đến khi vượt ngân sách
+    rows = np.arange(len(values))
+    if len(rows) > VOXEL_SAMPLE:
+        rows = np.sort(np.random.default_rng(0).choice(len(rows), VOXEL_SAMPLE, replace=False))
+    steps = [1]
+    while steps[-1] < 1024:
+        finer = max(steps[-1] + 1, int(steps[-1] * 1.26))
+        if occupied(bin_keys(rows, finer), finer) > max_points:
+            break
+        steps.append(finer)
+    # Toàn bộ dữ liệu có thể chiếm nhiều voxel hơn mẫu: lùi lại nếu vượt ngân sách
+    every = np.arange(len(values))
+    bins = steps.pop()
+    keys = bin_keys(every, bins)
+    while steps and occupied(keys, bins) > max_points:
+        bins = steps.pop()
+        keys = bin_keys(every, bins)
+    voxels, inverse, counts = np.unique(keys, return_inverse=True, return_counts=True)
+    # Mã nhóm là phần đứng đầu của khóa voxel
+    result = {group: groups[voxels // bins ** len(columns)]}
+    for axis, column in enumerate(columns):
+        result[column] = np.bincount(inverse, weights=values[:, axis], minlength=len(voxels)) / counts
+    result['count'] = counts
+    return pd.DataFrame(result)
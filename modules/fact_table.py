@@ -0,0 +1,326 @@
+from typing import Callable, Dict, Iterable, List, Tuple
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+# Tăng giá trị này khi thay đổi cấu trúc các bảng fact để tạo lại bản lưu trên đĩa
+FACT_TABLE_VERSION = 4
+# Các bảng dẫn xuất từ các bảng đơn hàng; chỉ các bảng này (không phải bảng nguồn) được giữ trong bộ nhớ
+FACT_TABLES = ('facts', 'item_facts', 'payment_totals', 'review_totals')
+# Cột của các bảng nguồn cần cho các bảng fact (chỉ các cột này được đọc từ snapshot)
+SOURCE_COLUMNS = {
+    'orders': [
+        'order_id', 'customer_id', 'order_status',
+        'order_purchase_timestamp', 'order_delivered_customer_date'
+    ],
+    'order_payments': ['order_id', 'payment_type', 'payment_value'],
+    'order_reviews': ['order_id', 'review_score'],
+    'customers': [
+        'customer_id', 'customer_unique_id', 'customer_state', 'customer_city', 'customer_zip_code_prefix'
+    ],
+    'order_items': ['order_id', 'product_id', 'seller_id', 'price', 'freight_value'],
+}
+
+
+def _concat_frames(parts: List[pd.DataFrame]) -> pd.DataFrame:
+    # Nối các phần của một bảng, hợp nhất danh mục để các cột category không bị chuyển thành object
+    columns = {}
+    for col in parts[0].columns:
+        values = [part[col] for part in parts]
+        if all(isinstance(value.dtype, pd.CategoricalDtype) for value in values):
+            columns[col] = union_categoricals(values, sort_categories=True, ignore_order=True)
+        else:
+            columns[col] = pd.concat(values, ignore_index=True)
+    return pd.DataFrame(columns)
+
+
+def _payment_totals(chunks: Iterable[pd.DataFrame], start: int = 0) -> pd.DataFrame:
+    # Số khoản và tổng thanh toán theo (đơn hàng, phương thức), cùng khoản lớn nhất của mỗi nhóm
+    # (giá trị và số dòng trong file nguồn, để chọn phương thức chính giống như khi sắp xếp cả file)
+    totals = []
+    for chunk in chunks:
+        rows = np.arange(start, start + len(chunk), dtype='int64')
+        start += len(chunk)
+        present = chunk['order_id'].notna().to_numpy()
+        chunk = chunk[present].assign(largest_payment_row=rows[present])
+        grouped = chunk.groupby(['order_id', 'payment_type'], observed=True, dropna=False, sort=False)
+        sums = grouped['payment_value'].agg(payments='size', payment_value='sum').reset_index()
+        # Sắp xếp ổn định: khi bằng nhau, khoản xuất hiện trước trong file được giữ lại
+        largest = (
+            chunk.sort_values('payment_value', ascending=False, kind='stable')
+            .drop_duplicates(['order_id', 'payment_type'])
+            [['order_id', 'payment_type', 'payment_value', 'largest_payment_row']]
+            .rename(columns={'payment_value': 'largest_payment'})
+        )
+        totals.append(sums.merge(largest, on=['order_id', 'payment_type'], how='left'))
+    return _merge_payment_totals(totals)
+
+
+def _merge_payment_totals(parts: List[pd.DataFrame]) -> pd.DataFrame:
+    # Gộp các bảng payment_totals của các phần liên tiếp của file nguồn (theo thứ tự trong file)
+    totals = _concat_frames(parts)
+    keys = ['order_id', 'payment_type']
+    sums = totals.groupby(keys, observed=True, dropna=False, sort=False)[['payments', 'payment_value']].sum()
+    largest = (
+        totals.sort_values(['largest_payment', 'largest_payment_row'], ascending=[False, True], na_position='last')
+        .drop_duplicates(keys)
+        .set_index(keys)[['largest_payment', 'largest_payment_row']]
+    )
+    merged = sums.join(largest).reset_index()
+    return merged.astype({'payments': 'int32', 'largest_payment_row': 'int64'})
+
+
+def _main_payment(payment_totals: pd.DataFrame) -> pd.Series:
+    # Phương thức của khoản thanh toán lớn nhất mỗi đơn (khoản xuất hiện trước trong file khi bằng nhau)
+    return (
+        payment_totals.sort_values(
+            ['largest_payment', 'largest_payment_row'], ascending=[False, True], na_position='last'
+        )
+        .drop_duplicates('order_id')
+        .set_index('order_id')['payment_type']
+    )
+
+
+def _review_totals(chunks: Iterable[pd.DataFrame]) -> pd.DataFrame:
+    # Số đánh giá theo (đơn hàng, điểm)
+    parts = []
+    for chunk in chunks:
+        chunk = chunk[chunk['order_id'].notna()]
+        parts.append(chunk.groupby(['order_id', 'review_score'], dropna=False, sort=False).size().rename('reviews').reset_index())
+    return _merge_review_totals(parts)
+
+
+def _merge_review_totals(parts: List[pd.DataFrame]) -> pd.DataFrame:
+    totals = _concat_frames(parts).groupby(['order_id', 'review_score'], dropna=False, sort=False)['reviews'].sum()
+    return totals.astype('int32').reset_index()
+
+
+def _review_scores(review_totals: pd.DataFrame) -> pd.Series:
+    # Điểm đánh giá trung bình của mỗi đơn hàng
+    scored = review_totals[review_totals['review_score'].notna()]
+    score_sums = (scored['review_score'].astype('float64') * scored['reviews']).groupby(scored['order_id']).sum()
+    return (score_sums / scored.groupby('order_id')['reviews'].sum()).astype('float32').rename('review_score')
+
+
+def _customer_info(chunks: Iterable[pd.DataFrame]) -> pd.DataFrame:
+    # Thông tin khách hàng theo customer_id (dòng đầu tiên của mỗi khách hàng trong file)
+    return (
+        _concat_frames([chunk.drop_duplicates('customer_id') for chunk in chunks])
+        .drop_duplicates('customer_id')
+        .set_index('customer_id')[SOURCE_COLUMNS['customers'][1:]]
+    )
+
+
+def _order_facts(
+    orders: Iterable[pd.DataFrame],
+    payment_totals: pd.DataFrame,
+    review_totals: pd.DataFrame,
+    item_facts: pd.DataFrame,
+    customer_info: pd.DataFrame
+) -> pd.DataFrame:
+    # Nối từng khối đơn hàng với các tổng hợp theo đơn hàng và thông tin khách hàng
+    payment_values = payment_totals.groupby('order_id')['payment_value'].sum()
+    main_payment = _main_payment(payment_totals)
+    review_scores = _review_scores(review_totals)
+    item_counts = item_facts.groupby('order_id').size().rename('item_count')
+
+    parts = []
+    for chunk in orders:
+        facts = chunk[SOURCE_COLUMNS['orders']]
+        facts = facts.join(payment_values, on='order_id').join(review_scores, on='order_id')
+        facts = facts.join(main_payment, on='order_id').join(item_counts, on='order_id')
+        facts['item_count'] = facts['item_count'].fillna(0).astype('int16')
+        facts = facts.join(customer_info, on='customer_id')
+
+        purchase = facts['order_purchase_timestamp']
+        delivery = facts['order_delivered_customer_date'] - purchase
+        hour = purchase.dt.hour
+        if not hour.isna().any():
+            hour = hour.astype('int8')
+        parts.append(facts.assign(
+            delivery_days=(delivery.dt.total_seconds() / (24 * 60 * 60)).astype('float32'),
+            date=purchase.dt.normalize(),
+            month=purchase.dt.to_period('M').dt.to_timestamp(),
+            hour=hour
+        ))
+    return _concat_frames(parts)
+
+
+def build_fact_tables(
+    orders: Iterable[pd.DataFrame],
+    order_payments: Iterable[pd.DataFrame],
+    order_reviews: Iterable[pd.DataFrame],
+    customers: Iterable[pd.DataFrame],
+    order_items: Iterable[pd.DataFrame]
+) -> Dict[str, pd.DataFrame]:
+    """
+    Build the fact tables (FACT_TABLES) from the order tables, read chunk by chunk.
+
+    Each argument yields chunks of one source table (a whole table can be
+    passed as ``[df]``); only the columns in SOURCE_COLUMNS are used.
+    Payments, reviews, items and customers are reduced to per-order
+    summaries first, then every chunk of orders is joined with them, so no
+    source table has to be held in full.
+
+    Args:
+        orders (Iterable[pd.DataFrame]): Chunks of the orders dataset
+        order_payments (Iterable[pd.DataFrame]): Chunks of the order payments dataset
+        order_reviews (Iterable[pd.DataFrame]): Chunks of the order reviews dataset
+        customers (Iterable[pd.DataFrame]): Chunks of the customers dataset
+        order_items (Iterable[pd.DataFrame]): Chunks of the order items dataset
+
+    Returns:
+        Dict[str, pd.DataFrame]: Tables by name
+            - facts: One row per order with the columns
+                - order_id, customer_id, customer_unique_id
+                - customer_state, customer_city, order_status (categorical)
+                - customer_zip_code_prefix
+                - order_purchase_timestamp, order_delivered_customer_date
+                - payment_value: Sum of all payments of the order (NaN if none)
+                - payment_type: Type of the largest payment of the order (categorical)
+                - item_count: Number of items in the order
+                - review_score: Mean review score of the order (NaN if none)
+                - delivery_days: Purchase to delivery time in fractional days
+                - date, month: Purchase day and first day of the purchase month
+                - hour: Purchase hour (0-23)
+            - item_facts: One row per order item (order_id, product_id,
+              seller_id, price, freight_value)
+            - payment_totals: Number (payments) and sum (payment_value) of
+              the payments per order and payment type, with the largest
+              payment of the group and its source row (largest_payment,
+              largest_payment_row) so that appended payments can be merged
+            - review_totals: Number of reviews (reviews) per order and review score
+    """
+    payment_totals = _payment_totals(order_payments)
+    review_totals = _review_totals(order_reviews)
+    item_facts = _concat_frames([chunk[SOURCE_COLUMNS['order_items']] for chunk in order_items])
+    customer_info = _customer_info(customers)
+    return {
+        'facts': _order_facts(orders, payment_totals, review_totals, item_facts, customer_info),
+        'item_facts': item_facts,
+        'payment_totals': payment_totals,
+        'review_totals': review_totals,
+    }
+
+
+def build_order_facts(
+    orders: pd.DataFrame,
+    order_payments: pd.DataFrame,
+    order_reviews: pd.DataFrame,
+    customers: pd.DataFrame,
+    order_items: pd.DataFrame
+) -> pd.DataFrame:
+    """
+    Build the order-level fact table from fully loaded order tables.
+
+    Same as build_fact_tables(...)['facts'] with every table passed as a single chunk.
+
+    Returns:
+        pd.DataFrame: Fact table, one row per order (see build_fact_tables)
+    """
+    return build_fact_tables([orders], [order_payments], [order_reviews], [customers], [order_items])['facts']
+
+
+def update_fact_tables(
+    tables: Dict[str, pd.DataFrame],
+    chunks: Callable[[str, int], Iterable[pd.DataFrame]],
+    starts: Dict[str, int]
+) -> Tuple[Dict[str, pd.DataFrame], np.ndarray]:
+    """
+    Update the fact tables after rows were appended to their source tables.
+
+    Only the appended rows are read: they are aggregated like in
+    build_fact_tables() and merged into the stored per-order tables
+    (payment and review totals are added up, items are appended). The fact
+    rows of the orders they touch are then recomputed from the merged
+    tables, in place, and the new orders are added at the end, so the
+    result equals a full rebuild. The only older rows ever read are those of
+    customers that appear in new orders but in no stored order. As in the
+    Olist exports, customer rows are assumed to be unique per customer_id.
+
+    Args:
+        tables (Dict[str, pd.DataFrame]): Fact tables built from the earlier source tables
+        chunks (Callable[[str, int], Iterable[pd.DataFrame]]): Function returning
+            the chunks of a source table (e.g. 'orders', columns of
+            SOURCE_COLUMNS) from a given row on
+        starts (Dict[str, int]): Per source table name, the first row
+            appended since ``tables`` were built
+
+    Returns:
+        Tuple[Dict[str, pd.DataFrame], np.ndarray]: The updated fact tables,
+        and the purchase dates (datetime64) of every changed or added order
+    """
+    facts = tables['facts']
+    new_payments = [chunk for chunk in chunks('order_payments', starts['order_payments']) if len(chunk)]
+    new_reviews = [chunk for chunk in chunks('order_reviews', starts['order_reviews']) if len(chunk)]
+    new_items = [chunk[SOURCE_COLUMNS['order_items']] for chunk in chunks('order_items', starts['order_items']) if len(chunk)]
+    orders = [chunk for chunk in chunks('orders', starts['orders']) if len(chunk)]
+    new_customers = [chunk for chunk in chunks('customers', starts['customers']) if len(chunk)]
+
+    payment_totals, review_totals = tables['payment_totals'], tables['review_totals']
+    if new_payments:
+        payment_totals = _merge_payment_totals(
+            [payment_totals, _payment_totals(new_payments, start=starts['order_payments'])]
+        )
+    if new_reviews:
+        review_totals = _merge_review_totals([review_totals, _review_totals(new_reviews)])
+    item_facts = _concat_frames([tables['item_facts'], *new_items])
+
+    added_customers = (
+        pd.Index(pd.concat([chunk['customer_id'] for chunk in new_customers]).dropna().unique())
+        if new_customers else pd.Index([])
+    )
+    # Các đơn hàng cũ bị ảnh hưởng: có thanh toán, đánh giá, sản phẩm mới, hoặc nay mới có thông tin khách hàng
+    touched = [chunk['order_id'] for chunk in new_payments + new_reviews + new_items]
+    touched = pd.Index(pd.concat(touched, ignore_index=True).dropna().unique()) if touched else pd.Index([])
+    stale = facts['order_id'].isin(touched).to_numpy() | (
+        facts['customer_unique_id'].isna() & facts['customer_id'].isin(added_customers)
+    ).to_numpy()
+    order_columns = SOURCE_COLUMNS['orders']
+    orders = [facts.loc[stale, order_columns], *orders]
+
+    # Chỉ các dòng tổng hợp và khách hàng của các đơn được tính lại
+    order_ids = pd.concat([chunk['order_id'] for chunk in orders]).dropna().unique()
+    customer_ids = pd.Index(pd.concat([chunk['customer_id'] for chunk in orders]).dropna().unique())
+    # Thông tin khách hàng: dòng đầu tiên của mỗi khách hàng, nên các đơn cũ giữ thông tin đã có
+    # và khách hàng chỉ xuất hiện trong các dòng mới bổ sung cho các đơn chưa có thông tin
+    info_columns = SOURCE_COLUMNS['customers']
+    known = facts[facts['customer_unique_id'].notna() & facts['customer_id'].isin(customer_ids)]
+    customer_info = _customer_info([known[info_columns]] + [chunk[info_columns] for chunk in new_customers])
+
+    customer_chunks = new_customers
+    missing = customer_ids.difference(customer_info.index)
+    if len(missing):
+        # Khách hàng của đơn mới không có trong các đơn đã lưu: tìm trong các dòng cũ của bảng khách hàng
+        earlier = [chunk[chunk['customer_id'].isin(missing)] for chunk in chunks('customers', 0)]
+        customer_chunks = new_customers or earlier
+        customer_info = _customer_info([customer_info.reset_index()[info_columns], *earlier])
+
+    refreshed = _order_facts(
+        orders,
+        payment_totals[payment_totals['order_id'].isin(order_ids)],
+        review_totals[review_totals['order_id'].isin(order_ids)],
+        item_facts[item_facts['order_id'].isin(order_ids)],
+        customer_info
+    )
+    # Các đơn cũ được tính lại giữ nguyên vị trí, các đơn mới được thêm vào cuối (như khi tạo lại toàn bộ)
+    added = len(refreshed) - int(stale.sum())
+    positions = np.concatenate([np.flatnonzero(~stale), np.flatnonzero(stale), len(facts) + np.arange(added)])
+    combined = _concat_frames([facts[~stale].reset_index(drop=True), refreshed])
+    updated_facts = combined.iloc[np.argsort(positions, kind='stable')].reset_index(drop=True)
+    # Cột số nguyên của khách hàng thành float khi có đơn thiếu thông tin; trả lại kiểu gốc khi không còn thiếu
+    source_dtypes = customer_chunks[0].dtypes if customer_chunks else {}
+    for column in SOURCE_COLUMNS['customers'][1:]:
+        dtype = source_dtypes.get(column)
+        if dtype is not None and pd.api.types.is_integer_dtype(dtype) and updated_facts[column].notna().all():
+            updated_facts[column] = updated_facts[column].astype(dtype)
+
+    dates = pd.concat([facts.loc[stale, 'date'], refreshed['date']]).dropna().unique()
+    updated = {
+        'facts': updated_facts,
+        'item_facts': item_facts,
+        'payment_totals': payment_totals,
+        'review_totals': review_totals,
+    }
+    return updated, np.asarray(dates, dtype='datetime64[ns]')
@@ -0,0 +1,106 @@
+import json
+import threading
+from collections import OrderedDict
+from typing import Callable, Hashable, Optional, Tuple
+
+import plotly.graph_objects as go
+import streamlit as st
+from modules.profiler import profile
+
+# Số biểu đồ tối đa và tổng kích thước JSON tối đa được giữ lại (LRU)
+FIGURE_CACHE_SIZE = 128
+FIGURE_CACHE_BYTES = 64 * 1024 * 1024
+
+
+class FigureCache:
+    """
+    Size-bounded LRU cache of serialized Plotly figures.
+
+    Figures are stored as JSON strings, so a cached entry is immutable and can
+    be shared by every session; each hit builds a fresh Figure from the JSON
+    without re-running Plotly validation. Entries are evicted least recently
+    used first once either the entry count or the total JSON size is exceeded.
+    """
+
+    def __init__(self, max_entries: int = FIGURE_CACHE_SIZE, max_bytes: int = FIGURE_CACHE_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: 'OrderedDict[Hashable, str]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Optional[str]:
+        """Return the JSON stored under ``key`` (marking it recently used), or None."""
+        with self._lock:
+            spec = self._entries.get(key)
+            if spec is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return spec
+
+    def put(self, key: Hashable, spec: str) -> None:
+        """Store the figure JSON ``spec`` under ``key`` and evict old entries if needed."""
+        with self._lock:
+            if key in self._entries:
+                self.nbytes -= len(self._entries.pop(key))
+            self._entries[key] = spec
+            self.nbytes += len(spec)
+            while self._entries and (len(self._entries) > self.max_entries or self.nbytes > self.max_bytes):
+                _, evicted = self._entries.popitem(last=False)
+                self.nbytes -= len(evicted)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+
+@st.cache_resource(show_spinner=False)
+def figure_cache() -> FigureCache:
+    """Return the process-wide FigureCache shared by all sessions."""
+    return FigureCache()
+
+
+def figure_key(chart_id: str, version: str, params: dict) -> Tuple:
+    """Return the cache key of a chart: (chart id, dataset version, sorted parameters)."""
+    return (chart_id, version, tuple(sorted((name, repr(value)) for name, value in params.items())))
+
+
+def cached_figure(
+    chart_id: str,
+    data,
+    build: Callable[[], go.Figure],
+    sources: Optional[Tuple[str, ...]] = None,
+    **params
+) -> go.Figure:
+    """
+    Return the figure ``chart_id`` of ``data``, building it only on a cache miss.
+
+    Args:
+        chart_id (str): Unique name of the chart
+        data (Dataset): Dataset the figure is built from (keyed by its version)
+        build (Callable[[], go.Figure]): Function building the figure
+        sources (Optional[Tuple[str, ...]]): Source tables the figure reads;
+            if given, the figure is keyed by Dataset.version_of(*sources)
+            and survives a refresh of the other tables
+        **params: Every other value the figure depends on (e.g. the date range)
+
+    Returns:
+        go.Figure: The figure, rebuilt from its cached JSON on a hit
+    """
+    with profile(f"figure:{chart_id}"):
+        cache = figure_cache()
+        key = figure_key(chart_id, data.version_of(*sources) if sources else data.version, params)
+        spec = cache.get(key)
+        if spec is None:
+            spec = build().to_json()
+            cache.put(key, spec)
+        # JSON đã được kiểm tra khi tạo biểu đồ lần đầu nên bỏ qua bước kiểm tra lại
+        return go.Figure(json.loads(spec), _validate=False)
@@ -1,18 +1,191 @@
 # Các bộ lọc
-import streamlit as st
+import datetime
+import hashlib
+from typing import NamedTuple, Optional, Tuple
+
+import numpy as np
 import pandas as pd
-def apply_filters(orders):
+import streamlit as st
+from modules.data_loader import Dataset
+from modules.frozen import freeze
+from modules.keys import key_positions
+
+# Số bộ dữ liệu đã lọc được giữ lại (dùng chung giữa các phiên, LRU)
+FILTER_CACHE_SIZE = 8
+
+
+class FilterState(NamedTuple):
+    """Global filter selection. ``None`` means "no restriction"."""
+    start_date: Optional[datetime.date] = None
+    end_date: Optional[datetime.date] = None
+    statuses: Optional[Tuple[str, ...]] = None
+
+    def key(self) -> str:
+        """Short, stable identifier of the selection (used in dataset versions)."""
+        return hashlib.sha1(repr(tuple(self)).encode()).hexdigest()[:8]
+
+
+class FilterIndex:
+    """
+    Precomputed index for filtering every order-related table of a Dataset.
+
+    Orders are sorted by purchase timestamp once, so a date range becomes two
+    binary searches (np.searchsorted) on an int64 array, and the status filter
+    is a lookup of the categorical status codes inside that slice. The row
+    positions of each item and payment / review total in the fact table are
+    also precomputed, so the order selection is propagated to the other tables
+    with integer gathers instead of key joins.
+    """
+
+    def __init__(self, data: Dataset):
+        facts = data.facts
+        timestamps = facts['order_purchase_timestamp'].to_numpy(dtype='datetime64[ns]').view('int64')
+        self.order = np.argsort(timestamps, kind='stable')
+        self.sorted_timestamps = timestamps[self.order]
+
+        status = facts['order_status'].astype('category')
+        self.statuses = list(status.cat.categories)
+        self.sorted_status_codes = status.cat.codes.to_numpy()[self.order]
+
+        def positions(key, index, lookup):
+            # Cột ID đã mã hóa (modules.keys): tra vị trí bằng mảng thay vì băm chuỗi
+            if data.keys and key in data.keys:
+                return key_positions(index, lookup, len(data.keys[key]))
+            return pd.Index(index).get_indexer(lookup)
+
+        self.item_order_pos = positions('order_id', facts['order_id'], data.item_facts['order_id'])
+        self.payment_order_pos = positions('order_id', facts['order_id'], data.payment_totals['order_id'])
+        self.review_order_pos = positions('order_id', facts['order_id'], data.review_totals['order_id'])
+
+        # Vị trí sản phẩm / người bán tương ứng với mỗi sản phẩm bán ra
+        self.item_product_pos = positions('product_id', data.products['product_id'], data.item_facts['product_id'])
+        self.item_seller_pos = positions('seller_id', data.sellers['seller_id'], data.item_facts['seller_id'])
+
+    def select(self, state: FilterState) -> np.ndarray:
+        """
+        Return the fact table row positions matching ``state``, in table order.
+
+        Args:
+            state (FilterState): Date range (inclusive) and order statuses
+
+        Returns:
+            np.ndarray: Sorted row positions into Dataset.facts
+        """
+        lo, hi = 0, len(self.sorted_timestamps)
+        if state.start_date is not None:
+            start = pd.Timestamp(state.start_date).value
+            lo = np.searchsorted(self.sorted_timestamps, start, side='left')
+        if state.end_date is not None:
+            # Ngày kết thúc được tính trọn ngày
+            end = (pd.Timestamp(state.end_date) + pd.Timedelta(days=1)).value
+            hi = np.searchsorted(self.sorted_timestamps, end, side='left')
+        positions = self.order[lo:hi]
+        if state.statuses is not None:
+            allowed = np.isin(self.statuses, state.statuses)
+            codes = self.sorted_status_codes[lo:hi]
+            # Mã -1 (trạng thái thiếu) không bao giờ được chọn
+            positions = positions[(codes >= 0) & allowed[codes]]
+        return np.sort(positions)
+
+    def mask(self, positions: np.ndarray, order_pos: np.ndarray) -> np.ndarray:
+        """Return a row mask over a table whose rows point to ``order_pos`` in the fact table."""
+        # Phần tử cuối (luôn False) dành cho các dòng không tìm thấy đơn hàng (vị trí -1)
+        return np.append(_hits(len(self.order), positions), False)[order_pos]
+
+
+def _hits(size: int, positions: np.ndarray) -> np.ndarray:
+    """Return a boolean array of length ``size`` that is True at ``positions`` (negatives ignored)."""
+    hit = np.zeros(size, dtype=bool)
+    hit[positions[positions >= 0]] = True
+    return hit
+
+
+@st.cache_resource(max_entries=2, show_spinner=False, hash_funcs={Dataset: lambda d: d.version})
+def filter_index(data: Dataset) -> FilterIndex:
+    """Return the FilterIndex of ``data``, built once per data version."""
+    return FilterIndex(data)
+
+
+@st.cache_resource(max_entries=FILTER_CACHE_SIZE, show_spinner=False, hash_funcs={Dataset: lambda d: d.version})
+def filter_dataset(data: Dataset, state: FilterState) -> Dataset:
+    """
+    Apply the global filters to every order-related table of ``data``.
+
+    The fact tables (orders, items, payment and review totals) are restricted
+    to the selected orders; products and sellers to those taking part in them.
+    The result is a shared, read-only Dataset whose version combines the data
+    version and the filter selection, so aggregations memoized on the version
+    are keyed by (data version, filter state).
+
+    Args:
+        data (Dataset): Shared dataset
+        state (FilterState): Global filter selection
+
+    Returns:
+        Dataset: Filtered dataset (``data`` itself if nothing is filtered)
+    """
+    if state == FilterState():
+        return data
+    index = filter_index(data)
+    positions = index.select(state)
+
+    item_mask = index.mask(positions, index.item_order_pos)
+    tables = {
+        'item_facts': data.item_facts[item_mask],
+        'payment_totals': data.payment_totals[index.mask(positions, index.payment_order_pos)],
+        'review_totals': data.review_totals[index.mask(positions, index.review_order_pos)],
+        'products': data.products[_hits(len(data.products), index.item_product_pos[item_mask])],
+        'sellers': data.sellers[_hits(len(data.sellers), index.item_seller_pos[item_mask])],
+    }
+    return Dataset(
+        version=f"{data.version}/{state.key()}",
+        facts=freeze(data.facts.take(positions)),
+        product_category=data.product_category,
+        olist_geolocation_dataset=data.olist_geolocation_dataset,
+        geolocation_tiles=data.geolocation_tiles,
+        keys=data.keys,
+        base=data,
+        filters=state,
+        **{name: freeze(table) for name, table in tables.items()}
+    )
+
+
+def apply_filters(data: Dataset) -> Dataset:
+    """
+    Render the global sidebar filters and return the filtered dataset.
+
+    Args:
+        data (Dataset): Shared dataset
+
+    Returns:
+        Dataset: Dataset restricted to the selected date range and order statuses
+    """
+    index = filter_index(data)
+    facts = data.facts
+
     # Bộ lọc theo khoảng thời gian
-    min_date = orders['order_purchase_timestamp'].min().date()
-    max_date = orders['order_purchase_timestamp'].max().date()
-    
+    min_date = facts['order_purchase_timestamp'].min().date()
+    max_date = facts['order_purchase_timestamp'].max().date()
     date_range = st.sidebar.date_input(
         "Chọn khoảng thời gian",
         [min_date, max_date],
         min_value=min_date,
         max_value=max_date
     )
-    
-    filtered_orders = orders[(orders['order_purchase_timestamp'] >= pd.to_datetime(date_range[0])) & 
-                             (orders['order_purchase_timestamp'] <= pd.to_datetime(date_range[1]))]
-    return filtered_orders
+    # Khi người dùng mới chọn ngày bắt đầu, date_input chỉ trả về một giá trị
+    start_date = date_range[0] if len(date_range) > 0 else min_date
+    end_date = date_range[1] if len(date_range) > 1 else max_date
+
+    # Bộ lọc theo trạng thái đơn hàng
+    selected_status = st.sidebar.multiselect(
+        "Chọn trạng thái đơn hàng",
+        options=index.statuses,
+        default=index.statuses
+    )
+
+    state = FilterState(
+        start_date=start_date if start_date > min_date else None,
+        end_date=end_date if end_date < max_date else None,
+        statuses=tuple(selected_status) if len(selected_status) < len(index.statuses) else None
+    )
+    return filter_dataset(data, state)
@@ -0,0 +1,96 @@
+import pandas as pd
+
+READ_ONLY_MESSAGE = (
+    "Shared dataset tables are read-only; derive a new frame "
+    "(e.g. df.assign(...) or df.copy()) instead of modifying it in place"
+)
+
+
+class _ReadOnlyIndexer:
+    """Wrap a .loc/.iloc/.at/.iat indexer so that reads work and writes raise."""
+
+    def __init__(self, indexer):
+        self._indexer = indexer
+
+    def __getitem__(self, key):
+        return self._indexer[key]
+
+    def __setitem__(self, key, value):
+        raise TypeError(READ_ONLY_MESSAGE)
+
+    def __call__(self, axis=None):
+        return _ReadOnlyIndexer(self._indexer(axis))
+
+    def __getattr__(self, name):
+        return getattr(self._indexer, name)
+
+
+class FrozenDataFrame(pd.DataFrame):
+    """
+    DataFrame that rejects in-place modification.
+
+    Used for the tables of the shared dataset (see modules.data_loader.get_dataset),
+    which is a single object referenced by every Streamlit session. Column
+    assignment, deletion, inplace=True operations and indexer writes raise
+    TypeError. Anything derived from a frozen frame (filters, merges, copy())
+    is a regular, mutable pd.DataFrame.
+    """
+
+    @property
+    def _constructor(self):
+        return pd.DataFrame
+
+    def _update_inplace(self, *args, **kwargs):
+        raise TypeError(READ_ONLY_MESSAGE)
+
+    def __setitem__(self, key, value):
+        raise TypeError(READ_ONLY_MESSAGE)
+
+    def __delitem__(self, key):
+        raise TypeError(READ_ONLY_MESSAGE)
+
+    def __setattr__(self, name, value):
+        if name in ('columns', 'index'):
+            raise TypeError(READ_ONLY_MESSAGE)
+        super().__setattr__(name, value)
+
+    def insert(self, *args, **kwargs):
+        raise TypeError(READ_ONLY_MESSAGE)
+
+    def update(self, *args, **kwargs):
+        raise TypeError(READ_ONLY_MESSAGE)
+
+    @property
+    def loc(self):
+        return _ReadOnlyIndexer(pd.DataFrame.loc.fget(self))
+
+    @property
+    def iloc(self):
+        return _ReadOnlyIndexer(pd.DataFrame.iloc.fget(self))
+
+    @property
+    def at(self):
+        return _ReadOnlyIndexer(pd.DataFrame.at.fget(self))
+
+    @property
+    def iat(self):
+        return _ReadOnlyIndexer(pd.DataFrame.iat.fget(self))
+
+
+def freeze(df: pd.DataFrame) -> FrozenDataFrame:
+    """
+    Return a read-only view of ``df`` without copying its data.
+
+    Frames derived from the view share its column arrays until written. That is
+    safe only with Copy-on-Write, which pandas >= 3 always uses; on older pandas
+    the app enables it at startup (see ``app.py``).
+
+    Args:
+        df (pd.DataFrame): Frame to protect
+
+    Returns:
+        FrozenDataFrame: Frame sharing the same column arrays as ``df``
+    """
+    if isinstance(df, FrozenDataFrame):
+        return df
+    return FrozenDataFrame(df, copy=False)
@@ -0,0 +1,73 @@
+import json
+import math
+import os
+from typing import Optional, Tuple
+
+import streamlit as st
+
+# Thư mục chứa ranh giới tiểu bang đi kèm ứng dụng (không phụ thuộc OLIST_DATA_PATH)
+GEO_PATH = os.environ.get(
+    "OLIST_GEO_PATH", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'geo')
+)
+# Ranh giới 27 tiểu bang vẽ tay gần đúng (vài đến vài chục đỉnh mỗi tiểu bang, có khe hở nhỏ giữa các tiểu bang)
+STATE_FILE = 'br_states.geojson'
+# Thuộc tính chứa mã tiểu bang (UF, ví dụ 'SP') của mỗi feature trong file nguồn
+STATE_PROPERTY = 'sigla'
+# Khung bao của Brazil (vĩ độ min, max; kinh độ min, max)
+BRAZIL_BOUNDS = (-34.0, 5.5, -74.5, -34.0)
+
+
+def _read_geojson(path: str) -> dict:
+    with open(path, encoding='utf-8') as f:
+        geojson = json.load(f)
+    # Dùng mã tiểu bang làm id của feature (Plotly ghép ``locations`` với ``id``)
+    for feature in geojson['features']:
+        feature['id'] = feature.get('properties', {}).get(STATE_PROPERTY, feature.get('id'))
+    return geojson
+
+
+@st.cache_resource(max_entries=2, show_spinner=False)
+def _bundled_states(directory: str, signature: Optional[tuple]) -> Optional[dict]:
+    # ``signature`` (kích thước, thời điểm sửa của file) làm mới cache khi file thay đổi
+    if signature is None:
+        return None
+    return _read_geojson(os.path.join(directory, STATE_FILE))
+
+
+def _file_signature(directory: str) -> Optional[tuple]:
+    path = os.path.join(directory, STATE_FILE)
+    return (os.path.getsize(path), os.path.getmtime(path)) if os.path.exists(path) else None
+
+
+def state_geojson() -> dict:
+    """
+    Return the Brazil state boundaries bundled under GEO_PATH, loaded once per process.
+
+    The file holds hand-drawn approximations of the states at a single
+    level of detail (a few to a few dozen vertices each, with small gaps
+    between neighbours), small enough to send with every map. No network
+    access is needed.
+
+    Returns:
+        dict: FeatureCollection whose feature ``id`` is the state code (UF)
+
+    Raises:
+        FileNotFoundError: If GEO_PATH holds no state boundary file
+    """
+    bundled = _bundled_states(GEO_PATH, _file_signature(GEO_PATH))
+    if bundled is None:
+        raise FileNotFoundError(f"No state boundary file {STATE_FILE!r} in {GEO_PATH}")
+    return bundled
+
+
+def fit_zoom(width: int, height: int, bounds: Tuple[float, float, float, float] = BRAZIL_BOUNDS) -> float:
+    """Return the Web Mercator zoom at which ``bounds`` fit into a ``width`` x ``height`` pixel map."""
+    lat_min, lat_max, lng_min, lng_max = bounds
+
+    def mercator(lat):
+        return math.log(math.tan(math.pi / 4 + math.radians(lat) / 2))
+
+    zoom_x = math.log2(width * 360 / (256 * (lng_max - lng_min)))
+    zoom_y = math.log2(height * 2 * math.pi / (256 * (mercator(lat_max) - mercator(lat_min))))
+    return min(zoom_x, zoom_y)
+
@@ -0,0 +1,147 @@
+from typing import TYPE_CHECKING, Dict
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+if TYPE_CHECKING:
+    from modules.data_loader import Dataset
+
+# Các mức zoom (ô bản đồ kiểu Web Mercator) được tính sẵn
+MIN_ZOOM = 2
+MAX_ZOOM = 14
+# Số điểm tối đa gửi tới trình duyệt cho bản đồ mật độ
+HEATMAP_POINTS = 5000
+
+# Giới hạn vĩ độ của phép chiếu Web Mercator
+_MAX_LAT = 85.05112878
+
+
+def _spread_bits(v: np.ndarray) -> np.ndarray:
+    # Chèn một bit 0 giữa các bit của số 16 bit (dùng cho mã Morton)
+    v = v.astype(np.uint64) & 0xFFFF
+    v = (v | (v << 8)) & 0x00FF00FF
+    v = (v | (v << 4)) & 0x0F0F0F0F
+    v = (v | (v << 2)) & 0x33333333
+    v = (v | (v << 1)) & 0x55555555
+    return v
+
+
+def quadkeys(lat: np.ndarray, lng: np.ndarray, zoom: int = MAX_ZOOM) -> np.ndarray:
+    """
+    Return the Morton-coded quadtree key of the Web Mercator tile of each point.
+
+    The key of a tile at zoom ``z - 1`` is the key at zoom ``z`` shifted right
+    by two bits, so sorting once by the finest key groups every coarser tile
+    into a contiguous run.
+
+    Args:
+        lat (np.ndarray): Latitudes in degrees
+        lng (np.ndarray): Longitudes in degrees
+        zoom (int): Tile zoom level (<= 16)
+
+    Returns:
+        np.ndarray: uint64 quadtree keys
+    """
+    n = 1 << zoom
+    lat = np.clip(lat.astype('float64'), -_MAX_LAT, _MAX_LAT)
+    x = np.floor((lng.astype('float64') + 180.0) / 360.0 * n)
+    lat_rad = np.radians(lat)
+    y = np.floor((1.0 - np.log(np.tan(lat_rad) + 1.0 / np.cos(lat_rad)) / np.pi) / 2.0 * n)
+    x = np.clip(x, 0, n - 1).astype(np.uint64)
+    y = np.clip(y, 0, n - 1).astype(np.uint64)
+    return _spread_bits(x) | (_spread_bits(y) << np.uint64(1))
+
+
+def _run_sums(values: np.ndarray, starts: np.ndarray) -> np.ndarray:
+    # np.add.reduceat không chấp nhận mảng rỗng
+    return np.add.reduceat(values, starts) if len(starts) else values[:0]
+
+
+def point_tiles(lat: pd.Series, lng: pd.Series) -> pd.DataFrame:
+    """
+    Bin points into their MAX_ZOOM tiles.
+
+    Points with a missing coordinate are skipped. The result of several
+    chunks of points can be combined with combine_tiles().
+
+    Args:
+        lat (pd.Series): Latitudes in degrees
+        lng (pd.Series): Longitudes in degrees
+
+    Returns:
+        pd.DataFrame: Columns ['quadkey', 'lat_sum', 'lng_sum', 'count'], one row per non-empty tile
+    """
+    lat = lat.to_numpy(dtype='float64')
+    lng = lng.to_numpy(dtype='float64')
+    valid = ~(np.isnan(lat) | np.isnan(lng))
+    lat, lng = lat[valid], lng[valid]
+    tiles = pd.DataFrame({'quadkey': quadkeys(lat, lng), 'lat_sum': lat, 'lng_sum': lng, 'count': 1})
+    return combine_tiles([tiles])
+
+
+def combine_tiles(parts) -> pd.DataFrame:
+    """Merge tile sums (see point_tiles) of several chunks into one row per tile, sorted by key."""
+    tiles = pd.concat(parts, ignore_index=True)
+    return tiles.groupby('quadkey', sort=True).sum().reset_index()
+
+
+class TileIndex:
+    """
+    Multi-zoom quadtree aggregation of geographic points.
+
+    All points are binned once into Web Mercator tiles at zoom level MAX_ZOOM
+    (see point_tiles); coarser levels down to MIN_ZOOM are merged from those
+    tiles. Each tile keeps the exact number of points it contains and their
+    mean position, so a density map built from one level shows the true
+    distribution of every point with one marker per tile.
+    """
+
+    def __init__(self, tiles: pd.DataFrame):
+        tiles = tiles.sort_values('quadkey', kind='stable')
+        keys = tiles['quadkey'].to_numpy(dtype=np.uint64)
+        lat_sum = tiles['lat_sum'].to_numpy(dtype='float64')
+        lng_sum = tiles['lng_sum'].to_numpy(dtype='float64')
+        count = tiles['count'].to_numpy(dtype=np.int64)
+        self.total = int(count.sum())
+
+        self.levels: Dict[int, pd.DataFrame] = {}
+        for zoom in range(MAX_ZOOM, MIN_ZOOM - 1, -1):
+            level_keys = keys >> np.uint64(2 * (MAX_ZOOM - zoom))
+            # Điểm bắt đầu của mỗi ô (các ô con cùng ô cha nằm liền nhau sau khi sắp xếp)
+            starts = np.flatnonzero(np.diff(level_keys, prepend=~level_keys[:1]))
+            counts = _run_sums(count, starts)
+            self.levels[zoom] = pd.DataFrame({
+                'lat': (_run_sums(lat_sum, starts) / counts).astype('float32'),
+                'lng': (_run_sums(lng_sum, starts) / counts).astype('float32'),
+                'count': counts,
+            })
+
+    def zoom_for_budget(self, max_points: int = HEATMAP_POINTS) -> int:
+        """Return the finest zoom level with at most ``max_points`` non-empty tiles."""
+        for zoom in range(MAX_ZOOM, MIN_ZOOM - 1, -1):
+            if len(self.levels[zoom]) <= max_points:
+                return zoom
+        return MIN_ZOOM
+
+    def tiles(self, max_points: int = HEATMAP_POINTS) -> pd.DataFrame:
+        """
+        Return the aggregated tiles of the finest level fitting ``max_points``.
+
+        Args:
+            max_points (int): Maximum number of tiles (markers) to return
+
+        Returns:
+            pd.DataFrame: Columns ['lat', 'lng', 'count'], one row per non-empty tile
+        """
+        return self.levels[self.zoom_for_budget(max_points)]
+
+
+# Kiểu Dataset được nêu bằng tên đầy đủ: modules.data_loader dùng các hàm chia ô ở trên khi nạp dữ liệu
+@st.cache_resource(
+    max_entries=2, show_spinner=False,
+    hash_funcs={'modules.data_loader.Dataset': lambda d: d.version_of('olist_geolocation_dataset')}
+)
+def geolocation_tiles(data: 'Dataset') -> TileIndex:
+    """Return the TileIndex of all geolocation points, built once per data version."""
+    return TileIndex(data.geolocation_tiles)
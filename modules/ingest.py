@@ -0,0 +1,111 @@
+from typing import Iterable, List, Tuple
+
+import numpy as np
+import pandas as pd
+from modules.geo_tiles import combine_tiles, point_tiles
+from modules.snapshot import SnapshotStore
+
+# Tăng giá trị này khi thay đổi cấu trúc các bảng tổng hợp để tạo lại bản lưu trên đĩa
+INGEST_VERSION = 1
+# Số kết quả từng phần được giữ trước khi gộp (giới hạn bộ nhớ trong khi đọc)
+MERGE_EVERY = 8
+GEOLOCATION_FILE = 'olist_geolocation_dataset.csv'
+
+
+def _zip_partial(chunk: pd.DataFrame) -> pd.DataFrame:
+    # Tổng tọa độ, số dòng và thành phố / tiểu bang của dòng đầu tiên cho mỗi mã bưu chính trong khối
+    chunk = chunk.dropna(subset=['geolocation_zip_code_prefix', 'geolocation_lat', 'geolocation_lng'])
+    grouped = chunk.assign(
+        geolocation_lat=chunk['geolocation_lat'].astype('float64'),
+        geolocation_lng=chunk['geolocation_lng'].astype('float64'),
+        geolocation_city=chunk['geolocation_city'].astype(str),
+        geolocation_state=chunk['geolocation_state'].astype(str),
+    ).groupby('geolocation_zip_code_prefix', sort=False)
+    return pd.DataFrame({
+        'lat_sum': grouped['geolocation_lat'].sum(),
+        'lng_sum': grouped['geolocation_lng'].sum(),
+        'rows': grouped.size(),
+        'city': grouped['geolocation_city'].first(),
+        'state': grouped['geolocation_state'].first(),
+    })
+
+
+def _combine_zips(parts: List[pd.DataFrame]) -> pd.DataFrame:
+    # Các khối được nối theo thứ tự đọc nên first() giữ giá trị của dòng đầu tiên trong file
+    grouped = pd.concat(parts).groupby(level=0, sort=False)
+    return grouped.agg({'lat_sum': 'sum', 'lng_sum': 'sum', 'rows': 'sum', 'city': 'first', 'state': 'first'})
+
+
+def summarize_geolocation(chunks: Iterable[pd.DataFrame]) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Aggregate the geolocation table, chunk by chunk, into its two summaries.
+
+    Only the partial results are kept while reading (their size is bounded by
+    the number of distinct zip code prefixes and map tiles, not by the number
+    of rows), so the raw table never has to fit in memory.
+
+    Args:
+        chunks (Iterable[pd.DataFrame]): Typed chunks of the geolocation table
+
+    Returns:
+        Tuple[pd.DataFrame, pd.DataFrame]:
+            - One row per zip code prefix, sorted by prefix, with the columns of
+              the raw table (mean geolocation_lat / geolocation_lng, city and
+              state of the first row) plus geolocation_rows, the number of raw rows
+            - Point counts per MAX_ZOOM map tile (see modules.geo_tiles.point_tiles)
+    """
+    zip_parts: List[pd.DataFrame] = []
+    tile_parts: List[pd.DataFrame] = []
+    for chunk in chunks:
+        zip_parts.append(_zip_partial(chunk))
+        tile_parts.append(point_tiles(chunk['geolocation_lat'], chunk['geolocation_lng']))
+        if len(zip_parts) >= MERGE_EVERY:
+            zip_parts = [_combine_zips(zip_parts)]
+            tile_parts = [combine_tiles(tile_parts)]
+
+    if zip_parts:
+        zips = _combine_zips(zip_parts).sort_index()
+    else:
+        zips = pd.DataFrame(columns=['lat_sum', 'lng_sum', 'rows', 'city', 'state'])
+    rows = zips['rows'].to_numpy(dtype=np.int64)
+    zip_summary = pd.DataFrame({
+        'geolocation_zip_code_prefix': zips.index.to_numpy().astype(np.int32),
+        'geolocation_lat': zips['lat_sum'].to_numpy(dtype='float64') / rows,
+        'geolocation_lng': zips['lng_sum'].to_numpy(dtype='float64') / rows,
+        'geolocation_city': pd.Categorical(zips['city']),
+        'geolocation_state': pd.Categorical(zips['state']),
+        'geolocation_rows': rows,
+    })
+    if not tile_parts:
+        tile_parts = [point_tiles(pd.Series([], dtype='float64'), pd.Series([], dtype='float64'))]
+    return zip_summary, combine_tiles(tile_parts)
+
+
+def geolocation_summary(store: SnapshotStore, version: str) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Return the geolocation summaries (see summarize_geolocation) of a data version.
+
+    The summaries are computed in one streaming pass over the geolocation
+    snapshot and stored as derived tables, so later starts only read them.
+
+    Args:
+        store (SnapshotStore): Snapshot store of the data directory
+        version (str): Version (content token) of the geolocation source file
+
+    Returns:
+        Tuple[pd.DataFrame, pd.DataFrame]: Per-zip summary and per-tile point counts
+
+    Raises:
+        FileNotFoundError: If the geolocation CSV is missing
+    """
+    computed = {}
+
+    def compute(part: int) -> pd.DataFrame:
+        if not computed:
+            computed.update(enumerate(summarize_geolocation(store.iter_chunks(GEOLOCATION_FILE))))
+        return computed[part]
+
+    derived_version = f"{version}.{INGEST_VERSION}"
+    zips = store.read_derived('geolocation_zips', derived_version, lambda: compute(0))
+    tiles = store.read_derived('geolocation_tiles', derived_version, lambda: compute(1))
+    return zips, tiles
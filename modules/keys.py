@@ -0,0 +1,112 @@
+from typing import Dict, Iterable, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Mã của khóa bị thiếu (NaN trong file nguồn)
+MISSING_KEY = -1
+# Khóa -> các (bảng, cột) dùng chung một từ điển; cùng một ID luôn có cùng một mã trong mọi bảng
+KEY_COLUMNS = {
+    'order_id': (
+        ('facts', 'order_id'), ('item_facts', 'order_id'), ('payment_totals', 'order_id'),
+        ('review_totals', 'order_id'),
+    ),
+    'customer_id': (('facts', 'customer_id'),),
+    'customer_unique_id': (('facts', 'customer_unique_id'),),
+    'product_id': (('item_facts', 'product_id'), ('products', 'product_id')),
+    'seller_id': (('item_facts', 'seller_id'), ('sellers', 'seller_id')),
+}
+
+
+class KeyDictionary:
+    """
+    Dictionary of one ID key: dense int32 code <-> original 32-character hex ID.
+
+    Codes are positions in ``values`` (0 .. len - 1); MISSING_KEY stands for
+    a missing ID. The dictionary is shared by every table holding the key,
+    so joins and lookups compare int32 codes instead of hashing strings.
+    """
+
+    def __init__(self, name: str, values: pd.Index):
+        self.name = name
+        self.values = values
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def encode(self, ids: Iterable[str]) -> np.ndarray:
+        """Return the codes of ``ids`` (MISSING_KEY for IDs not in the dictionary)."""
+        return self.values.get_indexer(pd.Index(ids)).astype('int32')
+
+    def decode(self, codes) -> np.ndarray:
+        """Return the original IDs of ``codes`` (NaN for MISSING_KEY)."""
+        codes = np.asarray(codes, dtype='int64')
+        return self.values.take(codes, allow_fill=True, fill_value=None).to_numpy()
+
+
+def encode_keys(tables: Dict[str, pd.DataFrame]) -> Tuple[Dict[str, pd.DataFrame], Dict[str, KeyDictionary]]:
+    """
+    Replace every ID column listed in KEY_COLUMNS by dense int32 codes.
+
+    All columns of a key are factorized together in one pass, so each ID
+    string is hashed once and gets the same code in every table. Tables
+    or columns that are absent are skipped.
+
+    Args:
+        tables (Dict[str, pd.DataFrame]): Tables by Dataset table name
+
+    Returns:
+        Tuple[Dict[str, pd.DataFrame], Dict[str, KeyDictionary]]: The tables
+        with int32 ID columns and the dictionary of every encoded key
+
+    Raises:
+        OverflowError: If a key has more distinct IDs than int32 can hold
+    """
+    tables = dict(tables)
+    dictionaries = {}
+    for key, columns in KEY_COLUMNS.items():
+        present = [(table, column) for table, column in columns if column in getattr(tables.get(table), 'columns', ())]
+        if not present:
+            continue
+        parts = [tables[table][column] for table, column in present]
+        codes, uniques = pd.factorize(pd.concat(parts, ignore_index=True))
+        if len(uniques) > np.iinfo(np.int32).max:
+            raise OverflowError(f"Too many distinct values for an int32 {key} code: {len(uniques):,}")
+        codes = codes.astype('int32')
+        offsets = np.cumsum([0] + [len(part) for part in parts])
+        for (table, column), start, stop in zip(present, offsets[:-1], offsets[1:]):
+            tables[table] = tables[table].assign(**{column: codes[start:stop]})
+        dictionaries[key] = KeyDictionary(key, pd.Index(uniques))
+    return tables, dictionaries
+
+
+def key_positions(index_codes, lookup_codes, size: int) -> np.ndarray:
+    """
+    Return, for every code in ``lookup_codes``, its row in ``index_codes``.
+
+    Replaces pd.Index.get_indexer for dense codes: one scatter into an array
+    of ``size`` entries and one gather, with no hashing.
+
+    Args:
+        index_codes: Codes of the indexed rows (unique)
+        lookup_codes: Codes to look up
+        size (int): Number of codes of the key (len of its KeyDictionary)
+
+    Returns:
+        np.ndarray: Row positions (int64), -1 where the code is missing or not indexed
+    """
+    index_codes = np.asarray(index_codes, dtype='int64')
+    lookup_codes = np.asarray(lookup_codes, dtype='int64')
+    positions = np.full(size + 1, -1, dtype='int64')
+    # Mã MISSING_KEY (-1) rơi vào ô cuối cùng, luôn là -1
+    valid = index_codes >= 0
+    positions[index_codes[valid]] = np.flatnonzero(valid)
+    positions[-1] = -1
+    return positions[lookup_codes]
+
+
+def key_present(ids: pd.Series) -> pd.Series:
+    """Return a boolean Series that is False where the ID (string or code) is missing."""
+    if pd.api.types.is_integer_dtype(ids.dtype):
+        return ids >= 0
+    return ids.notna()
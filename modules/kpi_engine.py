@@ -0,0 +1,310 @@
+import threading
+from collections import OrderedDict
+from typing import Dict, List, NamedTuple, Optional
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+from modules.data_loader import Dataset
+from modules.filters import FilterState, filter_index
+from modules.keys import KeyDictionary
+from modules.profiler import profile
+
+# Các chỉ số đếm phân biệt: tên KPI -> (bảng, cột mã)
+DISTINCT_KPIS = {
+    'customers': ('facts', 'customer_unique_id'),
+    'products': ('item_facts', 'product_id'),
+    'sellers': ('item_facts', 'seller_id'),
+}
+
+
+class KPIValues(NamedTuple):
+    """Headline KPIs of a dataset or filter window."""
+    orders: int
+    revenue: float
+    customers: int
+    products: int
+    sellers: int
+
+    @property
+    def avg_order_value(self) -> float:
+        return self.revenue / self.orders if self.orders > 0 else 0
+
+
+class PartitionSets:
+    """
+    Exact sets of integer codes per partition, stored as one sorted CSR array.
+
+    ``codes[indptr[p]:indptr[p + 1]]`` are the distinct codes of partition
+    ``p``. The distinct count of any set of partitions is the number of
+    bits set after marking their codes in a bitmap of ``n_codes`` entries,
+    so it costs one pass over the codes of the selected partitions.
+    """
+
+    def __init__(self, partition: np.ndarray, codes: np.ndarray, n_partitions: int, n_codes: int):
+        self.n_partitions = n_partitions
+        self.n_codes = n_codes
+        valid = (partition >= 0) & (codes >= 0)
+        pairs = np.unique(partition[valid].astype('int64') * max(n_codes, 1) + codes[valid])
+        self._set_pairs(pairs // max(n_codes, 1), pairs % max(n_codes, 1))
+
+    def _set_pairs(self, partition: np.ndarray, codes: np.ndarray) -> None:
+        # ``partition`` đã được sắp xếp tăng dần
+        self.partition = partition.astype('int64')
+        self.codes = codes.astype('int32')
+        self.indptr = np.searchsorted(self.partition, np.arange(self.n_partitions + 1))
+
+    def spliced(
+        self,
+        fresh: 'PartitionSets',
+        partition_map: np.ndarray,
+        code_map: Optional[np.ndarray],
+        dropped: np.ndarray
+    ) -> 'PartitionSets':
+        """
+        Combine kept partitions of this set with the partitions of ``fresh``.
+
+        Args:
+            fresh (PartitionSets): Recomputed partitions (in the new layout)
+            partition_map (np.ndarray): New partition id of every old partition
+            code_map (Optional[np.ndarray]): New code of every old code (None = unchanged)
+            dropped (np.ndarray): Boolean mask of the new partitions replaced by ``fresh``
+
+        Returns:
+            PartitionSets: Set in the layout of ``fresh``
+        """
+        partition = partition_map[self.partition]
+        codes = self.codes if code_map is None else code_map[self.codes]
+        keep = ~dropped[partition] & (codes >= 0)
+        partition = np.concatenate([partition[keep], fresh.partition])
+        codes = np.concatenate([codes[keep], fresh.codes])
+        # Hai dãy đã sắp xếp: sắp xếp ổn định chỉ còn là một phép trộn
+        order = np.argsort(partition, kind='stable')
+        result = PartitionSets.__new__(PartitionSets)
+        result.n_partitions = fresh.n_partitions
+        result.n_codes = fresh.n_codes
+        result._set_pairs(partition[order], codes[order])
+        return result
+
+    def count(self, first: int, stop: int, selected: Optional[np.ndarray] = None) -> int:
+        """
+        Return the number of distinct codes in partitions ``first`` .. ``stop - 1``.
+
+        Args:
+            first (int): First partition
+            stop (int): Partition after the last one
+            selected (Optional[np.ndarray]): Boolean mask over all partitions; None selects all
+
+        Returns:
+            int: Exact distinct count
+        """
+        lo, hi = self.indptr[first], self.indptr[stop]
+        codes = self.codes[lo:hi]
+        if selected is not None:
+            codes = codes[selected[self.partition[lo:hi]]]
+        bitmap = np.zeros(self.n_codes, dtype=bool)
+        bitmap[codes] = True
+        return int(np.count_nonzero(bitmap))
+
+
+def _code_map(old: Optional[KeyDictionary], new: Optional[KeyDictionary]) -> Optional[np.ndarray]:
+    # Mã cũ -> mã mới; None nếu từ điển mới chỉ thêm giá trị vào cuối từ điển cũ (mã giữ nguyên)
+    if old is None or new is None or old is new:
+        return None
+    if len(new) >= len(old) and new.values[:len(old)].equals(old.values):
+        return None
+    return new.values.get_indexer(old.values)
+
+
+class KPIEngine:
+    """
+    Mergeable KPI partials per (purchase day, order status) partition.
+
+    Every partition stores its number of orders, their revenue and the exact
+    sets of customers, products and sellers (int32 key codes, see
+    modules.keys) of its orders. The KPIs of any date range and status
+    selection are assembled from the partitions: orders and revenue from
+    prefix sums over days, distinct counts by marking the codes of the
+    selected partitions in a bitmap. Appended orders only replace the
+    partitions of the days they touch (see updated()).
+
+    The KPIs have one definition with and without a filter: they count the
+    selected orders (the unfiltered view selects every order with a
+    purchase date), the payments of those orders, and the distinct
+    customers, products and sellers that appear in them. Products and
+    sellers that never sold are not counted.
+    """
+
+    def __init__(self, data: Dataset, days: Optional[pd.DatetimeIndex] = None, layout: Optional['KPIEngine'] = None):
+        facts = data.facts
+        if layout is not None:
+            self.start, self.n_days, self.statuses = layout.start, layout.n_days, layout.statuses
+        else:
+            dates = facts['date']
+            self.start = dates.min() if len(facts) else pd.Timestamp(0)
+            self.n_days = int((dates.max() - self.start) / pd.Timedelta(days=1)) + 1 if len(facts) else 0
+            # Trạng thái 0 dành cho giá trị thiếu
+            self.statuses: List[Optional[str]] = [None] + list(facts['order_status'].astype('category').cat.categories)
+        self.keys = data.keys or {}
+
+        # Phân vùng của từng đơn hàng: ngày * số trạng thái + trạng thái
+        partition = self._partitions(facts)
+        if days is not None:
+            # Chỉ tính lại các ngày thay đổi
+            partition = np.where(facts['date'].isin(days).to_numpy(), partition, -1)
+        n_partitions = self.n_days * len(self.statuses)
+        counted = partition >= 0
+        self.orders = np.bincount(partition[counted], minlength=n_partitions)
+        revenue = facts['payment_value'].to_numpy(dtype='float64', na_value=0.0)
+        self.revenue = np.bincount(partition[counted], weights=revenue[counted], minlength=n_partitions)
+
+        item_pos = filter_index(data).item_order_pos
+        item_partition = np.where(item_pos >= 0, partition[np.maximum(item_pos, 0)], -1) if len(partition) else item_pos
+        self.sets: Dict[str, PartitionSets] = {}
+        for kpi, (table, column) in DISTINCT_KPIS.items():
+            codes, n_codes = self._codes(data, table, column)
+            rows = partition if table == 'facts' else item_partition
+            self.sets[kpi] = PartitionSets(rows, codes, n_partitions, n_codes)
+        self._set_prefix()
+
+    def _partitions(self, facts: pd.DataFrame) -> np.ndarray:
+        day = ((facts['date'] - self.start) / pd.Timedelta(days=1)).to_numpy(dtype='float64')
+        status_codes = {label: code for code, label in enumerate(self.statuses)}
+        status = facts['order_status'].astype(object).map(status_codes).fillna(0).to_numpy(dtype='int64')
+        valid = ~np.isnan(day) & (day >= 0) & (day < self.n_days)
+        return np.where(valid, np.nan_to_num(day).astype('int64') * len(self.statuses) + status, -1)
+
+    def _codes(self, data: Dataset, table: str, column: str):
+        values = getattr(data, table)[column]
+        key = self.keys.get(column)
+        if key is not None:
+            return values.to_numpy(dtype='int64'), len(key)
+        # Bộ dữ liệu chưa mã hóa khóa: mã hóa cục bộ
+        codes, uniques = pd.factorize(values)
+        return codes.astype('int64'), len(uniques)
+
+    def _set_prefix(self) -> None:
+        # Tổng tích lũy theo ngày của ma trận (ngày, trạng thái)
+        shape = (self.n_days, len(self.statuses))
+        self.orders_prefix = np.zeros((self.n_days + 1, shape[1]), dtype='int64')
+        np.cumsum(self.orders.reshape(shape), axis=0, out=self.orders_prefix[1:])
+        self.revenue_prefix = np.zeros((self.n_days + 1, shape[1]), dtype='float64')
+        np.cumsum(self.revenue.reshape(shape), axis=0, out=self.revenue_prefix[1:])
+
+    def updated(self, data: Dataset, dates) -> 'KPIEngine':
+        """
+        Return the engine of ``data`` in which only the days ``dates`` are recomputed.
+
+        The other partitions are taken from this engine (their key codes are
+        translated if the key dictionaries were rebuilt in another order).
+
+        Args:
+            data (Dataset): Current (unfiltered) dataset
+            dates (array-like): Purchase days whose orders changed
+
+        Returns:
+            KPIEngine: Engine equal to KPIEngine(data) if every changed order lies on one of ``dates``
+        """
+        dates = pd.DatetimeIndex(dates).dropna().normalize().unique()
+        layout = KPIEngine.__new__(KPIEngine)
+        facts_dates = data.facts['date']
+        layout.start = min(self.start, facts_dates.min()) if len(facts_dates) else self.start
+        end = max(self.start + pd.Timedelta(days=self.n_days - 1), facts_dates.max())
+        layout.n_days = int((end - layout.start) / pd.Timedelta(days=1)) + 1
+        new_statuses = [label for label in data.facts['order_status'].astype('category').cat.categories]
+        layout.statuses = self.statuses + [label for label in new_statuses if label not in self.statuses]
+        engine = KPIEngine(data, days=dates, layout=layout)
+
+        # Phân vùng cũ -> phân vùng mới (ngày dịch theo ngày bắt đầu mới, trạng thái theo danh sách mới)
+        old_status, new_status = len(self.statuses), len(layout.statuses)
+        old_ids = np.arange(self.n_days * old_status)
+        shift = int((self.start - layout.start) / pd.Timedelta(days=1))
+        partition_map = (old_ids // old_status + shift) * new_status + old_ids % old_status
+        changed_days = ((dates - layout.start) / pd.Timedelta(days=1)).to_numpy().astype('int64')
+        changed_days = changed_days[(changed_days >= 0) & (changed_days < layout.n_days)]
+        dropped = np.zeros(layout.n_days * new_status, dtype=bool)
+        dropped.reshape(layout.n_days, new_status)[changed_days] = True
+
+        orders = np.zeros_like(engine.orders)
+        revenue = np.zeros_like(engine.revenue)
+        orders[partition_map] = self.orders
+        revenue[partition_map] = self.revenue
+        orders[dropped], revenue[dropped] = 0, 0
+        engine.orders = orders + engine.orders
+        engine.revenue = revenue + engine.revenue
+        for kpi, (_, column) in DISTINCT_KPIS.items():
+            code_map = _code_map(self.keys.get(column), engine.keys.get(column))
+            engine.sets[kpi] = self.sets[kpi].spliced(engine.sets[kpi], partition_map, code_map, dropped)
+        engine._set_prefix()
+        return engine
+
+    def _day_range(self, state: FilterState):
+        first = 0 if state.start_date is None else (pd.Timestamp(state.start_date) - self.start).days
+        last = self.n_days - 1 if state.end_date is None else (pd.Timestamp(state.end_date) - self.start).days
+        return max(first, 0), min(last, self.n_days - 1)
+
+    def kpis(self, state: Optional[FilterState] = None) -> KPIValues:
+        """
+        Return the KPIs of the orders matching ``state``.
+
+        Args:
+            state (Optional[FilterState]): Date range and statuses; None or an
+                empty state selects every order
+
+        Returns:
+            KPIValues: Orders, revenue and distinct customers, products and sellers
+        """
+        state = state or FilterState()
+        first, last = self._day_range(state)
+        if first > last:
+            return KPIValues(0, 0.0, 0, 0, 0)
+        status_mask = np.ones(len(self.statuses), dtype=bool)
+        if state.statuses is not None:
+            allowed = set(state.statuses)
+            status_mask = np.array([label in allowed for label in self.statuses])
+        n_status = len(self.statuses)
+        selected = None if status_mask.all() else np.tile(status_mask, self.n_days)
+        first_partition, stop_partition = first * n_status, (last + 1) * n_status
+        return KPIValues(
+            orders=int((self.orders_prefix[last + 1] - self.orders_prefix[first])[status_mask].sum()),
+            revenue=float((self.revenue_prefix[last + 1] - self.revenue_prefix[first])[status_mask].sum()),
+            **{kpi: sets.count(first_partition, stop_partition, selected) for kpi, sets in self.sets.items()}
+        )
+
+
+@st.cache_resource(show_spinner=False)
+def _latest_engines() -> 'OrderedDict[str, KPIEngine]':
+    # Engine được tạo gần nhất (theo phiên bản bảng fact), dùng làm điểm xuất phát khi cập nhật
+    return OrderedDict()
+
+
+_latest_lock = threading.Lock()
+
+
+@st.cache_resource(
+    max_entries=2, show_spinner=False,
+    hash_funcs={Dataset: lambda d: d.version_of('facts', 'products', 'sellers')}
+)
+def kpi_engine(data: Dataset) -> KPIEngine:
+    """
+    Return the KPIEngine of the unfiltered dataset, built once per data version.
+
+    If the fact table was updated with appended rows (``data.changes``) and
+    the engine of the previous version is still in memory, only the
+    partitions of the changed days are recomputed.
+    """
+    latest = _latest_engines()
+    with _latest_lock:
+        previous = latest.get(data.changes.previous_version) if data.changes is not None else None
+    with profile('kpi_engine:build'):
+        engine = previous.updated(data, data.changes.dates) if previous is not None else KPIEngine(data)
+    with _latest_lock:
+        latest.clear()
+        latest[data.version_of('facts')] = engine
+    return engine
+
+
+def kpi_values(data: Dataset) -> KPIValues:
+    """Return the KPIs of ``data``, assembled from the partitions of its unfiltered base dataset."""
+    engine = kpi_engine(data.base or data)
+    return engine.kpis(data.filters)
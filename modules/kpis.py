@@ -1,29 +1,17 @@
 from typing import Dict, Any
-import pandas as pd
 import streamlit as st
+from modules.kpi_engine import KPIValues
 
-def display_kpis(
-    orders: pd.DataFrame,
-    customers: pd.DataFrame,
-    products: pd.DataFrame,
-    sellers: pd.DataFrame,
-    order_payments: pd.DataFrame
-) -> None:
+def display_kpis(kpis: KPIValues) -> None:
     """
     Display key performance indicators for the e-commerce dashboard.
     
     Args:
-        orders (pd.DataFrame): Orders dataset
-        customers (pd.DataFrame): Customers dataset
-        products (pd.DataFrame): Products dataset
-        sellers (pd.DataFrame): Sellers dataset
-        order_payments (pd.DataFrame): Order payments dataset
+        kpis (KPIValues): KPIs of the (filtered) dataset, see modules.kpi_engine.kpi_values
     """
-    # Tính tổng doanh thu
-    total_revenue = order_payments['payment_value'].sum()
-    
-    # Tính giá trị đơn hàng trung bình
-    avg_order_value = total_revenue / len(orders) if len(orders) > 0 else 0
+    # Tổng doanh thu và giá trị đơn hàng trung bình
+    total_revenue = kpis.revenue
+    avg_order_value = kpis.avg_order_value
     
     # Header với gradient
     st.markdown("""
@@ -109,7 +97,7 @@ def display_kpis(
         st.markdown(f"""
             <div class='glass-container metric-card'>
                 <h3 style='color: #1f77b4; margin-bottom: 0.5rem;'>Tổng đơn hàng</h3>
-                <h2 style='font-size: 2rem; margin: 0;'>{len(orders):,}</h2>
+                <h2 style='font-size: 2rem; margin: 0;'>{kpis.orders:,}</h2>
                 <p style='color: #666; font-size: 0.9rem;'>Đơn hàng</p>
                 <div class='progress-bar'>
                     <div class='progress-bar-fill'></div>
@@ -133,7 +121,7 @@ def display_kpis(
         st.markdown(f"""
             <div class='glass-container metric-card'>
                 <h3 style='color: #e67e22; margin-bottom: 0.5rem;'>Khách hàng</h3>
-                <h2 style='font-size: 2rem; margin: 0;'>{customers['customer_unique_id'].nunique():,}</h2>
+                <h2 style='font-size: 2rem; margin: 0;'>{kpis.customers:,}</h2>
                 <p style='color: #666; font-size: 0.9rem;'>Số lượng khách hàng</p>
                 <div class='progress-bar'>
                     <div class='progress-bar-fill'></div>
@@ -148,7 +136,7 @@ def display_kpis(
         st.markdown(f"""
             <div class='glass-container metric-card'>
                 <h3 style='color: #9b59b6; margin-bottom: 0.5rem;'>Sản phẩm</h3>
-                <h2 style='font-size: 2rem; margin: 0;'>{products['product_id'].nunique():,}</h2>
+                <h2 style='font-size: 2rem; margin: 0;'>{kpis.products:,}</h2>
                 <p style='color: #666; font-size: 0.9rem;'>Số lượng sản phẩm</p>
                 <div class='progress-bar'>
                     <div class='progress-bar-fill'></div>
@@ -160,7 +148,7 @@ def display_kpis(
         st.markdown(f"""
             <div class='glass-container metric-card'>
                 <h3 style='color: #3498db; margin-bottom: 0.5rem;'>Người bán</h3>
-                <h2 style='font-size: 2rem; margin: 0;'>{sellers['seller_id'].nunique():,}</h2>
+                <h2 style='font-size: 2rem; margin: 0;'>{kpis.sellers:,}</h2>
                 <p style='color: #666; font-size: 0.9rem;'>Số lượng người bán</p>
                 <div class='progress-bar'>
                     <div class='progress-bar-fill'></div>
@@ -180,5 +168,12 @@ def display_kpis(
             </div>
         """, unsafe_allow_html=True)
     
+    # Cùng một định nghĩa cho dữ liệu đã lọc và chưa lọc (xem modules.kpi_engine.KPIEngine)
+    st.caption(
+        "Các chỉ số được tính trên các đơn hàng thuộc bộ lọc hiện tại: doanh thu là tổng thanh toán "
+        "của các đơn đó; khách hàng, sản phẩm và người bán là số lượng khác nhau xuất hiện trong các đơn "
+        "(không phải toàn bộ danh mục sản phẩm / người bán)."
+    )
+
     # Thêm khoảng cách sau KPIs
     st.markdown("<div style='margin-top: 2rem;'></div>", unsafe_allow_html=True)
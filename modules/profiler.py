@@ -0,0 +1,289 @@
+import functools
+import json
+import logging
+import os
+import threading
+import time
+import tracemalloc
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+import pandas as pd
+import plotly.graph_objects as go
+import streamlit as st
+
+logger = logging.getLogger(__name__)
+
+# Bật bảng hiệu năng bằng biến môi trường OLIST_PROFILE=1 hoặc tham số URL ?profile=1
+PROFILE_ENV = "OLIST_PROFILE"
+PROFILE_QUERY_PARAM = "profile"
+# Số lần chạy lại gần nhất được giữ trong session_state cho bảng hiệu năng
+PROFILE_HISTORY = 5
+
+# Số lần chạy đang đo bộ nhớ; tracemalloc được bật khi lần đầu tiên bắt đầu và tắt khi lần cuối kết thúc
+_traced_runs = 0
+_traced_lock = threading.Lock()
+_tracing_owned = False
+
+
+@dataclass
+class Span:
+    """Measurements of one profiled block."""
+    name: str
+    depth: int
+    start: float
+    wall: float = 0.0
+    cpu: float = 0.0
+    rows: Optional[int] = None
+    peak_bytes: Optional[int] = None
+    _cpu_start: float = field(default=0.0, repr=False)
+    _mem_start: int = field(default=0, repr=False)
+    _mem_peak: int = field(default=0, repr=False)
+
+    def to_dict(self) -> dict:
+        return {
+            'name': self.name,
+            'depth': self.depth,
+            'start_ms': round(self.start * 1000, 3),
+            'wall_ms': round(self.wall * 1000, 3),
+            'cpu_ms': round(self.cpu * 1000, 3),
+            'rows': self.rows,
+            'peak_kib': None if self.peak_bytes is None else round(self.peak_bytes / 1024, 1),
+        }
+
+
+class RunProfile:
+    """
+    Spans recorded during one script run (rerun) of a session.
+
+    Spans are nested: the depth of a span is the number of spans open when it
+    started, and its start is relative to the start of the run, which is all
+    a flame chart needs. CPU time is the time of the script thread only
+    (time.thread_time), so other sessions and the warm-up pool do not add to
+    it. Peak allocation is measured with tracemalloc only if tracing was
+    started (see start_run). tracemalloc counts the allocations of every
+    thread and has a single, process-wide peak, so the memory figures are
+    only meaningful while one profiled session runs at a time.
+    """
+
+    def __init__(self, name: str = 'run'):
+        self.name = name
+        self.origin = time.perf_counter()
+        self.spans: List[Span] = []
+        self.stack: List[Span] = []
+        # True nếu lần chạy này đã đăng ký đo bộ nhớ (xem start_run / finish_run)
+        self.traced = False
+
+    def _track_peak(self) -> None:
+        # tracemalloc chỉ có một đỉnh toàn cục: cập nhật mọi span đang mở rồi đặt lại
+        current, peak = tracemalloc.get_traced_memory()
+        for span in self.stack:
+            span._mem_peak = max(span._mem_peak, peak)
+        tracemalloc.reset_peak()
+
+    def open(self, name: str) -> Span:
+        span = Span(name=name, depth=len(self.stack), start=time.perf_counter() - self.origin)
+        if tracemalloc.is_tracing():
+            self._track_peak()
+            span._mem_start = span._mem_peak = tracemalloc.get_traced_memory()[0]
+        span._cpu_start = time.thread_time()
+        self.stack.append(span)
+        self.spans.append(span)
+        return span
+
+    def close(self, span: Span) -> None:
+        span.wall = time.perf_counter() - self.origin - span.start
+        span.cpu = time.thread_time() - span._cpu_start
+        if tracemalloc.is_tracing():
+            self._track_peak()
+            span.peak_bytes = span._mem_peak - span._mem_start
+        # Đóng cả các span con chưa được đóng (ví dụ khi có ngoại lệ)
+        while self.stack and self.stack.pop() is not span:
+            pass
+
+    def records(self) -> List[dict]:
+        return [span.to_dict() for span in self.spans]
+
+
+_local = threading.local()
+
+
+def current_run() -> Optional[RunProfile]:
+    """Return the RunProfile of the script run executing in this thread, if any."""
+    return getattr(_local, 'run', None)
+
+
+class profile:
+    """
+    Measure a block or a function as a span of the current run.
+
+    Records wall time, CPU time, the number of rows processed and the peak
+    traced allocation. Outside of a profiled run (start_run() not called in
+    this thread) it does nothing.
+
+    Usage:
+        with profile('filters') as span:
+            filtered = ...
+            span.rows = len(filtered)
+
+        @profile('aggregation:daily_orders')
+        def daily_orders(data): ...   # rows = len(result) if it has a length
+    """
+
+    def __init__(self, name: str, rows: Optional[int] = None):
+        self.name = name
+        self.rows = rows
+        self._spans: List[Span] = []
+
+    def __enter__(self) -> Optional[Span]:
+        run = current_run()
+        span = run.open(self.name) if run is not None else None
+        if span is not None:
+            span.rows = self.rows
+        self._spans.append(span)
+        return span
+
+    def __exit__(self, *exc_info) -> bool:
+        span = self._spans.pop()
+        run = current_run()
+        if span is not None and run is not None:
+            run.close(span)
+        return False
+
+    def __call__(self, func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            run = current_run()
+            if run is None:
+                return func(*args, **kwargs)
+            span = run.open(self.name)
+            try:
+                result = func(*args, **kwargs)
+                if hasattr(result, '__len__'):
+                    span.rows = len(result)
+                return result
+            finally:
+                run.close(span)
+        return wrapper
+
+
+def profiling_requested() -> bool:
+    """Return True if the developer panel was requested (environment variable or URL parameter)."""
+    if os.environ.get(PROFILE_ENV, '') not in ('', '0'):
+        return True
+    try:
+        return st.query_params.get(PROFILE_QUERY_PARAM, '0') not in ('', '0')
+    except Exception:
+        return False
+
+
+def _acquire_tracing() -> None:
+    global _traced_runs, _tracing_owned
+    with _traced_lock:
+        _traced_runs += 1
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _tracing_owned = True
+
+
+def _release_tracing() -> None:
+    # Tắt tracemalloc khi lần chạy đo bộ nhớ cuối cùng kết thúc (nếu chính module này đã bật nó)
+    global _traced_runs, _tracing_owned
+    with _traced_lock:
+        _traced_runs -= 1
+        if _traced_runs == 0 and _tracing_owned:
+            tracemalloc.stop()
+            _tracing_owned = False
+
+
+def start_run(trace_memory: bool = False) -> RunProfile:
+    """
+    Start recording spans for the current script run.
+
+    Args:
+        trace_memory (bool): Trace allocations with tracemalloc to measure
+            peak allocations. Tracing is process-wide and slows allocations
+            down, so it is only enabled for developer sessions, and only
+            while at least one of their runs is in progress: finish_run()
+            stops it again. Peaks are process-wide, so they are only valid
+            when a single profiled session runs at a time.
+
+    Returns:
+        RunProfile: The new run (also returned by current_run())
+    """
+    previous = current_run()
+    if previous is not None and previous.traced:
+        # Lần chạy trước bị dừng giữa chừng (ngoại lệ, st.stop) mà không gọi finish_run
+        _release_tracing()
+    run = RunProfile()
+    if trace_memory:
+        _acquire_tracing()
+        run.traced = True
+    _local.run = run
+    return run
+
+
+def finish_run() -> Optional[RunProfile]:
+    """
+    Stop recording, log the run as one structured record and keep it for the panel.
+
+    Returns:
+        Optional[RunProfile]: The finished run, or None if no run was started
+    """
+    run = current_run()
+    _local.run = None
+    if run is None:
+        return None
+    if run.traced:
+        _release_tracing()
+    total = time.perf_counter() - run.origin
+    record = {'event': 'rerun_profile', 'total_ms': round(total * 1000, 3), 'spans': run.records()}
+    logger.info(json.dumps(record, ensure_ascii=False), extra={'profile': record})
+
+    history = st.session_state.setdefault('_profile_history', [])
+    history.append(record)
+    del history[:-PROFILE_HISTORY]
+    return run
+
+
+def render_profiler_panel() -> None:
+    """Show the span breakdown (flame chart and table) of the last run in a sidebar expander."""
+    history = st.session_state.get('_profile_history', [])
+    with st.sidebar.expander("Hiệu năng (dev)", expanded=False):
+        if not history:
+            st.caption("Chưa có dữ liệu; chạy lại trang để ghi nhận.")
+            return
+        record = history[-1]
+        st.caption(f"Lần chạy gần nhất: {record['total_ms']:.0f} ms, {len(record['spans'])} khối được đo")
+        spans = pd.DataFrame(record['spans'])
+        if spans.empty:
+            return
+
+        # Biểu đồ kiểu flame: mỗi khối là một thanh bắt đầu tại thời điểm bắt đầu, mỗi tầng lồng nhau một hàng
+        fig = go.Figure(go.Bar(
+            base=spans['start_ms'],
+            x=spans['wall_ms'],
+            y=spans['depth'],
+            orientation='h',
+            text=spans['name'],
+            textposition='inside',
+            insidetextanchor='start',
+            hovertext=[
+                f"{row.name}<br>wall {row.wall_ms:.1f} ms, cpu {row.cpu_ms:.1f} ms"
+                f"<br>rows {row.rows}, peak {row.peak_kib} KiB"
+                for row in spans.itertuples()
+            ],
+            hoverinfo='text',
+            marker=dict(color=spans['depth'], colorscale='YlOrRd')
+        ))
+        fig.update_layout(
+            height=120 + 40 * (spans['depth'].max() + 1),
+            margin=dict(l=10, r=10, t=10, b=10),
+            xaxis_title='ms',
+            yaxis=dict(autorange='reversed', dtick=1, title='')
+        )
+        st.plotly_chart(fig, use_container_width=True)
+        st.dataframe(
+            spans.sort_values('wall_ms', ascending=False)[['name', 'wall_ms', 'cpu_ms', 'rows', 'peak_kib']],
+            hide_index=True
+        )
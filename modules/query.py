@@ -0,0 +1,271 @@
+import logging
+import os
+import threading
+from typing import Dict, NamedTuple, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+try:
+    import duckdb
+    DUCKDB_AVAILABLE = True
+except ImportError:
+    DUCKDB_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Bộ máy thực thi truy vấn: 'pandas' (mặc định) hoặc 'duckdb' (SQL dạng cột, đa luồng)
+QUERY_BACKEND = os.environ.get("OLIST_QUERY_BACKEND", "pandas").lower()
+BACKENDS = ('pandas', 'duckdb')
+# Các phép so sánh được phép trong điều kiện lọc
+_OPERATORS = {
+    '==': lambda column, value: column == value,
+    '!=': lambda column, value: column != value,
+    '>': lambda column, value: column > value,
+    '>=': lambda column, value: column >= value,
+    '<': lambda column, value: column < value,
+    '<=': lambda column, value: column <= value,
+}
+# Các hàm tổng hợp: 'count' đếm số dòng, 'share' là tỷ lệ phần trăm số dòng của nhóm
+_COUNTS = ('count', 'share')
+_FUNCTIONS = {'sum': 'sum', 'mean': 'avg', 'min': 'min', 'max': 'max', 'distinct': 'count'}
+
+
+class Join(NamedTuple):
+    """Left join of another Dataset table on a shared key column."""
+    table: str
+    on: str
+    # Các cột của bảng được nối cần cho truy vấn
+    columns: Tuple[str, ...]
+
+
+class Query(NamedTuple):
+    """
+    Backend-independent description of a grouped aggregation.
+
+    Rows of ``table`` (left-joined with ``joins``) matching every ``where``
+    condition are grouped by ``group_by``; rows with a missing group key are
+    dropped. Each measure is (output column, function, input column) with a
+    function from sum, mean, min, max, distinct (number of distinct values),
+    count or share (percent of rows).
+    Results are ordered by ``order_by`` ((column, descending) pairs) and then
+    by the group keys, so ties come out in the same order on every backend.
+    """
+    table: str
+    group_by: Tuple[str, ...]
+    measures: Tuple[Tuple[str, str, Optional[str]], ...]
+    joins: Tuple[Join, ...] = ()
+    where: Tuple[Tuple[str, str, object], ...] = ()
+    order_by: Tuple[Tuple[str, bool], ...] = ()
+    limit: Optional[int] = None
+
+    def tables(self) -> Tuple[str, ...]:
+        """Return the names of every Dataset table the query reads."""
+        return (self.table,) + tuple(join.table for join in self.joins)
+
+
+def _check(query: Query) -> None:
+    for _, function, column in query.measures:
+        if function not in _COUNTS and function not in _FUNCTIONS:
+            raise ValueError(f"Unknown aggregate function: {function}")
+        if function not in _COUNTS and column is None:
+            raise ValueError(f"Aggregate function {function} needs an input column")
+    for _, operator, _ in query.where:
+        if operator not in _OPERATORS:
+            raise ValueError(f"Unknown comparison operator: {operator}")
+
+
+def _source_dtypes(query: Query, tables: Dict[str, pd.DataFrame]) -> Dict[str, object]:
+    # Kiểu dữ liệu gốc của mọi cột mà truy vấn đọc (để chuẩn hóa kết quả của mọi backend)
+    dtypes = dict(tables[query.table].dtypes)
+    for join in query.joins:
+        dtypes.update({column: tables[join.table][column].dtype for column in join.columns})
+    return dtypes
+
+
+def _normalize(result: pd.DataFrame, query: Query, dtypes: Dict[str, object]) -> pd.DataFrame:
+    # Khóa dạng chuỗi/danh mục -> str, các khóa khác giữ kiểu gốc; đếm -> int64, đo lường -> float64
+    columns = {}
+    for key in query.group_by:
+        dtype = dtypes[key]
+        if isinstance(dtype, pd.CategoricalDtype) or pd.api.types.is_string_dtype(dtype):
+            columns[key] = result[key].astype(str)
+        else:
+            columns[key] = result[key].astype(dtype)
+    for name, function, _ in query.measures:
+        columns[name] = result[name].astype('int64' if function in ('count', 'distinct') else 'float64')
+    return pd.DataFrame(columns).reset_index(drop=True)
+
+
+def run_pandas(query: Query, tables: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+    """
+    Execute ``query`` with pandas over in-memory frames.
+
+    Args:
+        query (Query): Query to run
+        tables (Dict[str, pd.DataFrame]): Frames by Dataset table name
+
+    Returns:
+        pd.DataFrame: Group keys followed by the measures, in query order
+    """
+    _check(query)
+    frame = tables[query.table]
+    for join in query.joins:
+        right = tables[join.table][[join.on, *join.columns]]
+        frame = frame.merge(right, on=join.on, how='left')
+    if query.where:
+        mask = np.ones(len(frame), dtype=bool)
+        for column, operator, value in query.where:
+            mask &= _OPERATORS[operator](frame[column], value).fillna(False).to_numpy(dtype=bool)
+        frame = frame[mask]
+
+    keys = list(query.group_by)
+    frame = frame.dropna(subset=keys)
+    # Chuỗi và danh mục được so sánh như chuỗi (cùng thứ tự sắp xếp với SQL)
+    frame = frame.assign(**{
+        key: frame[key].astype(str) for key in keys
+        if isinstance(frame[key].dtype, pd.CategoricalDtype)
+    })
+    grouped = frame.groupby(keys, sort=False, observed=True)
+    sizes = grouped.size()
+    measures = {}
+    for name, function, column in query.measures:
+        if function == 'count':
+            measures[name] = sizes
+        elif function == 'share':
+            measures[name] = sizes * 100.0 / sizes.sum()
+        elif function == 'distinct':
+            measures[name] = frame[column].groupby([frame[key] for key in keys], sort=False).nunique()
+        else:
+            values = frame[column].astype('float64').groupby([frame[key] for key in keys], sort=False)
+            measures[name] = getattr(values, function)()
+    result = pd.DataFrame(measures, index=sizes.index).reset_index()
+
+    order = [column for column, _ in query.order_by] + [key for key in keys if key not in dict(query.order_by)]
+    ascending = [not descending for _, descending in query.order_by] + [True] * (len(order) - len(query.order_by))
+    result = result.sort_values(order, ascending=ascending, kind='stable', na_position='last')
+    if query.limit is not None:
+        result = result.head(query.limit)
+    return _normalize(result, query, _source_dtypes(query, tables))
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def to_sql(query: Query) -> Tuple[str, list]:
+    """
+    Translate ``query`` into a SQL statement over tables named like the Dataset tables.
+
+    Returns:
+        Tuple[str, list]: The statement and its positional parameters
+    """
+    _check(query)
+    select = [_quote(key) for key in query.group_by]
+    for name, function, column in query.measures:
+        if function == 'count':
+            expression = "count(*)"
+        elif function == 'share':
+            expression = "count(*) * 100.0 / sum(count(*)) OVER ()"
+        elif function == 'distinct':
+            expression = f"count(DISTINCT {_quote(column)})"
+        elif function == 'sum':
+            # Tổng của nhóm không có giá trị là 0 (như pandas)
+            expression = f"coalesce(sum(CAST({_quote(column)} AS DOUBLE)), 0)"
+        else:
+            expression = f"{_FUNCTIONS[function]}(CAST({_quote(column)} AS DOUBLE))"
+        select.append(f"{expression} AS {_quote(name)}")
+
+    sql = f"SELECT {', '.join(select)} FROM {_quote(query.table)}"
+    for join in query.joins:
+        sql += f" LEFT JOIN {_quote(join.table)} USING ({_quote(join.on)})"
+    conditions = [f"{_quote(key)} IS NOT NULL" for key in query.group_by]
+    parameters = []
+    for column, operator, value in query.where:
+        conditions.append(f"{_quote(column)} {'=' if operator == '==' else operator} ?")
+        parameters.append(value.item() if isinstance(value, np.generic) else value)
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    if query.group_by:
+        sql += " GROUP BY " + ", ".join(_quote(key) for key in query.group_by)
+
+    order = [f"{_quote(column)} {'DESC' if descending else 'ASC'} NULLS LAST" for column, descending in query.order_by]
+    order += [f"{_quote(key)} ASC" for key in query.group_by if key not in dict(query.order_by)]
+    if order:
+        sql += " ORDER BY " + ", ".join(order)
+    if query.limit is not None:
+        sql += f" LIMIT {int(query.limit)}"
+    return sql, parameters
+
+
+_local = threading.local()
+
+
+def _connection():
+    # Mỗi luồng (phiên Streamlit) dùng một kết nối DuckDB trong bộ nhớ riêng
+    connection = getattr(_local, 'connection', None)
+    if connection is None:
+        connection = _local.connection = duckdb.connect()
+    return connection
+
+
+def run_duckdb(query: Query, tables: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+    """
+    Execute ``query`` with the embedded DuckDB engine.
+
+    The frames are registered as views (scanned in place, without a copy)
+    and the query runs as one vectorized, multi-threaded SQL statement. The
+    frames are already in memory, so this does not reduce memory use.
+
+    Args:
+        query (Query): Query to run
+        tables (Dict[str, pd.DataFrame]): Frames by Dataset table name
+
+    Returns:
+        pd.DataFrame: Same result as run_pandas
+
+    Raises:
+        ImportError: If duckdb is not installed
+    """
+    if not DUCKDB_AVAILABLE:
+        raise ImportError("The duckdb query backend requires the duckdb package")
+    sql, parameters = to_sql(query)
+    connection = _connection()
+    names = query.tables()
+    try:
+        for name in names:
+            connection.register(name, tables[name])
+        result = connection.execute(sql, parameters).df()
+    finally:
+        for name in names:
+            connection.unregister(name)
+    return _normalize(result, query, _source_dtypes(query, tables))
+
+
+def query_backend() -> str:
+    """Return the configured backend, falling back to pandas if duckdb is not installed."""
+    if QUERY_BACKEND not in BACKENDS:
+        logger.warning(f"Unknown query backend {QUERY_BACKEND!r}; using pandas")
+        return 'pandas'
+    if QUERY_BACKEND == 'duckdb' and not DUCKDB_AVAILABLE:
+        logger.warning("duckdb is not installed; using the pandas query backend")
+        return 'pandas'
+    return QUERY_BACKEND
+
+
+def run_query(data, query: Query, backend: Optional[str] = None) -> pd.DataFrame:
+    """
+    Execute ``query`` against the tables of a Dataset.
+
+    Args:
+        data (Dataset): Dataset whose tables (possibly filtered) are queried
+        query (Query): Query to run
+        backend (Optional[str]): 'pandas' or 'duckdb' (default: query_backend())
+
+    Returns:
+        pd.DataFrame: Group keys followed by the measures
+    """
+    tables = {name: getattr(data, name) for name in query.tables()}
+    if (backend or query_backend()) == 'duckdb':
+        return run_duckdb(query, tables)
+    return run_pandas(query, tables)
@@ -0,0 +1,197 @@
+from typing import NamedTuple, Tuple
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+from modules.data_loader import Dataset
+from modules.frozen import freeze
+from modules.keys import key_present
+from modules.profiler import profile
+
+# Số cụm khách hàng (như notebook data/k_mean.ipynb)
+RFM_CLUSTERS = 4
+# Mini-batch k-means: số điểm mỗi lô, số vòng lặp tối đa và ngưỡng hội tụ (độ dịch chuyển tâm cụm)
+KMEANS_BATCH = 4096
+KMEANS_ITERATIONS = 200
+KMEANS_TOLERANCE = 1e-4
+KMEANS_SEED = 42
+# Số điểm tối đa dùng để khởi tạo tâm cụm bằng k-means++
+KMEANS_INIT_SAMPLE = 20_000
+# Loại bỏ ngoại lai ngoài [q05 - 1.5 * IQR, q95 + 1.5 * IQR] của recency và monetary
+OUTLIER_QUANTILES = (0.05, 0.95)
+# Ngày tham chiếu: 2 ngày sau đơn hàng cuối cùng
+PRESENT_DAY_OFFSET = np.timedelta64(2, 'D')
+FEATURES = ['recency', 'frequency', 'monetary']
+
+
+class RFMSegments(NamedTuple):
+    """Customer segments computed by rfm_segments()."""
+    # customer_unique_id, recency, frequency, monetary (log10 + chuẩn hóa) và Cluster
+    customers: pd.DataFrame
+    # Cluster, tâm cụm (recency, frequency, monetary) và số khách hàng của cụm
+    centers: pd.DataFrame
+
+
+def rfm_values(facts: pd.DataFrame) -> pd.DataFrame:
+    """
+    Compute recency, frequency and monetary value per customer_unique_id.
+
+    Recency is the number of whole days between the customer's last order
+    and two days after the last order of ``facts``; frequency is the number
+    of orders and monetary the sum of their payments. Customers are
+    factorized once and every measure is a single bincount/ufunc pass.
+
+    Args:
+        facts (pd.DataFrame): Order fact table (one row per order)
+
+    Returns:
+        pd.DataFrame: Columns ['customer_unique_id', 'recency', 'frequency', 'monetary']
+    """
+    timestamps = facts['order_purchase_timestamp'].to_numpy(dtype='datetime64[us]')
+    valid = key_present(facts['customer_unique_id']).to_numpy() & ~np.isnat(timestamps)
+    codes, customers = pd.factorize(facts['customer_unique_id'].to_numpy()[valid])
+    timestamps = timestamps[valid]
+    if len(customers) == 0:
+        return pd.DataFrame({
+            'customer_unique_id': facts['customer_unique_id'].iloc[:0].to_numpy(),
+            'recency': pd.Series(dtype='int64'),
+            'frequency': pd.Series(dtype='int64'),
+            'monetary': pd.Series(dtype='float64')
+        })
+
+    payments = np.nan_to_num(facts['payment_value'].to_numpy(dtype='float64')[valid])
+    last = np.full(len(customers), np.iinfo(np.int64).min)
+    np.maximum.at(last, codes, timestamps.view('int64'))
+    present_day = timestamps.max() + PRESENT_DAY_OFFSET
+    recency = (present_day - last.view('datetime64[us]')) // np.timedelta64(1, 'D')
+    return pd.DataFrame({
+        'customer_unique_id': customers,
+        'recency': recency.astype('int64'),
+        'frequency': np.bincount(codes, minlength=len(customers)),
+        'monetary': np.bincount(codes, weights=payments, minlength=len(customers)),
+    })
+
+
+def _outlier_mask(values: np.ndarray) -> np.ndarray:
+    low, high = np.quantile(values, OUTLIER_QUANTILES)
+    spread = high - low
+    return (values >= low - 1.5 * spread) & (values <= high + 1.5 * spread)
+
+
+def scale_rfm(rfm: pd.DataFrame) -> pd.DataFrame:
+    """
+    Drop outliers, log10-transform and standardize the RFM values (as in data/k_mean.ipynb).
+
+    Args:
+        rfm (pd.DataFrame): Output of rfm_values()
+
+    Returns:
+        pd.DataFrame: Columns ['customer_unique_id', 'recency', 'frequency', 'monetary']
+            with zero mean and unit variance (a constant column stays 0)
+    """
+    # Loại ngoại lai của recency rồi của monetary; log10 cần giá trị dương
+    rfm = rfm[rfm['monetary'].to_numpy() > 0]
+    for column in ('recency', 'monetary'):
+        if len(rfm):
+            rfm = rfm[_outlier_mask(rfm[column].to_numpy(dtype='float64'))]
+    values = np.log10(rfm[FEATURES].to_numpy(dtype='float64'))
+    mean = values.mean(axis=0) if len(values) else np.zeros(len(FEATURES))
+    std = values.std(axis=0) if len(values) else np.ones(len(FEATURES))
+    std[std == 0] = 1.0
+    scaled = pd.DataFrame((values - mean) / std, columns=FEATURES)
+    scaled.insert(0, 'customer_unique_id', rfm['customer_unique_id'].to_numpy())
+    return scaled
+
+
+def nearest_center(points: np.ndarray, centers: np.ndarray) -> np.ndarray:
+    """Return the index of the closest center (squared Euclidean distance) of every point."""
+    distances = (centers ** 2).sum(axis=1) - 2 * points @ centers.T
+    return distances.argmin(axis=1)
+
+
+def _kmeans_plus_plus(points: np.ndarray, k: int, rng: np.random.Generator) -> np.ndarray:
+    centers = [points[rng.integers(len(points))]]
+    distances = ((points - centers[0]) ** 2).sum(axis=1)
+    for _ in range(1, k):
+        total = distances.sum()
+        index = rng.choice(len(points), p=distances / total) if total > 0 else rng.integers(len(points))
+        centers.append(points[index])
+        distances = np.minimum(distances, ((points - points[index]) ** 2).sum(axis=1))
+    return np.array(centers, dtype='float64')
+
+
+def minibatch_kmeans(
+    points: np.ndarray,
+    k: int = RFM_CLUSTERS,
+    batch_size: int = KMEANS_BATCH,
+    iterations: int = KMEANS_ITERATIONS,
+    seed: int = KMEANS_SEED
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Cluster ``points`` with mini-batch k-means (Sculley, 2010).
+
+    Centers are seeded with k-means++ on a sample and then moved towards the
+    mean of random batches with a per-center learning rate of 1 / (points
+    assigned so far). The cost per iteration depends on ``batch_size`` only;
+    the final labels take one vectorized pass over all points. Clusters are
+    numbered by increasing monetary center, so labels are stable across runs.
+
+    Args:
+        points (np.ndarray): Array of shape (n, d)
+        k (int): Number of clusters (reduced to n if there are fewer points)
+        batch_size (int): Points drawn per iteration
+        iterations (int): Maximum number of iterations
+        seed (int): Seed of the random generator
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: Centers of shape (k, d) and the label of every point
+    """
+    k = min(k, len(points))
+    if k == 0:
+        return np.empty((0, points.shape[1])), np.empty(0, dtype='int64')
+    rng = np.random.default_rng(seed)
+    sample = points[rng.choice(len(points), min(len(points), KMEANS_INIT_SAMPLE), replace=False)]
+    centers = _kmeans_plus_plus(sample, k, rng)
+    counts = np.zeros(k)
+    for _ in range(iterations):
+        batch = points[rng.integers(0, len(points), min(batch_size, len(points)))]
+        labels = nearest_center(batch, centers)
+        batch_counts = np.bincount(labels, minlength=k)
+        sums = np.stack([np.bincount(labels, weights=batch[:, d], minlength=k) for d in range(batch.shape[1])], axis=1)
+        counts += batch_counts
+        moved = batch_counts > 0
+        step = (sums[moved] - batch_counts[moved, None] * centers[moved]) / counts[moved, None]
+        centers[moved] += step
+        if np.abs(step).max() < KMEANS_TOLERANCE:
+            break
+
+    centers = centers[np.argsort(centers[:, -1], kind='stable')]
+    return centers, nearest_center(points, centers)
+
+
+@st.cache_resource(max_entries=4, show_spinner=False, hash_funcs={Dataset: lambda d: d.version_of('facts')})
+def rfm_segments(data: Dataset, clusters: int = RFM_CLUSTERS) -> RFMSegments:
+    """
+    Return the RFM segments of the customers in ``data``, computed in the app.
+
+    Uses the (possibly filtered) fact table, so the segments follow the
+    sidebar filters; the result is shared by all sessions and cached per
+    fact table version and filter window.
+
+    Args:
+        data (Dataset): Dataset to segment
+        clusters (int): Number of k-means clusters
+
+    Returns:
+        RFMSegments: Scaled RFM values with cluster labels, and the cluster centers
+    """
+    with profile('rfm:values'):
+        scaled = scale_rfm(rfm_values(data.facts))
+    with profile('rfm:kmeans'):
+        centers, labels = minibatch_kmeans(scaled[FEATURES].to_numpy(), clusters)
+    customers = scaled.astype({feature: 'float32' for feature in FEATURES})
+    customers['Cluster'] = labels.astype('int8')
+    summary = pd.DataFrame(centers, columns=FEATURES)
+    summary.insert(0, 'Cluster', np.arange(len(centers), dtype='int8'))
+    summary['customers'] = np.bincount(labels, minlength=len(centers))
+    return RFMSegments(freeze(customers), freeze(summary))
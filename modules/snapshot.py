@@ -0,0 +1,766 @@
+import glob
+import hashlib
+import io
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PARQUET_AVAILABLE = True
+except ImportError:  # pragma: no cover - pyarrow đi kèm streamlit
+    PARQUET_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Thư mục chứa dữ liệu nguồn (CSV); có thể ghi đè bằng biến môi trường
+DATA_PATH = os.environ.get("OLIST_DATA_PATH", "data/")
+SNAPSHOT_DIRNAME = ".snapshots"
+MANIFEST_NAME = "manifest.json"
+# Số lần ghi nối tiếp được ghi nhớ cho mỗi file (để cập nhật bảng dẫn xuất theo phần mới)
+APPEND_HISTORY = 100
+# Số luồng đọc song song các file nguồn (OLIST_LOAD_WORKERS=1 để đọc tuần tự);
+# mặc định nhiều hơn số CPU vì phần lớn thời gian là chờ I/O
+LOAD_WORKERS = int(os.environ.get("OLIST_LOAD_WORKERS", "0")) or min(8, (os.cpu_count() or 1) + 4)
+# Số dòng mỗi khối khi đọc CSV / snapshot theo luồng (giới hạn bộ nhớ khi nạp file lớn)
+CHUNK_ROWS = 500_000
+
+# Tăng giá trị này khi thay đổi SCHEMAS để buộc tạo lại toàn bộ snapshot
+SCHEMA_VERSION = 1
+
+# Kiểu dữ liệu cho từng file nguồn. Các cột tiền tệ (price, freight_value,
+# payment_value) giữ float64 vì được cộng dồn thành doanh thu.
+SCHEMAS: Dict[str, Dict[str, List[str]]] = {
+    'olist_orders_dataset.csv': {
+        'category': ['order_status'],
+        'datetime': [
+            'order_purchase_timestamp', 'order_approved_at',
+            'order_delivered_carrier_date', 'order_delivered_customer_date',
+            'order_estimated_delivery_date'
+        ],
+    },
+    'olist_order_items_dataset.csv': {
+        'int16': ['order_item_id'],
+        'datetime': ['shipping_limit_date'],
+    },
+    'olist_products_dataset.csv': {
+        'float32': [
+            'product_name_lenght', 'product_description_lenght', 'product_photos_qty',
+            'product_weight_g', 'product_length_cm', 'product_height_cm', 'product_width_cm'
+        ],
+    },
+    'olist_customers_dataset.csv': {
+        'int32': ['customer_zip_code_prefix'],
+        'category': ['customer_city', 'customer_state'],
+    },
+    'olist_order_payments_dataset.csv': {
+        'int16': ['payment_sequential', 'payment_installments'],
+        'category': ['payment_type'],
+    },
+    'olist_order_reviews_dataset.csv': {
+        'int8': ['review_score'],
+        'datetime': ['review_creation_date', 'review_answer_timestamp'],
+    },
+    'olist_sellers_dataset.csv': {
+        'int32': ['seller_zip_code_prefix'],
+        'category': ['seller_city', 'seller_state'],
+    },
+    'product_category_name_translation.csv': {},
+    'olist_geolocation_dataset.csv': {
+        'int32': ['geolocation_zip_code_prefix'],
+        'float32': ['geolocation_lat', 'geolocation_lng'],
+        'category': ['geolocation_city', 'geolocation_state'],
+    },
+}
+
+
+def source_fingerprint(path: str) -> Dict[str, int]:
+    """Return the cheap (mtime, size) fingerprint of a source file."""
+    stat = os.stat(path)
+    return {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size}
+
+
+def file_hash(path: str, chunk_size: int = 1 << 20, limit: Optional[int] = None) -> str:
+    """Return the SHA-1 content hash of a file (or of its first ``limit`` bytes), read in 1 MiB chunks."""
+    digest = hashlib.sha1()
+    remaining = limit
+    with open(path, 'rb') as f:
+        while remaining is None or remaining > 0:
+            chunk = f.read(chunk_size if remaining is None else min(chunk_size, remaining))
+            if not chunk:
+                break
+            digest.update(chunk)
+            if remaining is not None:
+                remaining -= len(chunk)
+    return digest.hexdigest()
+
+
+def tokens_version(tokens: Dict[str, str]) -> str:
+    """Return a short version string combining the content tokens of several files."""
+    digest = hashlib.sha1(str(SCHEMA_VERSION).encode())
+    for name in sorted(tokens):
+        digest.update(f"{name}:{tokens[name]};".encode())
+    return digest.hexdigest()[:12]
+
+
+def apply_schema(df: pd.DataFrame, name: str) -> pd.DataFrame:
+    """
+    Convert the columns of a freshly parsed CSV to the dtypes declared in SCHEMAS.
+
+    Columns that are missing from the frame are skipped, so partial exports
+    still load.
+
+    Args:
+        df (pd.DataFrame): Frame parsed from the source CSV
+        name (str): File name of the source CSV (key of SCHEMAS)
+
+    Returns:
+        pd.DataFrame: The same frame with converted columns
+    """
+    schema = SCHEMAS.get(name, {})
+    for kind, columns in schema.items():
+        for col in columns:
+            if col not in df.columns:
+                continue
+            if kind == 'datetime':
+                df[col] = pd.to_datetime(df[col], errors='coerce')
+            elif kind == 'category':
+                df[col] = df[col].astype('category')
+            elif kind.startswith('int') and df[col].isna().any():
+                # Cột số nguyên có giá trị thiếu: giữ dạng float để không mất NaN
+                df[col] = df[col].astype('float32')
+            else:
+                df[col] = df[col].astype(kind)
+    return df
+
+
+def _csv_dtypes(name: str) -> Dict[str, str]:
+    # Để parser tạo trực tiếp cột category thay vì chuyển đổi sau khi đọc
+    return {col: 'category' for col in SCHEMAS.get(name, {}).get('category', [])}
+
+
+def read_source_csv(path: str, name: str) -> pd.DataFrame:
+    """Parse a source CSV and apply its schema."""
+    df = pd.read_csv(path, dtype=_csv_dtypes(name) or None)
+    return apply_schema(df, name)
+
+
+def iter_source_csv(path: str, name: str, chunk_rows: int = CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    """
+    Parse a source CSV in chunks of ``chunk_rows`` rows, applying its schema to each chunk.
+
+    Only one chunk of raw (untyped) values is in memory at a time, so files
+    larger than memory can be converted or aggregated.
+    """
+    with pd.read_csv(path, dtype=_csv_dtypes(name) or None, chunksize=chunk_rows) as reader:
+        for chunk in reader:
+            yield apply_schema(chunk, name)
+
+
+def _arrow_table(df: pd.DataFrame, schema=None):
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    if schema is not None:
+        return table.cast(schema)
+    # Mỗi khối có danh mục riêng: dùng chỉ số int32 để mọi khối có cùng kiểu cột
+    fields = [
+        pa.field(f.name, pa.dictionary(pa.int32(), f.type.value_type)) if pa.types.is_dictionary(f.type) else f
+        for f in table.schema
+    ]
+    return table.cast(pa.schema(fields, metadata=table.schema.metadata))
+
+
+# Khóa dùng chung cho cả tiến trình, theo (thư mục snapshot, tên): mọi SnapshotStore của cùng
+# thư mục (mỗi lần gọi get_dataset/dataset_version và luồng làm nóng tạo một đối tượng riêng)
+# dùng cùng một khóa cho mỗi file, mỗi nhóm bảng dẫn xuất và cho manifest
+_SHARED_LOCKS: Dict[tuple, threading.RLock] = {}
+_SHARED_LOCKS_GUARD = threading.Lock()
+
+
+def _shared_lock(directory: str, name: str) -> threading.RLock:
+    with _SHARED_LOCKS_GUARD:
+        return _SHARED_LOCKS.setdefault((os.path.realpath(directory), name), threading.RLock())
+
+
+def _temp_path(path: str) -> str:
+    # File tạm có tên riêng trong cùng thư mục với ``path`` (để os.replace là thao tác nguyên tử)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=os.path.basename(path) + '.', suffix='.tmp')
+    os.close(fd)
+    return tmp_path
+
+
+def _remove_quietly(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def write_parquet_chunks(chunks: Iterable[pd.DataFrame], path: str) -> int:
+    """
+    Write typed chunks of one table into a single Parquet file, one row group per chunk.
+
+    Args:
+        chunks (Iterable[pd.DataFrame]): Chunks with the same columns and dtypes
+        path (str): Output file
+
+    Returns:
+        int: Number of rows written
+
+    Raises:
+        pa.ArrowInvalid: If a chunk cannot be converted to the schema of the
+            first chunk (e.g. an integer column with missing values)
+    """
+    writer = None
+    rows = 0
+    try:
+        for chunk in chunks:
+            table = _arrow_table(chunk, writer.schema if writer is not None else None)
+            if writer is None:
+                writer = pq.ParquetWriter(path, table.schema)
+            writer.write_table(table)
+            rows += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
+
+
+class SnapshotStore:
+    """
+    Typed columnar (Parquet) copies of the CSV files in the data directory.
+
+    Each CSV is converted once into ``<data_path>/.snapshots/<name>.parquet``.
+    A manifest records the source mtime, size, SHA-1 hash and row count; a
+    snapshot is rebuilt when the source content changes. If only the mtime
+    changed (e.g. the file was re-copied) the hash is compared and the
+    snapshot is kept. If rows were appended to the source (its old content is
+    an unchanged prefix of the file), only the new bytes are parsed and added
+    to the snapshot, and the earlier states are remembered so that derived
+    tables can be updated with the new rows only (see read_derived).
+
+    Several stores may work on the same directory at once (one per
+    get_dataset() call, plus the warm-up thread). Each file is refreshed under
+    a lock shared by the whole process, every write goes through its own
+    temporary file, and the manifest is re-read and merged under a shared
+    lock before it is saved, so concurrent writers neither clash nor drop
+    each other's entries.
+    """
+
+    def __init__(self, data_path: str = DATA_PATH):
+        self.data_path = data_path
+        self.snapshot_dir = os.path.join(data_path, SNAPSHOT_DIRNAME)
+        self.manifest_path = os.path.join(self.snapshot_dir, MANIFEST_NAME)
+        self._manifest, self._derived = self._load_manifest()
+        self._lock = threading.RLock()
+        # Khóa của manifest, dùng chung với mọi SnapshotStore của cùng thư mục
+        self._manifest_lock = _shared_lock(self.snapshot_dir, MANIFEST_NAME)
+        # Thời gian đọc của từng file (mili giây) trong lần nạp gần nhất
+        self.timings: Dict[str, Dict] = {}
+
+    def _load_manifest(self):
+        try:
+            with open(self.manifest_path, encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return {}, {}
+        if manifest.get('schema_version') != SCHEMA_VERSION:
+            return {}, {}
+        return manifest.get('files', {}), manifest.get('derived', {})
+
+    def _reload_manifest(self) -> None:
+        # Cập nhật bản trong bộ nhớ với các mục mà SnapshotStore khác đã ghi
+        with self._manifest_lock:
+            files, derived = self._load_manifest()
+            self._manifest.update(files)
+            self._derived.update(derived)
+
+    def _save_manifest(self, files: Iterable[str] = (), derived: Iterable[str] = ()) -> None:
+        # Đọc lại manifest trên đĩa và chỉ thay các mục ``files`` / ``derived`` của đối tượng này,
+        # để không ghi đè các mục mà SnapshotStore khác vừa ghi
+        with self._manifest_lock:
+            on_disk, on_disk_derived = self._load_manifest()
+            on_disk.update({name: self._manifest[name] for name in files})
+            on_disk_derived.update({name: self._derived[name] for name in derived})
+            self._manifest.update(on_disk)
+            self._derived.update(on_disk_derived)
+            os.makedirs(self.snapshot_dir, exist_ok=True)
+            tmp_path = _temp_path(self.manifest_path)
+            try:
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump({'schema_version': SCHEMA_VERSION, 'files': on_disk, 'derived': on_disk_derived}, f, indent=2)
+                os.replace(tmp_path, self.manifest_path)
+            except OSError:
+                _remove_quietly(tmp_path)
+                raise
+
+    def _set_entry(self, name: str, entry: Dict) -> None:
+        # Ghi mục manifest của một file (an toàn khi nhiều luồng cùng cập nhật)
+        with self._manifest_lock:
+            self._manifest[name] = entry
+            self._save_manifest(files=[name])
+
+    def source_path(self, name: str) -> str:
+        return os.path.join(self.data_path, name)
+
+    def snapshot_path(self, name: str) -> str:
+        return os.path.join(self.snapshot_dir, os.path.splitext(name)[0] + '.parquet')
+
+    def is_fresh(self, name: str) -> bool:
+        """Return True if the snapshot of ``name`` matches its source CSV."""
+        entry = self._manifest.get(name)
+        if entry is None or not os.path.exists(self.snapshot_path(name)):
+            return False
+        current = source_fingerprint(self.source_path(name))
+        if current['size'] != entry['size']:
+            return False
+        if current['mtime_ns'] == entry['mtime_ns']:
+            return True
+        # mtime thay đổi: so sánh hash để tránh tạo lại snapshot khi nội dung giữ nguyên
+        if file_hash(self.source_path(name)) != entry['sha1']:
+            return False
+        with self._manifest_lock:
+            entry['mtime_ns'] = current['mtime_ns']
+            self._try_save_manifest(name)
+        return True
+
+    def _try_save_manifest(self, name: str) -> None:
+        try:
+            self._save_manifest(files=[name])
+        except OSError as e:
+            logger.warning(f"Could not update snapshot manifest: {e}")
+
+    def _write_snapshot(self, name: str) -> bool:
+        # Chuyển CSV sang Parquet theo từng khối; trả về False nếu không ghi được (hoặc không có pyarrow)
+        if not PARQUET_AVAILABLE:
+            return False
+        path = self.source_path(name)
+        fingerprint = source_fingerprint(path)
+        tmp_path = None
+        try:
+            os.makedirs(self.snapshot_dir, exist_ok=True)
+            tmp_path = _temp_path(self.snapshot_path(name))
+            try:
+                rows = write_parquet_chunks(iter_source_csv(path, name), tmp_path)
+            except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+                # Kiểu cột khác nhau giữa các khối (ví dụ giá trị thiếu trong cột số nguyên): đọc cả file
+                df = read_source_csv(path, name)
+                df.to_parquet(tmp_path, index=False)
+                rows = len(df)
+            os.replace(tmp_path, self.snapshot_path(name))
+            self._set_entry(name, dict(fingerprint, sha1=file_hash(path), rows=rows, appends=[]))
+            logger.info(f"Snapshot built for {name} ({rows:,} rows)")
+            return True
+        except OSError as e:
+            logger.warning(f"Could not write snapshot for {name}: {e}")
+            if tmp_path is not None:
+                _remove_quietly(tmp_path)
+            return False
+
+    def _append_snapshot(self, name: str) -> bool:
+        # Chỉ phân tích phần được ghi thêm vào cuối file nguồn; trả về False nếu file không chỉ được ghi nối
+        entry = self._manifest.get(name)
+        snapshot_path = self.snapshot_path(name)
+        if entry is None or 'rows' not in entry or not os.path.exists(snapshot_path):
+            return False
+        path = self.source_path(name)
+        current = source_fingerprint(path)
+        if current['size'] <= entry['size'] or file_hash(path, limit=entry['size']) != entry['sha1']:
+            return False
+        with open(path, 'rb') as f:
+            header = f.readline()
+            f.seek(entry['size'] - 1)
+            if f.read(1) != b'\n':
+                return False
+            tail = f.read(current['size'] - entry['size'])
+
+        tmp_path = None
+        try:
+            tmp_path = _temp_path(snapshot_path)
+            delta = apply_schema(pd.read_csv(io.BytesIO(header + tail), dtype=_csv_dtypes(name) or None), name)
+            snapshot = pq.ParquetFile(snapshot_path)
+            schema = snapshot.schema_arrow
+            # Giữ nguyên các row group cũ và thêm phần mới thành một row group
+            with pq.ParquetWriter(tmp_path, schema) as writer:
+                for i in range(snapshot.num_row_groups):
+                    writer.write_table(snapshot.read_row_group(i))
+                writer.write_table(pa.Table.from_pandas(delta, preserve_index=False).cast(schema))
+            os.replace(tmp_path, snapshot_path)
+            previous = {key: entry[key] for key in ('sha1', 'size', 'rows')}
+            self._set_entry(name, dict(
+                current, sha1=file_hash(path), rows=entry['rows'] + len(delta),
+                appends=(entry.get('appends', []) + [previous])[-APPEND_HISTORY:]
+            ))
+            logger.info(f"Snapshot of {name} extended with {len(delta):,} appended rows")
+            return True
+        except (OSError, ValueError, pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError) as e:
+            # Phần mới không khớp với lược đồ cũ: tạo lại toàn bộ snapshot
+            logger.info(f"Could not append to the snapshot of {name} ({e}); rebuilding it")
+            if tmp_path is not None:
+                _remove_quietly(tmp_path)
+            return False
+
+    def refresh(self, name: str) -> bool:
+        """
+        Bring the snapshot of ``name`` up to date with its source CSV.
+
+        Appended rows are added to the existing snapshot; any other change
+        rebuilds it. Only one thread of the process refreshes a given file at
+        a time; the others wait and then find the snapshot it wrote.
+
+        Returns:
+            bool: True if an up-to-date snapshot exists afterwards
+
+        Raises:
+            FileNotFoundError: If the source CSV does not exist
+        """
+        if self.is_fresh(name):
+            return True
+        if not PARQUET_AVAILABLE:
+            return False
+        with _shared_lock(self.snapshot_dir, name):
+            # Một luồng khác có thể vừa cập nhật snapshot trong lúc chờ khóa
+            self._reload_manifest()
+            if self.is_fresh(name):
+                return True
+            return self._append_snapshot(name) or self._write_snapshot(name)
+
+    def build(self, name: str) -> pd.DataFrame:
+        """Convert the source CSV of ``name`` into its snapshot (chunk by chunk) and return the table."""
+        with _shared_lock(self.snapshot_dir, name):
+            written = self._write_snapshot(name)
+        if written:
+            return pd.read_parquet(self.snapshot_path(name))
+        # Không có pyarrow hoặc thư mục dữ liệu chỉ đọc: đọc trực tiếp từ CSV
+        return read_source_csv(self.source_path(name), name)
+
+    def read(self, name: str) -> pd.DataFrame:
+        """
+        Read a typed table through the snapshot store.
+
+        Args:
+            name (str): File name of the source CSV, e.g. 'olist_orders_dataset.csv'
+
+        Returns:
+            pd.DataFrame: Table with the dtypes declared in SCHEMAS
+
+        Raises:
+            FileNotFoundError: If the source CSV does not exist
+        """
+        if not os.path.exists(self.source_path(name)):
+            raise FileNotFoundError(f"No such file: '{self.source_path(name)}'")
+        start = time.perf_counter()
+        if self.refresh(name):
+            df = pd.read_parquet(self.snapshot_path(name))
+        else:
+            # Không có pyarrow hoặc thư mục dữ liệu chỉ đọc: đọc trực tiếp từ CSV
+            df = read_source_csv(self.source_path(name), name)
+        self._record(name, read_ms=(time.perf_counter() - start) * 1000, rows=len(df))
+        return df
+
+    def _record(self, name: str, **values) -> None:
+        with self._lock:
+            timing = self.timings.setdefault(name, {})
+            for key, value in values.items():
+                timing[key] = round(value, 3) if isinstance(value, float) else value
+
+    def _refresh_timed(self, name: str) -> bool:
+        # Cập nhật snapshot của một file và ghi lại thời gian
+        start = time.perf_counter()
+        fresh = self.refresh(name)
+        self._record(name, refresh_ms=(time.perf_counter() - start) * 1000)
+        return fresh
+
+    def refresh_many(self, names: Iterable[str], workers: int = LOAD_WORKERS) -> Dict[str, bool]:
+        """
+        Bring several snapshots up to date concurrently.
+
+        Stale files are converted in a pool of ``workers`` threads (the CSV
+        parser and Parquet I/O release the GIL for most of the work). No
+        worker processes are started, so this is safe inside the Streamlit
+        server. The refresh time of each file is recorded in ``timings``.
+
+        Args:
+            names (Iterable[str]): File names of the source CSVs
+            workers (int): Maximum number of concurrent conversions (1 = serial)
+
+        Returns:
+            Dict[str, bool]: Per file, True if an up-to-date snapshot exists
+
+        Raises:
+            FileNotFoundError: If a source CSV does not exist
+        """
+        names = list(names)
+        stale = [name for name in names if not self.is_fresh(name)]
+        if not stale or not PARQUET_AVAILABLE or workers <= 1:
+            return {name: self.refresh(name) for name in names}
+        with ThreadPoolExecutor(max_workers=min(workers, len(stale))) as threads:
+            futures = {name: threads.submit(self._refresh_timed, name) for name in stale}
+            fresh = {name: future.result() for name, future in futures.items()}
+        return {name: fresh[name] if name in fresh else True for name in names}
+
+    def read_many(self, names: Iterable[str], workers: int = LOAD_WORKERS) -> Dict[str, pd.DataFrame]:
+        """
+        Read several typed tables concurrently (see refresh_many and read).
+
+        Args:
+            names (Iterable[str]): File names of the source CSVs
+            workers (int): Number of reader threads (1 = serial)
+
+        Returns:
+            Dict[str, pd.DataFrame]: Tables by file name, in the order of ``names``
+
+        Raises:
+            FileNotFoundError: If a source CSV does not exist
+        """
+        names = list(names)
+        for name in names:
+            if not os.path.exists(self.source_path(name)):
+                raise FileNotFoundError(f"No such file: '{self.source_path(name)}'")
+        self.refresh_many(names, workers)
+        if workers <= 1:
+            return {name: self.read(name) for name in names}
+        with ThreadPoolExecutor(max_workers=min(workers, len(names))) as threads:
+            futures = {name: threads.submit(self.read, name) for name in names}
+            return {name: future.result() for name, future in futures.items()}
+
+    def iter_chunks(
+        self, name: str, chunk_rows: int = CHUNK_ROWS, start: int = 0, columns: Optional[List[str]] = None
+    ) -> Iterator[pd.DataFrame]:
+        """
+        Read a typed table chunk by chunk, without loading it fully.
+
+        The snapshot is brought up to date first if needed; chunks are then
+        read from its row groups. Without pyarrow, or if the snapshot cannot
+        be written, the source CSV is parsed in chunks instead.
+
+        Args:
+            name (str): File name of the source CSV
+            chunk_rows (int): Maximum number of rows per chunk
+            start (int): First row to read (e.g. a row returned by appended_since())
+            columns (Optional[List[str]]): Columns to read; columns missing
+                from the file are skipped. None reads every column.
+
+        Returns:
+            Iterator[pd.DataFrame]: Chunks with the dtypes declared in SCHEMAS
+
+        Raises:
+            FileNotFoundError: If the source CSV does not exist
+        """
+        if not os.path.exists(self.source_path(name)):
+            raise FileNotFoundError(f"No such file: '{self.source_path(name)}'")
+        if not self.refresh(name):
+            offset = 0
+            for chunk in iter_source_csv(self.source_path(name), name, chunk_rows):
+                rows = len(chunk)
+                if offset + rows > start:
+                    chunk = chunk.iloc[max(start - offset, 0):]
+                    yield chunk if columns is None else chunk[[col for col in columns if col in chunk.columns]]
+                offset += rows
+            return
+        snapshot = pq.ParquetFile(self.snapshot_path(name))
+        if columns is not None:
+            columns = [col for col in columns if col in snapshot.schema_arrow.names]
+        # Bỏ qua các row group nằm hoàn toàn trước dòng ``start``
+        groups, skip, offset = [], 0, 0
+        for i in range(snapshot.num_row_groups):
+            rows = snapshot.metadata.row_group(i).num_rows
+            if offset + rows > start:
+                if not groups:
+                    skip = max(start - offset, 0)
+                groups.append(i)
+            offset += rows
+        if not groups:
+            return
+        for batch in snapshot.iter_batches(batch_size=chunk_rows, row_groups=groups, columns=columns):
+            if skip >= batch.num_rows:
+                skip -= batch.num_rows
+                continue
+            yield batch.slice(skip).to_pandas()
+            skip = 0
+
+    def tokens(self, names: Iterable[str]) -> Dict[str, str]:
+        """
+        Return a content token per source file, bringing the snapshots up to date.
+
+        The token is the SHA-1 hash of the file (or its mtime and size if no
+        snapshot can be written), so it changes whenever the file changes.
+        """
+        tokens = {}
+        names = list(names)
+        self.refresh_many(names)
+        for name in names:
+            if self.refresh(name):
+                tokens[name] = self._manifest[name]['sha1']
+            else:
+                fingerprint = source_fingerprint(self.source_path(name))
+                tokens[name] = f"{fingerprint['mtime_ns']}-{fingerprint['size']}"
+        return tokens
+
+    def version(self, names: Iterable[str]) -> str:
+        """
+        Return a short version string identifying the contents of ``names``.
+
+        The version is derived from the content tokens (see tokens()), so it
+        changes whenever any of the source files changes and can be used as a
+        cache key for anything computed from the data.
+        """
+        return tokens_version(self.tokens(names))
+
+    def appended_since(self, name: str, state: Dict) -> Optional[int]:
+        """
+        Return the first snapshot row added since an earlier state of ``name``.
+
+        Args:
+            name (str): File name of the source CSV
+            state (Dict): Earlier state, with the 'sha1' and 'rows' recorded then
+
+        Returns:
+            Optional[int]: Row number where the rows added since ``state``
+            start (the row count if nothing changed), or None if the file was
+            modified other than by appending rows
+        """
+        entry = self._manifest.get(name)
+        if entry is None:
+            return None
+        for known in entry.get('appends', []) + [entry]:
+            if known['sha1'] == state.get('sha1') and known.get('rows') == state.get('rows'):
+                return known['rows']
+        return None
+
+    def derived_sources(self, name: str) -> Dict[str, Dict]:
+        """Return the source states ({file: {'sha1', 'rows'}}) the stored derived table ``name`` was built from."""
+        return self._derived.get(name, {}).get('sources', {})
+
+    def read_derived(
+        self,
+        name: str,
+        version: str,
+        build: Callable[[], pd.DataFrame],
+        update: Optional[Callable[[pd.DataFrame, Dict[str, int]], pd.DataFrame]] = None,
+        sources: Iterable[str] = ()
+    ) -> pd.DataFrame:
+        """
+        Read a table derived from the sources, building it once per data version.
+
+        The result is stored as ``<name>-<version>.parquet`` next to the
+        snapshots; tables of older versions are removed. If ``update`` is
+        given and the stored table of an earlier version was built from
+        ``sources`` that have since only been appended to, it is updated
+        instead of being rebuilt.
+
+        Args:
+            name (str): Name of the derived table, e.g. 'geolocation_zips'
+            version (str): Data version the table is derived from (see version())
+            build (Callable[[], pd.DataFrame]): Function computing the table
+            update (Callable[[pd.DataFrame, Dict[str, int]], pd.DataFrame]):
+                Function receiving the earlier table and, per source file, the
+                first snapshot row added since, and returning the new table
+            sources (Iterable[str]): Source files the table is computed from
+
+        Returns:
+            pd.DataFrame: The derived table
+        """
+        tables = self.read_derived_tables(
+            [name], version, lambda: {name: build()},
+            update=(lambda previous, starts: {name: update(previous[name], starts)}) if update else None,
+            sources=sources
+        )
+        return tables[name]
+
+    def read_derived_tables(
+        self,
+        names: Iterable[str],
+        version: str,
+        build: Callable[[], Dict[str, pd.DataFrame]],
+        update: Optional[Callable[[Dict[str, pd.DataFrame], Dict[str, int]], Dict[str, pd.DataFrame]]] = None,
+        sources: Iterable[str] = ()
+    ) -> Dict[str, pd.DataFrame]:
+        """
+        Read several tables derived together from the sources (see read_derived).
+
+        The tables are built, updated and stored as a group: if any of them
+        is missing for ``version``, ``build`` (or ``update``, when every table
+        of the earlier version is stored) computes all of them in one pass.
+        The group is computed by one thread of the process at a time; the
+        others wait and read the stored result.
+
+        Args:
+            names (Iterable[str]): Names of the derived tables
+            version (str): Data version the tables are derived from; a suffix
+                after the last dot (e.g. '<sources>.4') is the layout of the
+                tables, and tables of another layout are rebuilt, not updated
+            build (Callable[[], Dict[str, pd.DataFrame]]): Function computing every table
+            update (Callable[[Dict[str, pd.DataFrame], Dict[str, int]], Dict[str, pd.DataFrame]]):
+                Function receiving the earlier tables and, per source file, the
+                first snapshot row added since, and returning the new tables
+            sources (Iterable[str]): Source files the tables are computed from
+
+        Returns:
+            Dict[str, pd.DataFrame]: The derived tables by name
+        """
+        names = list(names)
+        with _shared_lock(self.snapshot_dir, 'derived:' + ','.join(names)):
+            self._reload_manifest()
+            return self._read_derived_tables(names, version, build, update, list(sources))
+
+    def _read_derived_tables(self, names, version, build, update, sources) -> Dict[str, pd.DataFrame]:
+        def layout(derived_version: str) -> str:
+            # Phần sau dấu chấm cuối cùng (nếu có) là phiên bản định dạng của bảng
+            return derived_version.rpartition('.')[2] if '.' in derived_version else ''
+
+        paths = {name: os.path.join(self.snapshot_dir, f"{name}-{version}.parquet") for name in names}
+        if PARQUET_AVAILABLE and all(os.path.exists(path) for path in paths.values()):
+            return {name: pd.read_parquet(path) for name, path in paths.items()}
+        tables = None
+        previous = [self._derived.get(name) for name in names]
+        if update is not None and PARQUET_AVAILABLE and all(entry is not None for entry in previous):
+            previous_paths = {
+                name: os.path.join(self.snapshot_dir, f"{name}-{entry['version']}.parquet")
+                for name, entry in zip(names, previous)
+            }
+            starts = {source: self.appended_since(source, state) for source, state in previous[0]['sources'].items()}
+            if (
+                all(os.path.exists(path) for path in previous_paths.values())
+                and all(entry['sources'] == previous[0]['sources'] for entry in previous)
+                and all(layout(entry['version']) == layout(version) for entry in previous)
+                and set(starts) == set(sources) and all(start is not None for start in starts.values())
+            ):
+                tables = update({name: pd.read_parquet(path) for name, path in previous_paths.items()}, starts)
+                logger.info(f"Derived snapshots {', '.join(names)} updated with appended rows {starts}")
+        if tables is None:
+            tables = build()
+        if not PARQUET_AVAILABLE:
+            return tables
+        try:
+            os.makedirs(self.snapshot_dir, exist_ok=True)
+            for name, path in paths.items():
+                tmp_path = _temp_path(path)
+                try:
+                    tables[name].to_parquet(tmp_path, index=False)
+                    os.replace(tmp_path, path)
+                except OSError:
+                    _remove_quietly(tmp_path)
+                    raise
+                for stale in glob.glob(os.path.join(self.snapshot_dir, f"{name}-*.parquet")):
+                    if stale != path:
+                        os.remove(stale)
+            with self._manifest_lock:
+                states = {
+                    source: {'sha1': self._manifest[source]['sha1'], 'rows': self._manifest[source]['rows']}
+                    for source in sources if 'rows' in self._manifest.get(source, {})
+                }
+                for name in names:
+                    self._derived[name] = {'version': version, 'sources': states}
+                self._save_manifest(derived=names)
+            logger.info(f"Derived snapshots stored for {', '.join(f'{name} ({len(tables[name]):,} rows)' for name in names)}")
+        except OSError as e:
+            logger.warning(f"Could not write derived snapshots {', '.join(names)}: {e}")
+        return tables
@@ -0,0 +1,219 @@
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+import streamlit as st
+from modules import dashboard
+from modules.category_stats import category_stats
+from modules.cube import daily_cube
+from modules.data_loader import Dataset, get_dataset
+from modules.filters import filter_index
+from modules.geo_tiles import geolocation_tiles
+from modules.kpi_engine import kpi_engine
+from modules.rfm import rfm_segments
+
+logger = logging.getLogger(__name__)
+
+# Tắt bằng OLIST_WARMUP=0 (ví dụ khi chạy benchmark hoặc kiểm thử)
+WARMUP_ENABLED = os.environ.get("OLIST_WARMUP", "1") != "0"
+# Số luồng dựng các cấu trúc và biểu đồ song song
+WARMUP_WORKERS = int(os.environ.get("OLIST_WARMUP_WORKERS", "2"))
+# Tiền tố tên luồng làm nóng
+THREAD_PREFIX = "olist-warmup"
+# Chu kỳ (giây) cập nhật banner tiến độ trong khi đang làm nóng
+BANNER_REFRESH = 2
+
+# Cấu trúc dùng chung của bộ dữ liệu gốc, dựng trước các biểu đồ
+STRUCTURES: Dict[str, Callable[[Dataset], object]] = {
+    'filter_index': filter_index,
+    'daily_cube': daily_cube,
+    'kpi_engine': kpi_engine,
+    'category_stats': category_stats,
+    'rfm_segments': rfm_segments,
+    'geolocation_tiles': geolocation_tiles,
+}
+# Các biểu đồ của dashboard với giá trị mặc định của widget: mỗi bước tính các hàm tổng hợp
+# (modules.aggregations) của biểu đồ rồi dựng nó vào bộ đệm biểu đồ, không gọi hàm vẽ nào của Streamlit
+FIGURES: Dict[str, Callable[[Dataset], object]] = {
+    f'figure:{chart_id}': build for chart_id, build in dashboard.DEFAULT_FIGURES.items()
+}
+
+
+class WarmupStatus:
+    """Progress of the background warm-up, shared by every session of the process."""
+
+    def __init__(self, steps: List[str], version: Optional[str] = None):
+        self.steps = steps
+        # Phiên bản bộ dữ liệu được làm nóng (Dataset.version); None cho tới khi tải xong
+        self.version = version
+        self.done: List[str] = []
+        self.failed: Dict[str, str] = {}
+        self.started = time.time()
+        self.finished: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self) -> bool:
+        return self.finished is not None
+
+    @property
+    def progress(self) -> float:
+        return len(self.done) / len(self.steps) if self.steps else 1.0
+
+    def step_done(self, step: str, error: Optional[BaseException] = None) -> None:
+        with self._lock:
+            self.done.append(step)
+            if error is not None:
+                self.failed[step] = str(error)
+
+    def finish(self) -> None:
+        self.finished = time.time()
+
+    def snapshot(self) -> dict:
+        """Return the status as a JSON-serializable dict."""
+        with self._lock:
+            return {
+                'ready': self.ready,
+                'version': self.version,
+                'done': len(self.done),
+                'steps': len(self.steps),
+                'failed': dict(self.failed),
+                'seconds': round((self.finished or time.time()) - self.started, 3),
+            }
+
+
+def _run_step(status: WarmupStatus, step: str, func: Callable[[], object]) -> None:
+    start = time.perf_counter()
+    try:
+        func()
+    except Exception as e:
+        logger.error(f"Warm-up step {step} failed: {e}")
+        status.step_done(step, e)
+    else:
+        logger.info(f"Warm-up step {step} done in {time.perf_counter() - start:.2f}s")
+        status.step_done(step)
+
+
+def _warm(status: WarmupStatus, workers: int) -> None:
+    try:
+        dataset = None
+
+        def load():
+            nonlocal dataset
+            dataset = get_dataset()
+            status.version = dataset.version
+
+        _run_step(status, 'dataset', load)
+        if dataset is None:
+            return
+        # Bộ lọc mặc định (không giới hạn) trả về chính bộ dữ liệu gốc, nên mọi bước dùng bộ dữ liệu gốc
+        for steps in (STRUCTURES, FIGURES):
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix=THREAD_PREFIX) as pool:
+                for name, build in steps.items():
+                    pool.submit(_run_step, status, name, lambda build=build: build(dataset))
+    finally:
+        status.finish()
+        logger.info(json.dumps({'warmup': status.snapshot()}, ensure_ascii=False))
+
+
+class _WarmupState:
+    # Lần làm nóng hiện tại của tiến trình (mỗi lần cho một phiên bản bộ dữ liệu)
+    def __init__(self):
+        self.status: Optional[WarmupStatus] = None
+        self.lock = threading.Lock()
+
+
+@st.cache_resource(show_spinner=False)
+def _warmup_state() -> _WarmupState:
+    return _WarmupState()
+
+
+def _start(version: Optional[str], workers: int) -> WarmupStatus:
+    status = WarmupStatus(['dataset', *STRUCTURES, *FIGURES] if WARMUP_ENABLED else [], version)
+    if not WARMUP_ENABLED:
+        status.finish()
+        return status
+    threading.Thread(
+        target=_warm, args=(status, max(workers, 1)), name=f"{THREAD_PREFIX}-main", daemon=True
+    ).start()
+    return status
+
+
+def start_warmup(version: Optional[str] = None, workers: int = WARMUP_WORKERS) -> WarmupStatus:
+    """
+    Start the background warm-up and return its status, once per dataset version.
+
+    Streamlit runs no app code before the first session, so the warm-up starts
+    with the first script run of the first visitor (Streamlit's
+    /_stcore/health endpoint does not run the app). A daemon thread loads the
+    shared dataset (the session's own get_dataset() call waits for that load
+    instead of reading the files a second time), builds the shared structures (filter index, daily cube, KPI engine, category
+    statistics, RFM segments, geolocation tiles) and then, in a thread pool,
+    computes the aggregations and figures of every chart with its default
+    widget values (dashboard.DEFAULT_FIGURES). Only the data layer and the
+    figure cache are touched, never a Streamlit element, so later sessions
+    only read the caches.
+
+    Without ``version`` the current warm-up is returned (and the first one
+    started). With the Dataset.version of the data a session has just loaded,
+    a new warm-up is started when the current one has warmed another version,
+    e.g. after the source files were refreshed.
+
+    Args:
+        version (Optional[str]): Version of the dataset the caller uses
+        workers (int): Threads used for the structures and figures
+
+    Returns:
+        WarmupStatus: Shared progress; ``ready`` once every step has run
+    """
+    state = _warmup_state()
+    with state.lock:
+        status = state.status
+        # Lần làm nóng đầu tiên chưa biết phiên bản cho tới khi tải xong bộ dữ liệu: không khởi động lại giữa chừng
+        stale = status is not None and version is not None and status.version != version and (
+            status.ready or status.version is not None
+        )
+        if status is None or stale:
+            status = state.status = _start(version, workers)
+        return status
+
+
+# Khóa session_state: phiên đã thấy thanh tiến độ và cần thông báo kết quả một lần sau khi xong
+READY_NOTICE_KEY = 'warmup_ready_notice'
+
+
+@st.fragment(run_every=BANNER_REFRESH)
+def _warmup_progress(status: WarmupStatus) -> None:
+    if status.ready:
+        # Chạy lại toàn bộ trang: lần chạy đó không gọi fragment nữa nên việc thăm dò dừng lại
+        st.session_state[READY_NOTICE_KEY] = True
+        st.rerun()
+    st.progress(
+        status.progress,
+        text=f"⏳ Đang chuẩn bị dữ liệu và biểu đồ cho mọi mục ({len(status.done)}/{len(status.steps)})..."
+    )
+
+
+def render_warmup_status(status: WarmupStatus) -> None:
+    """
+    Show the warm-up progress while it runs, and its result once it is done.
+
+    The progress banner is a fragment that refreshes itself every
+    BANNER_REFRESH seconds. When the warm-up finishes, it reruns the whole
+    app; that run no longer renders the fragment, so polling stops, and the
+    result is shown outside of it (once in the page, then in the sidebar).
+    """
+    if not status.ready:
+        _warmup_progress(status)
+        return
+    snapshot = status.snapshot()
+    if st.session_state.pop(READY_NOTICE_KEY, False):
+        st.success(f"✅ Dữ liệu đã sẵn sàng (chuẩn bị trong {snapshot['seconds']:.1f} giây).")
+    if snapshot['failed']:
+        st.sidebar.warning(f"⚠️ Làm nóng bộ nhớ đệm lỗi ở: {', '.join(snapshot['failed'])}")
+    elif snapshot['steps']:
+        st.sidebar.caption(f"Bộ nhớ đệm đã sẵn sàng ({snapshot['steps']} bước, {snapshot['seconds']:.1f} giây).")
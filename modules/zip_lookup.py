@@ -0,0 +1,115 @@
+import numpy as np
+import pandas as pd
+import streamlit as st
+from modules.data_loader import Dataset
+from modules.geo_tiles import _run_sums
+
+
+class ZipLookup:
+    """
+    Deduplicated zip-prefix -> (lat, lng, city, state) index of the geolocation table.
+
+    The raw geolocation table has many rows per zip code prefix. They are
+    collapsed once into one entry per prefix: the mean position (float32),
+    the number of raw rows, and the city and state of the first row. Entries
+    are stored as contiguous arrays sorted by prefix, so looking up any number
+    of prefixes is a single vectorized np.searchsorted.
+
+    The input may also be an already summarized table (see
+    modules.ingest.summarize_geolocation) whose ``geolocation_rows`` column
+    gives the number of raw rows behind each mean position.
+    """
+
+    def __init__(self, geo: pd.DataFrame):
+        zips = geo['geolocation_zip_code_prefix'].to_numpy(dtype='float64')
+        lat = geo['geolocation_lat'].to_numpy(dtype='float64')
+        lng = geo['geolocation_lng'].to_numpy(dtype='float64')
+        if 'geolocation_rows' in geo.columns:
+            weights = geo['geolocation_rows'].to_numpy(dtype='float64')
+        else:
+            weights = np.ones(len(geo))
+        valid = np.flatnonzero(~(np.isnan(zips) | np.isnan(lat) | np.isnan(lng)))
+        order = valid[np.argsort(zips[valid], kind='stable')]
+        sorted_zips = zips[order].astype(np.int32)
+        weights = weights[order]
+
+        # Vị trí dòng đầu tiên của mỗi mã bưu chính sau khi sắp xếp
+        starts = np.flatnonzero(np.diff(sorted_zips, prepend=-1)) if len(order) else order
+        self.rows = _run_sums(weights, starts).astype(np.int64)
+        self.keys = sorted_zips[starts]
+        self.lat = (_run_sums(lat[order] * weights, starts) / self.rows).astype(np.float32)
+        self.lng = (_run_sums(lng[order] * weights, starts) / self.rows).astype(np.float32)
+        first = order[starts]
+        self.city = geo['geolocation_city'].take(first).reset_index(drop=True)
+        self.state = geo['geolocation_state'].take(first).reset_index(drop=True)
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def positions(self, zips) -> np.ndarray:
+        """
+        Return the entry position of each zip code prefix, -1 if it is unknown.
+
+        Args:
+            zips (array-like): Zip code prefixes (NaN allowed)
+
+        Returns:
+            np.ndarray: Positions into the lookup arrays
+        """
+        zips = np.asarray(zips, dtype='float64')
+        known = ~np.isnan(zips)
+        pos = np.searchsorted(self.keys, np.where(known, zips, -1))
+        pos = np.minimum(pos, max(len(self.keys) - 1, 0))
+        found = known & (len(self.keys) > 0)
+        found[found] = self.keys[pos[found]] == zips[found]
+        return np.where(found, pos, -1)
+
+    def locate(self, zips) -> pd.DataFrame:
+        """
+        Return the coordinates of each zip code prefix.
+
+        Args:
+            zips (array-like): Zip code prefixes
+
+        Returns:
+            pd.DataFrame: Columns ['lat', 'lng'], one row per input (NaN if unknown)
+        """
+        pos = self.positions(zips)
+        found = pos >= 0
+        lat = np.full(len(pos), np.nan, dtype=np.float32)
+        lng = np.full(len(pos), np.nan, dtype=np.float32)
+        lat[found] = self.lat[pos[found]]
+        lng[found] = self.lng[pos[found]]
+        return pd.DataFrame({'lat': lat, 'lng': lng})
+
+    def state_centroids(self) -> pd.DataFrame:
+        """
+        Return the mean position of the raw geolocation rows of each state.
+
+        Weighted by the number of raw rows per prefix, so the result equals the
+        mean over the full geolocation table as long as each prefix lies in a
+        single state.
+
+        Returns:
+            pd.DataFrame: Columns ['geolocation_state', 'geolocation_lat', 'geolocation_lng']
+        """
+        entries = pd.DataFrame({
+            'geolocation_state': self.state.astype(str),
+            'lat': self.lat.astype('float64') * self.rows,
+            'lng': self.lng.astype('float64') * self.rows,
+            'rows': self.rows,
+        })
+        sums = entries.groupby('geolocation_state').sum()
+        return pd.DataFrame({
+            'geolocation_lat': (sums['lat'] / sums['rows']).astype('float32'),
+            'geolocation_lng': (sums['lng'] / sums['rows']).astype('float32'),
+        }).reset_index()
+
+
+@st.cache_resource(
+    max_entries=2, show_spinner=False,
+    hash_funcs={Dataset: lambda d: (d.base or d).version_of('olist_geolocation_dataset')}
+)
+def zip_lookup(data: Dataset) -> ZipLookup:
+    """Return the ZipLookup of the geolocation table, built once per data version (shared by filtered datasets)."""
+    return ZipLookup(data.olist_geolocation_dataset)
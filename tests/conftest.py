@@ -0,0 +1,62 @@
+import os
+import shutil
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+from generate_dataset import generate  # noqa: E402
+
+# Số đơn hàng của bộ dữ liệu tổng hợp dùng trong các test (nhỏ để chạy nhanh)
+TEST_ORDERS = 3000
+# Các bảng đơn hàng được cắt đôi để thử việc ghi nối tiếp
+ORDER_TABLES = (
+    'olist_orders_dataset.csv', 'olist_order_items_dataset.csv', 'olist_order_payments_dataset.csv',
+    'olist_order_reviews_dataset.csv', 'olist_customers_dataset.csv',
+)
+
+
+@pytest.fixture(scope='session')
+def olist_template(tmp_path_factory):
+    """Directory holding a small synthetic Olist dataset (CSV), generated once per test session."""
+    path = str(tmp_path_factory.mktemp('olist'))
+    generate(path, TEST_ORDERS, ['csv'], chunk_size=1000, log=lambda message: None)
+    return path
+
+
+@pytest.fixture
+def data_dir(olist_template, tmp_path):
+    """Private copy of the synthetic dataset; the path ends with a separator like DATA_PATH."""
+    path = tmp_path / 'data'
+    shutil.copytree(olist_template, path)
+    return str(path) + os.sep
+
+
+@pytest.fixture
+def appendable_data(data_dir):
+    """
+    Synthetic dataset whose order tables hold only a prefix of their rows.
+
+    Returns the data directory and a function appending the remaining rows
+    of every order table to its CSV (at a different cut point per table, so
+    appended payments, items and reviews also belong to earlier orders).
+    """
+    tails = {}
+    for i, name in enumerate(ORDER_TABLES):
+        path = os.path.join(data_dir, name)
+        with open(path, encoding='utf-8') as f:
+            lines = f.readlines()
+        cut = 1 + int((len(lines) - 1) * (0.7 + 0.05 * i))
+        tails[name] = lines[cut:]
+        with open(path, 'w', encoding='utf-8') as f:
+            f.writelines(lines[:cut])
+
+    def append():
+        for name, lines in tails.items():
+            with open(os.path.join(data_dir, name), 'a', encoding='utf-8') as f:
+                f.writelines(lines)
+
+    return data_dir, append
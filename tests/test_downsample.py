@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from modules.downsample import downsample, lttb_indices, minmax_indices
+
+
+def _series(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return np.arange(n, dtype='float64'), np.cumsum(rng.normal(size=n))
+
+
+@pytest.mark.parametrize('n, threshold', [(1000, 100), (1000, 3), (101, 100), (5000, 800)])
+def test_lttb_keeps_one_point_per_bucket(n, threshold):
+    x, y = _series(n)
+    selected = lttb_indices(x, y, threshold)
+    assert len(selected) == threshold
+    assert selected[0] == 0 and selected[-1] == n - 1
+    assert (np.diff(selected) > 0).all()
+    # Mỗi điểm ở giữa thuộc đúng bucket của nó
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    for i, position in enumerate(selected[1:-1]):
+        assert edges[i] <= position < edges[i + 1]
+
+
+def test_lttb_keeps_isolated_peak():
+    x = np.arange(1000, dtype='float64')
+    y = np.zeros(1000)
+    y[437] = 50.0
+    assert 437 in lttb_indices(x, y, 50)
+
+
+@pytest.mark.parametrize('threshold', [1000, 2000, 2])
+def test_lttb_keeps_everything_when_it_fits(threshold):
+    x, y = _series(1000)
+    np.testing.assert_array_equal(lttb_indices(x, y, threshold), np.arange(1000))
+
+
+@pytest.mark.parametrize('n, buckets', [(1000, 10), (1001, 7), (5000, 399)])
+def test_minmax_keeps_bucket_extremes(n, buckets):
+    _, y = _series(n, seed=1)
+    selected = minmax_indices(y, buckets)
+    assert len(selected) <= 2 * buckets + 2
+    assert selected[0] == 0 and selected[-1] == n - 1
+    assert (np.diff(selected) > 0).all()
+    edges = np.linspace(0, n, buckets + 1).astype(np.int64)
+    for lo, hi in zip(edges[:-1], edges[1:]):
+        kept = selected[(selected >= lo) & (selected < hi)]
+        assert y[kept].min() == y[lo:hi].min()
+        assert y[kept].max() == y[lo:hi].max()
+
+
+def test_minmax_treats_nan_as_zero():
+    y = np.array([np.nan, 1.0, -3.0, np.nan, 2.0, 0.5] * 100)
+    selected = minmax_indices(y, 5)
+    assert np.nan_to_num(y)[selected].min() == -3.0
+    assert np.nan_to_num(y)[selected].max() == 2.0
+
+
+@pytest.mark.parametrize('method', ['lttb', 'minmax'])
+def test_downsample_returns_ordered_subset(method):
+    dates = pd.date_range('2017-01-01', periods=3000, freq='D')
+    df = pd.DataFrame({'date': dates, 'orders': np.random.default_rng(2).poisson(20, len(dates))})
+    result = downsample(df, 'date', 'orders', max_points=500, method=method)
+    assert len(result) <= 500
+    assert result['date'].is_monotonic_increasing
+    assert result['date'].iloc[0] == dates[0] and result['date'].iloc[-1] == dates[-1]
+    # Chỉ chọn các dòng có sẵn, không nội suy
+    merged = result.merge(df, on='date', suffixes=('', '_source'))
+    assert len(merged) == len(result)
+    assert (merged['orders'] == merged['orders_source']).all()
+
+
+def test_downsample_keeps_small_frames():
+    df = pd.DataFrame({'date': pd.date_range('2018-01-01', periods=10), 'orders': range(10)})
+    assert downsample(df, 'date', 'orders', max_points=10) is df
+    assert downsample(df, 'date', 'orders', max_points=None) is df
+
+
+def test_downsample_rejects_unknown_method():
+    df = pd.DataFrame({'date': pd.date_range('2018-01-01', periods=10), 'orders': range(10)})
+    with pytest.raises(ValueError):
+        downsample(df, 'date', 'orders', max_points=5, method='mean')
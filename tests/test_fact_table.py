@@ -0,0 +1,157 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from modules.data_loader import FACT_SOURCES, TABLE_FILES
+from modules.fact_table import FACT_TABLES, SOURCE_COLUMNS, build_fact_tables, update_fact_tables
+from modules.snapshot import SnapshotStore
+
+
+def _source_tables(data_dir):
+    store = SnapshotStore(data_dir)
+    return {name: store.read(TABLE_FILES[name])[SOURCE_COLUMNS[name]] for name in FACT_SOURCES}
+
+
+def _chunker(tables, size):
+    # Hàm trả về các khối của một bảng nguồn từ một dòng cho trước (ít nhất một khối, có thể rỗng)
+    def chunks(name, start=0):
+        table = tables[name]
+        for first in range(start, max(len(table), start + 1), size):
+            yield table.iloc[first:first + size]
+    return chunks
+
+
+def _build(tables, size=None):
+    chunks = _chunker(tables, size or max(len(table) for table in tables.values()) + 1)
+    return build_fact_tables(*(chunks(name) for name in FACT_SOURCES))
+
+
+def _assert_tables_equal(left, right):
+    for name in FACT_TABLES:
+        pd.testing.assert_frame_equal(
+            left[name].reset_index(drop=True), right[name].reset_index(drop=True), check_categorical=False
+        )
+
+
+def _hand_made_tables():
+    # Bộ dữ liệu nhỏ có các trường hợp đặc biệt: thanh toán bằng nhau, thiếu khóa, thiếu khách hàng
+    orders = pd.DataFrame({
+        'order_id': ['o1', 'o2', 'o3', 'o4', 'o5'],
+        'customer_id': ['c1', 'c2', 'c3', 'c1', 'c5'],
+        'order_status': pd.Categorical(['delivered', 'delivered', 'shipped', 'canceled', 'created']),
+        'order_purchase_timestamp': pd.to_datetime(
+            ['2018-01-01 10:00', '2018-01-01 23:30', '2018-01-03 08:15', '2018-02-01 12:00', '2018-02-02 09:00']
+        ),
+        'order_delivered_customer_date': pd.to_datetime(['2018-01-05 10:00', '2018-01-03 11:30', None, None, None]),
+    })
+    payments = pd.DataFrame({
+        'order_id': ['o1', 'o1', 'o2', 'o2', None, 'o3'],
+        'payment_type': ['voucher', 'credit_card', 'boleto', 'credit_card', 'boleto', 'credit_card'],
+        'payment_value': [10.0, 30.0, 20.0, 20.0, 99.0, np.nan],
+    })
+    reviews = pd.DataFrame({'order_id': ['o1', 'o1', 'o2', None], 'review_score': [5, 2, 4, 1]})
+    customers = pd.DataFrame({
+        'customer_id': ['c1', 'c5', 'c2'],
+        'customer_unique_id': ['u1', 'u5', 'u2'],
+        'customer_state': ['SP', 'MG', 'RJ'],
+        'customer_city': ['sao paulo', 'belo horizonte', 'rio de janeiro'],
+        'customer_zip_code_prefix': [1000, 30000, 20000],
+    })
+    items = pd.DataFrame({
+        'order_id': ['o1', 'o1', 'o2'],
+        'product_id': ['p1', 'p2', 'p1'],
+        'seller_id': ['s1', 's1', 's2'],
+        'price': [15.0, 20.0, 35.0],
+        'freight_value': [5.0, 5.0, 5.0],
+    })
+    return {
+        'orders': orders, 'order_payments': payments, 'order_reviews': reviews,
+        'customers': customers, 'order_items': items,
+    }
+
+
+def test_order_facts_values():
+    facts = _build(_hand_made_tables())['facts'].set_index('order_id')
+    assert facts.loc['o1', 'payment_value'] == 40.0
+    assert facts.loc['o1', 'payment_type'] == 'credit_card'
+    # Hai khoản bằng nhau: khoản xuất hiện trước trong file quyết định phương thức chính
+    assert facts.loc['o2', 'payment_type'] == 'boleto'
+    assert np.isnan(facts.loc['o4', 'payment_value'])
+    assert facts.loc['o1', 'review_score'] == pytest.approx(3.5)
+    assert np.isnan(facts.loc['o3', 'review_score'])
+    assert list(facts['item_count']) == [2, 1, 0, 0, 0]
+    assert facts.loc['o1', 'delivery_days'] == pytest.approx(4.0)
+    assert facts.loc['o2', 'hour'] == 23
+    assert facts.loc['o4', 'customer_state'] == 'SP'
+    # Khách hàng không có trong bảng khách hàng
+    assert pd.isna(facts.loc['o3', 'customer_unique_id'])
+
+
+def test_rows_without_order_are_dropped():
+    tables = _build(_hand_made_tables())
+    assert tables['payment_totals']['order_id'].notna().all()
+    assert tables['review_totals']['order_id'].notna().all()
+    assert tables['payment_totals']['payments'].sum() == 5
+    assert tables['review_totals']['reviews'].sum() == 3
+
+
+@pytest.mark.parametrize('size', [1, 2, 3])
+def test_chunked_build_matches_single_chunk_hand_made(size):
+    tables = _hand_made_tables()
+    _assert_tables_equal(_build(tables, size), _build(tables))
+
+
+@pytest.mark.parametrize('size', [97, 1000])
+def test_chunked_build_matches_single_chunk(data_dir, size):
+    tables = _source_tables(data_dir)
+    _assert_tables_equal(_build(tables, size), _build(tables))
+
+
+def _check_update(tables, cut, size=2):
+    # Cập nhật bảng fact của phần đầu các bảng nguồn bằng các dòng còn lại, so với việc tạo lại toàn bộ
+    prefix = {name: table.iloc[:cut[name]] for name, table in tables.items()}
+    previous = _build(prefix)
+    updated, dates = update_fact_tables(previous, _chunker(tables, size), cut)
+    expected = _build(tables)
+    _assert_tables_equal(updated, expected)
+
+    # Mọi đơn hàng mới hoặc thay đổi đều nằm trong các ngày được báo thay đổi
+    before = previous['facts'].set_index('order_id')
+    after = expected['facts'].set_index('order_id')
+    common = before.index.intersection(after.index)
+    differs = np.zeros(len(common), dtype=bool)
+    for column in after.columns:
+        old, new = before.loc[common, column].astype(object), after.loc[common, column].astype(object)
+        differs |= ~((old == new) | (old.isna() & new.isna())).to_numpy()
+    changed = after.index.difference(before.index).union(common[differs])
+    assert set(after.loc[changed, 'date'].dropna()) <= set(pd.DatetimeIndex(dates))
+
+
+HAND_MADE_CUTS = [
+    # Thanh toán bằng nhau được ghi thêm, khách hàng ghi sau đơn hàng, đơn mới của khách hàng cũ
+    {'orders': 3, 'order_payments': 3, 'order_reviews': 2, 'customers': 1, 'order_items': 2},
+    # Đơn mới của khách hàng chỉ có trong các dòng khách hàng cũ
+    {'orders': 4, 'order_payments': 6, 'order_reviews': 4, 'customers': 2, 'order_items': 3},
+    # Chỉ có đơn hàng mới, không có dòng mới ở các bảng khác
+    {'orders': 2, 'order_payments': 6, 'order_reviews': 4, 'customers': 3, 'order_items': 3},
+    # Không có gì mới
+    {'orders': 5, 'order_payments': 6, 'order_reviews': 4, 'customers': 3, 'order_items': 3},
+    # Bảng cũ rỗng
+    {'orders': 0, 'order_payments': 0, 'order_reviews': 0, 'customers': 0, 'order_items': 0},
+]
+
+
+@pytest.mark.parametrize('cut', HAND_MADE_CUTS)
+def test_update_matches_rebuild_hand_made(cut):
+    _check_update(_hand_made_tables(), cut)
+
+
+@pytest.mark.parametrize('fraction', [0.5, 0.9, 0.999])
+def test_update_matches_rebuild(data_dir, fraction):
+    tables = _source_tables(data_dir)
+    rng = np.random.default_rng(int(fraction * 1000))
+    cut = {
+        name: int(len(table) * rng.uniform(fraction - 0.05, min(fraction + 0.05, 1)))
+        for name, table in tables.items()
+    }
+    _check_update(tables, cut, size=700)
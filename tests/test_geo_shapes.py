@@ -0,0 +1,59 @@
+import math
+
+import pytest
+
+from modules import geo_shapes
+from modules.geo_shapes import BRAZIL_BOUNDS, fit_zoom, state_geojson
+
+# 26 tiểu bang và Distrito Federal
+STATES = {
+    'AC', 'AL', 'AM', 'AP', 'BA', 'CE', 'DF', 'ES', 'GO', 'MA', 'MG', 'MS', 'MT', 'PA',
+    'PB', 'PE', 'PI', 'PR', 'RJ', 'RN', 'RO', 'RR', 'RS', 'SC', 'SE', 'SP', 'TO',
+}
+
+
+def test_bundled_states_cover_every_uf():
+    geojson = state_geojson()
+    assert geojson['type'] == 'FeatureCollection'
+    assert {feature['id'] for feature in geojson['features']} == STATES
+    lat_min, lat_max, lng_min, lng_max = BRAZIL_BOUNDS
+    for feature in geojson['features']:
+        geometry = feature['geometry']
+        assert geometry['type'] in ('Polygon', 'MultiPolygon')
+        polygons = geometry['coordinates'] if geometry['type'] == 'MultiPolygon' else [geometry['coordinates']]
+        for polygon in polygons:
+            ring = polygon[0]
+            # Vòng kín, nằm trong khung bao của Brazil
+            assert ring[0] == ring[-1] and len(ring) >= 4
+            assert all(lng_min <= lng <= lng_max and lat_min <= lat <= lat_max for lng, lat in ring)
+
+
+def test_states_are_loaded_once():
+    assert state_geojson() is state_geojson()
+
+
+def test_missing_file_raises(tmp_path, monkeypatch):
+    monkeypatch.setattr(geo_shapes, 'GEO_PATH', str(tmp_path))
+    with pytest.raises(FileNotFoundError):
+        state_geojson()
+
+
+def _mercator(lat):
+    return math.log(math.tan(math.pi / 4 + math.radians(lat) / 2))
+
+
+@pytest.mark.parametrize('width, height', [(700, 600), (700, 700), (400, 900), (1600, 500)])
+def test_fit_zoom_fits_brazil(width, height):
+    zoom = fit_zoom(width, height)
+    lat_min, lat_max, lng_min, lng_max = BRAZIL_BOUNDS
+    scale = 256 * 2 ** zoom
+    span_x = (lng_max - lng_min) / 360 * scale
+    span_y = (_mercator(lat_max) - _mercator(lat_min)) / (2 * math.pi) * scale
+    # Vừa khung hình theo ít nhất một chiều và không vượt quá chiều còn lại
+    assert span_x <= width + 1e-6 and span_y <= height + 1e-6
+    assert math.isclose(span_x, width) or math.isclose(span_y, height)
+
+
+def test_fit_zoom_grows_with_the_figure():
+    assert fit_zoom(1400, 1200) == pytest.approx(fit_zoom(700, 600) + 1)
+    assert fit_zoom(700, 300) < fit_zoom(700, 600)
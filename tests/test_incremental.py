@@ -0,0 +1,94 @@
+import datetime
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from modules.cube import MEASURES, DailyCube
+from modules.data_loader import get_dataset
+from modules.fact_table import FACT_TABLES
+from modules.filters import FilterState
+from modules.kpi_engine import KPIEngine
+from modules.snapshot import SNAPSHOT_DIRNAME
+
+# Lựa chọn dùng để so sánh cube / KPI cập nhật với cube / KPI tạo mới
+SELECTIONS = (
+    {},
+    {'order_status': ('delivered',)},
+    {'customer_state': ('SP', 'RJ')},
+    {'payment_type': ('credit_card',), 'order_status': ('delivered', 'shipped')},
+)
+FILTER_STATES = (
+    None,
+    FilterState(statuses=('delivered',)),
+    FilterState(start_date=datetime.date(2017, 6, 1), end_date=datetime.date(2018, 3, 31)),
+    FilterState(
+        start_date=datetime.date(2018, 1, 1), end_date=datetime.date(2018, 12, 31), statuses=('delivered', 'canceled')
+    ),
+)
+
+
+def _decoded(data, table):
+    # Bảng với các cột khóa trả về ID gốc (mã số nguyên phụ thuộc thứ tự mã hóa)
+    frame = getattr(data, table)
+    return frame.assign(**{
+        column: data.decode(column, frame[column]) for column in frame.columns if column in (data.keys or {})
+    })
+
+
+@pytest.fixture
+def updated_datasets(appendable_data, tmp_path):
+    """The dataset before and after appending rows, and the same data loaded from scratch."""
+    data_dir, append = appendable_data
+    previous = get_dataset(data_dir)
+    append()
+    current = get_dataset(data_dir)
+    fresh_dir = tmp_path / 'fresh'
+    shutil.copytree(data_dir, fresh_dir, ignore=shutil.ignore_patterns(SNAPSHOT_DIRNAME))
+    fresh = get_dataset(str(fresh_dir) + os.sep)
+    return previous, current, fresh
+
+
+def test_appended_rows_update_the_dataset(updated_datasets):
+    previous, current, fresh = updated_datasets
+    assert current.changes is not None
+    assert current.changes.previous_version == previous.version_of('facts')
+    assert fresh.changes is None
+    for table in FACT_TABLES:
+        pd.testing.assert_frame_equal(
+            _decoded(current, table).reset_index(drop=True), _decoded(fresh, table).reset_index(drop=True),
+            check_categorical=False
+        )
+
+
+def test_cube_update_matches_fresh_cube(updated_datasets):
+    previous, current, _ = updated_datasets
+    updated = DailyCube(previous.facts).updated(current.facts, current.changes.dates)
+    expected = DailyCube(current.facts)
+    pd.testing.assert_index_equal(updated.days, expected.days)
+    for measure in MEASURES:
+        for selection in SELECTIONS:
+            pd.testing.assert_series_equal(
+                updated.daily(measure, **selection), expected.daily(measure, **selection), check_dtype=False
+            )
+            assert updated.total(measure, '2018-01-01', '2018-06-30', **selection) == pytest.approx(
+                expected.total(measure, '2018-01-01', '2018-06-30', **selection)
+            )
+
+
+def test_cube_update_without_changes_is_unchanged(data_dir):
+    facts = get_dataset(data_dir).facts
+    cube = DailyCube(facts)
+    assert cube.updated(facts, np.array([], dtype='datetime64[ns]')) is cube
+
+
+def test_kpi_engine_update_matches_fresh_engine(updated_datasets):
+    previous, current, _ = updated_datasets
+    updated = KPIEngine(previous).updated(current, current.changes.dates)
+    expected = KPIEngine(current)
+    for state in FILTER_STATES:
+        values, reference = updated.kpis(state), expected.kpis(state)
+        assert values._replace(revenue=0) == reference._replace(revenue=0)
+        assert values.revenue == pytest.approx(reference.revenue)
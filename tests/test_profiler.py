@@ -0,0 +1,97 @@
+import threading
+import time
+import tracemalloc
+
+import pytest
+
+from modules import profiler
+from modules.profiler import current_run, finish_run, profile, start_run
+
+
+@pytest.fixture(autouse=True)
+def no_run():
+    # Mỗi test bắt đầu và kết thúc khi không có lần chạy nào đang được đo
+    finish_run()
+    yield
+    finish_run()
+
+
+def _busy(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def test_spans_nest():
+    start_run()
+    with profile('outer'):
+        with profile('inner') as span:
+            span.rows = 3
+
+    @profile('function')
+    def rows():
+        return [1, 2]
+
+    rows()
+    records = finish_run().records()
+    assert [(record['name'], record['depth'], record['rows']) for record in records] == [
+        ('outer', 0, None), ('inner', 1, 3), ('function', 0, 2)
+    ]
+    assert records[1]['start_ms'] >= records[0]['start_ms']
+    assert records[0]['wall_ms'] >= records[1]['wall_ms']
+
+
+def test_profile_outside_a_run_does_nothing():
+    with profile('ignored') as span:
+        assert span is None
+    assert current_run() is None
+
+
+def test_cpu_time_excludes_other_threads():
+    worker = threading.Thread(target=_busy, args=(0.3,))
+    start_run()
+    with profile('wait'):
+        # Luồng khác dùng CPU trong khi luồng của lần chạy chỉ chờ
+        worker.start()
+        worker.join()
+    with profile('busy'):
+        _busy(0.1)
+    wait, busy = finish_run().records()
+    assert wait['wall_ms'] >= 250
+    assert wait['cpu_ms'] < 50
+    assert busy['cpu_ms'] >= 50
+
+
+def test_memory_tracing_is_scoped_to_the_run():
+    if tracemalloc.is_tracing():
+        pytest.skip("tracemalloc was started outside the profiler")
+    start_run(trace_memory=True)
+    assert tracemalloc.is_tracing()
+    with profile('allocate'):
+        block = bytearray(4 << 20)
+    del block
+    record, = finish_run().records()
+    assert record['peak_kib'] >= 4 << 10
+    assert not tracemalloc.is_tracing()
+
+
+def test_interrupted_run_releases_tracing():
+    if tracemalloc.is_tracing():
+        pytest.skip("tracemalloc was started outside the profiler")
+    start_run(trace_memory=True)
+    # Lần chạy trước dừng giữa chừng (không gọi finish_run): lần chạy sau không đo bộ nhớ
+    start_run()
+    assert profiler._traced_runs == 0
+    assert not tracemalloc.is_tracing()
+
+
+def test_tracing_started_elsewhere_is_left_running():
+    if tracemalloc.is_tracing():
+        pytest.skip("tracemalloc was started outside the profiler")
+    tracemalloc.start()
+    try:
+        start_run(trace_memory=True)
+        finish_run()
+        assert tracemalloc.is_tracing()
+    finally:
+        tracemalloc.stop()
@@ -0,0 +1,106 @@
+import datetime
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from modules import aggregations as agg
+from modules.data_loader import get_dataset
+from modules.filters import FilterState, filter_dataset
+from modules.query import Join, Query, run_duckdb, run_pandas, to_sql
+
+# Các truy vấn của aggregations, cùng các truy vấn dùng điều kiện lọc, phép nối và giới hạn số dòng
+QUERIES = {name.lower(): query for name, query in vars(agg).items() if isinstance(query, Query)}
+QUERIES.update({
+    'delivered_revenue_by_state': Query(
+        'facts', ('customer_state',),
+        (('orders', 'count', None), ('revenue', 'sum', 'payment_value'), ('mean_score', 'mean', 'review_score')),
+        where=(('order_status', '==', 'delivered'), ('payment_value', '>=', 50.0)),
+        order_by=(('revenue', True),), limit=5
+    ),
+    'item_prices_by_seller_state': Query(
+        'item_facts', ('seller_state',),
+        (('items', 'count', None), ('min_price', 'min', 'price'), ('max_price', 'max', 'price'),
+         ('products', 'distinct', 'product_id')),
+        joins=(Join('sellers', 'seller_id', ('seller_state',)),)
+    ),
+    'hourly_share': Query('facts', ('hour', 'order_status'), (('share', 'share', None),), where=(('hour', '<', 12),)),
+})
+
+
+def _tables(data, query):
+    return {name: getattr(data, name) for name in query.tables()}
+
+
+def _hand_made():
+    facts = pd.DataFrame({
+        'order_id': [1, 2, 3, 4, 5, 6],
+        'order_status': pd.Categorical(['delivered', 'delivered', 'canceled', None, 'delivered', 'shipped']),
+        'customer_state': ['SP', 'RJ', 'SP', 'MG', None, 'SP'],
+        'payment_value': [10.0, np.nan, 30.0, 5.0, 7.5, 12.0],
+    })
+    return {'facts': facts}
+
+
+@pytest.fixture(scope='module')
+def dataset(olist_template, tmp_path_factory):
+    path = tmp_path_factory.mktemp('query') / 'data'
+    shutil.copytree(olist_template, path)
+    return get_dataset(str(path) + os.sep)
+
+
+def test_to_sql_quotes_and_parameters():
+    sql, parameters = to_sql(QUERIES['delivered_revenue_by_state'])
+    assert sql.startswith('SELECT "customer_state", count(*) AS "orders"')
+    assert '"order_status" = ?' in sql and sql.endswith('LIMIT 5')
+    assert parameters == ['delivered', 50.0]
+
+
+def test_unknown_function_is_rejected():
+    with pytest.raises(ValueError):
+        run_pandas(Query('facts', ('customer_state',), (('x', 'median', 'payment_value'),)), _hand_made())
+    with pytest.raises(ValueError):
+        run_pandas(Query('facts', ('customer_state',), (('x', 'count', None),), where=(('order_id', '~', 1),)),
+                   _hand_made())
+
+
+def test_pandas_groups_skip_missing_keys():
+    result = run_pandas(
+        Query('facts', ('customer_state',), (('orders', 'count', None), ('revenue', 'sum', 'payment_value'))),
+        _hand_made()
+    )
+    assert list(result['customer_state']) == ['MG', 'RJ', 'SP']
+    assert list(result['orders']) == [1, 1, 3]
+    # Tổng của nhóm chỉ có giá trị thiếu là 0
+    assert list(result['revenue']) == [5.0, 0.0, 52.0]
+
+
+@pytest.mark.parametrize('name', sorted(QUERIES))
+def test_backends_agree(dataset, name):
+    pytest.importorskip('duckdb')
+    query = QUERIES[name]
+    tables = _tables(dataset, query)
+    pd.testing.assert_frame_equal(run_pandas(query, tables), run_duckdb(query, tables), check_exact=False, rtol=1e-9)
+
+
+@pytest.mark.parametrize('name', ['payment_types', 'customer_states', 'delivered_revenue_by_state'])
+def test_backends_agree_on_filtered_data(dataset, name):
+    pytest.importorskip('duckdb')
+    filtered = filter_dataset(dataset, FilterState(
+        start_date=datetime.date(2017, 1, 1), end_date=datetime.date(2017, 12, 31), statuses=('delivered',)
+    ))
+    query = QUERIES[name]
+    tables = _tables(filtered, query)
+    pd.testing.assert_frame_equal(run_pandas(query, tables), run_duckdb(query, tables), check_exact=False, rtol=1e-9)
+
+
+def test_backends_agree_on_hand_made_data():
+    pytest.importorskip('duckdb')
+    query = Query(
+        'facts', ('order_status', 'customer_state'),
+        (('orders', 'count', None), ('share', 'share', None), ('mean', 'mean', 'payment_value')),
+        order_by=(('orders', True),)
+    )
+    pd.testing.assert_frame_equal(run_pandas(query, _hand_made()), run_duckdb(query, _hand_made()))
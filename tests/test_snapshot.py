@@ -0,0 +1,108 @@
+import json
+import os
+import threading
+
+import pandas as pd
+
+from modules.data_loader import TABLE_FILES, dataset_version
+from modules.snapshot import MANIFEST_NAME, SNAPSHOT_DIRNAME, SnapshotStore, read_source_csv
+
+ORDERS = 'olist_orders_dataset.csv'
+
+
+def _manifest(data_dir):
+    with open(os.path.join(data_dir, SNAPSHOT_DIRNAME, MANIFEST_NAME)) as f:
+        return json.load(f)
+
+
+def _leftovers(data_dir):
+    return [name for name in os.listdir(os.path.join(data_dir, SNAPSHOT_DIRNAME)) if name.endswith('.tmp')]
+
+
+def test_read_matches_csv(data_dir):
+    store = SnapshotStore(data_dir)
+    snapshot = store.read(ORDERS)
+    pd.testing.assert_frame_equal(snapshot, read_source_csv(store.source_path(ORDERS), ORDERS))
+    assert _manifest(data_dir)['files'][ORDERS]['rows'] == len(snapshot)
+
+
+def test_append_extends_snapshot(appendable_data):
+    data_dir, append = appendable_data
+    store = SnapshotStore(data_dir)
+    before = store.read(ORDERS)
+    state = {key: store._manifest[ORDERS][key] for key in ('sha1', 'rows')}
+
+    append()
+    store = SnapshotStore(data_dir)
+    after = store.read(ORDERS)
+    # Các danh mục mới được thêm vào cuối danh sách danh mục: chỉ so sánh giá trị
+    pd.testing.assert_frame_equal(after, read_source_csv(store.source_path(ORDERS), ORDERS), check_categorical=False)
+    assert len(after) > len(before)
+    assert len(store._manifest[ORDERS]['appends']) == 1
+    # Các dòng mới bắt đầu ngay sau các dòng đã có
+    assert store.appended_since(ORDERS, state) == len(before)
+    chunks = list(store.iter_chunks(ORDERS, start=len(before)))
+    pd.testing.assert_frame_equal(
+        pd.concat(chunks, ignore_index=True), after.iloc[len(before):].reset_index(drop=True), check_categorical=False
+    )
+
+
+def test_rewritten_source_is_rebuilt(data_dir):
+    store = SnapshotStore(data_dir)
+    store.read(ORDERS)
+    state = {key: store._manifest[ORDERS][key] for key in ('sha1', 'rows')}
+
+    # Xóa một dòng ở giữa: không phải ghi nối, snapshot phải được tạo lại
+    path = store.source_path(ORDERS)
+    with open(path, encoding='utf-8') as f:
+        lines = f.readlines()
+    with open(path, 'w', encoding='utf-8') as f:
+        f.writelines(lines[:10] + lines[11:])
+
+    store = SnapshotStore(data_dir)
+    rebuilt = store.read(ORDERS)
+    pd.testing.assert_frame_equal(rebuilt, read_source_csv(path, ORDERS))
+    assert store._manifest[ORDERS]['appends'] == []
+    assert store.appended_since(ORDERS, state) is None
+
+
+def test_concurrent_writers_agree(data_dir):
+    # Nhiều kho cùng tạo snapshot của một thư mục mới: một phiên bản, manifest đầy đủ, không còn file tạm
+    versions, errors = [], []
+
+    def load():
+        try:
+            versions.append(dataset_version(data_dir))
+        except Exception as e:  # pragma: no cover - chỉ để báo lỗi của luồng
+            errors.append(e)
+
+    threads = [threading.Thread(target=load) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert len(set(versions)) == 1
+    assert set(_manifest(data_dir)['files']) == set(TABLE_FILES.values())
+    assert _leftovers(data_dir) == []
+
+
+def test_concurrent_append_keeps_manifest(appendable_data):
+    data_dir, append = appendable_data
+    dataset_version(data_dir)
+    append()
+    versions = []
+    threads = [threading.Thread(target=lambda: versions.append(dataset_version(data_dir))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(set(versions)) == 1
+    files = _manifest(data_dir)['files']
+    assert set(files) == set(TABLE_FILES.values())
+    # Mỗi bảng đơn hàng được ghi nối đúng một lần, dù bốn luồng cùng làm mới
+    assert len(files[ORDERS]['appends']) == 1
+    assert files[ORDERS]['rows'] == len(read_source_csv(os.path.join(data_dir, ORDERS), ORDERS))
+    assert _leftovers(data_dir) == []
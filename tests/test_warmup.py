@@ -0,0 +1,73 @@
+import threading
+import time
+
+import pytest
+
+from modules import data_loader, warmup
+from modules.data_loader import get_dataset
+from modules.warmup import WarmupStatus
+
+
+@pytest.fixture
+def counted_builds(monkeypatch):
+    """Number of full fact table builds, counted while the test runs."""
+    builds = []
+    build = data_loader.build_fact_tables
+
+    def counting(*args):
+        builds.append(threading.current_thread().name)
+        return build(*args)
+
+    monkeypatch.setattr(data_loader, 'build_fact_tables', counting)
+    return builds
+
+
+def _wait(status, timeout=300):
+    deadline = time.time() + timeout
+    while not status.ready and time.time() < deadline:
+        time.sleep(0.05)
+    assert status.ready, "warm-up did not finish"
+
+
+def test_status_progress():
+    status = WarmupStatus(['dataset', 'cube'])
+    assert status.progress == 0 and not status.ready
+    status.step_done('dataset')
+    status.step_done('cube', ValueError('broken'))
+    status.finish()
+    snapshot = status.snapshot()
+    assert status.ready and status.progress == 1
+    assert snapshot['done'] == 2 and snapshot['steps'] == 2
+    assert snapshot['failed'] == {'cube': 'broken'}
+
+
+def test_concurrent_callers_share_one_load(data_dir, counted_builds):
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(get_dataset(data_dir))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(results) == 4
+    assert all(result is results[0] for result in results)
+    assert len(counted_builds) == 1
+
+
+def test_session_waits_for_the_warmup_load(data_dir, counted_builds, monkeypatch):
+    monkeypatch.setattr(warmup, 'WARMUP_ENABLED', True)
+    monkeypatch.setattr(warmup, 'get_dataset', lambda: get_dataset(data_dir))
+    status = warmup._start(None, workers=2)
+    # Lần chạy của phiên gọi get_dataset() cùng lúc với luồng làm nóng
+    session = get_dataset(data_dir)
+    _wait(status)
+
+    assert len(counted_builds) == 1
+    assert status.version == session.version
+    assert status.failed == {}
+    assert status.progress == 1
+
+
+def test_disabled_warmup_is_ready(monkeypatch):
+    monkeypatch.setattr(warmup, 'WARMUP_ENABLED', False)
+    status = warmup._start(None, workers=2)
+    assert status.ready and status.steps == []